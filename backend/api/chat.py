@@ -9,18 +9,29 @@ from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator
+from starlette.background import BackgroundTask
 from starlette.requests import Request
 from sqlalchemy.orm import Session as DBSession
+from config import HISTORY_COMPACTION_ENABLED
 from services.rag_service import generate_rag_response
+from services.history_compaction_service import compact_history, refresh_session_summary
+from services.retrieval_service import resolve_retrieval_options
+from services.timing_service import new_timings, log_timings
+from services.metrics_service import SSE_STREAMS_IN_FLIGHT, observe_stage_timings
 from services.session_service import (
     create_session as create_session_db,
     get_session as get_session_db,
     update_session_messages,
     delete_session as delete_session_db,
+    get_session_summary,
     get_db,
 )
 from rate_limiter import limiter
-from validators import validate_model_name as _validate_model_name, validate_uuid
+from validators import (
+    validate_model_name as _validate_model_name,
+    validate_retrieval_profile,
+    validate_uuid,
+)
 
 
 router = APIRouter(prefix="/chat", tags=["chat"])
@@ -31,9 +42,19 @@ class ChatRequest(BaseModel):
 
     message: str = Field(..., min_length=1, max_length=10_000)
     session_id: str
-    top_k: int = Field(5, ge=1, le=20)
+    top_k: Optional[int] = Field(None, ge=1, le=20)
     model: Optional[str] = Field(None, max_length=100)
     document_ids: Optional[list[str]] = Field(None, max_length=50)
+    # Retrieval profile (RETRIEVAL_PROFILES) and per-request overrides
+    profile: Optional[str] = Field(None, max_length=50)
+    candidate_count: Optional[int] = Field(None, ge=1, le=200)
+    bm25_top_k: Optional[int] = Field(None, ge=1, le=200)
+    rerank: Optional[bool] = None
+    rerank_timeout_ms: Optional[int] = Field(None, ge=1, le=60_000)
+    mmr: Optional[bool] = None
+    mmr_threshold: Optional[float] = Field(None, gt=0, le=1)
+    rewrite: Optional[bool] = None
+    hyde: Optional[bool] = None
 
     @field_validator("session_id")
     @classmethod
@@ -47,6 +68,13 @@ class ChatRequest(BaseModel):
             return _validate_model_name(v)
         return v
 
+    @field_validator("profile")
+    @classmethod
+    def check_profile(cls, v):
+        if v is not None:
+            return validate_retrieval_profile(v)
+        return v
+
     @field_validator("document_ids")
     @classmethod
     def check_document_ids(cls, v):
@@ -142,28 +170,50 @@ async def chat_message(request: Request, chat_req: ChatRequest, db: DBSession =
     Send a chat message and receive streaming SSE response.
 
     Args:
-        request: ChatRequest with message, session_id, and optional top_k
+        request: ChatRequest with message, session_id, and optional top_k,
+                 retrieval profile and overrides
         db: Database session (injected)
 
     Returns:
-        StreamingResponse: Server-Sent Events stream of response chunks
+        StreamingResponse: Server-Sent Events stream of response chunks,
+        followed by a cached event (answer replayed from the answer
+        cache), a timings event (when STAGE_TIMINGS_ENABLED) and done
     """
     # Get session from database (or auto-create via frontend-authoritative pattern)
     session = get_session_db(db, chat_req.session_id)
     conversation_history = session.messages if session else []
+    # Older turns reach the model as a rolling summary (HISTORY_COMPACTION_*)
+    summary = get_session_summary(db, chat_req.session_id) if session else None
+    prompt_history = compact_history(conversation_history, summary)
+    options = resolve_retrieval_options(
+        chat_req.profile, chat_req.top_k,
+        candidate_count=chat_req.candidate_count, bm25_top_k=chat_req.bm25_top_k,
+        rerank=chat_req.rerank, rerank_timeout_ms=chat_req.rerank_timeout_ms,
+        mmr=chat_req.mmr, mmr_threshold=chat_req.mmr_threshold,
+        rewrite=chat_req.rewrite, hyde=chat_req.hyde,
+    )
 
     async def event_generator():
         """Generate SSE events from RAG response stream"""
         accumulated_response = ""
+        timings = new_timings()
+        cached = False
+        SSE_STREAMS_IN_FLIGHT.inc()
+
+        def mark_cached():
+            nonlocal cached
+            cached = True
 
         try:
             # Stream RAG response
             async for chunk in generate_rag_response(
                 query=chat_req.message,
-                conversation_history=conversation_history,
-                top_k=chat_req.top_k,
+                conversation_history=prompt_history,
                 model=chat_req.model,
                 document_ids=chat_req.document_ids,
+                timings=timings,
+                options=options,
+                on_cached=mark_cached,
             ):
                 accumulated_response += chunk
 
@@ -178,12 +228,23 @@ async def chat_message(request: Request, chat_req: ChatRequest, db: DBSession =
 
             update_session_messages(db, chat_req.session_id, updated_messages)
 
+            if cached:
+                yield f"data: {json.dumps({'cached': True})}\n\n"
+
+            # Per-stage latency breakdown
+            log_timings("chat", timings, session_id=chat_req.session_id)
+            observe_stage_timings("chat", timings)
+            if timings.enabled:
+                yield f"data: {json.dumps({'timings': timings.as_dict()})}\n\n"
+
             # Send completion signal
             yield f"data: {json.dumps({'done': True})}\n\n"
 
         except Exception as e:
             # Send error to client
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            SSE_STREAMS_IN_FLIGHT.dec()
 
     return StreamingResponse(
         event_generator(),
@@ -193,4 +254,9 @@ async def chat_message(request: Request, chat_req: ChatRequest, db: DBSession =
             "Connection": "keep-alive",
             "X-Accel-Buffering": "no",
         },
+        # Fold turns that left the recent window into the summary after
+        # the response has been sent
+        background=BackgroundTask(
+            refresh_session_summary, chat_req.session_id, chat_req.model
+        ) if HISTORY_COMPACTION_ENABLED else None,
     )
@@ -1,6 +1,7 @@
 import uuid
 import os
 import logging
+import time
 from pathlib import Path
 from fastapi import APIRouter, UploadFile, HTTPException
 from starlette.requests import Request
@@ -19,10 +20,15 @@ from services.document_service import (
 )
 from config import CONTEXTUAL_RETRIEVAL_ENABLED
 from services.chunking_service import chunk_document
+from services.token_service import count_tokens
 from services.contextual_retrieval_service import generate_chunk_contexts
 from services.embedding_service import generate_embeddings
 from services.vector_service import add_chunks, delete_document_vectors
 from services import bm25_index_service
+from services import chunk_artifact_service
+from services import reranker_service
+from services import late_interaction_service
+from services import metrics_service
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -100,12 +106,14 @@ async def upload_document(request: Request, file: UploadFile):
     # Trigger ingestion pipeline if extraction succeeded
     indexing_status = "pending"
     if extraction_status == "success" and text_content:
+        ingest_started = time.perf_counter()
         try:
             # Two-pass chunking: children for embedding, parents for LLM context
             chunk_result = chunk_document(text_content)
             child_chunks = chunk_result["child_chunks"]
             parent_texts = chunk_result["parent_texts"]
             child_to_parent_index = chunk_result["child_to_parent_index"]
+            child_token_counts = chunk_result["child_token_counts"]
 
             # Contextual retrieval: generate context prefixes (CXRET-01, D-07)
             context_prefixes = [""] * len(child_chunks)
@@ -118,6 +126,8 @@ async def upload_document(request: Request, file: UploadFile):
             for i, chunk in enumerate(child_chunks):
                 if context_prefixes[i]:
                     chunks_for_embedding.append(f"{context_prefixes[i]}\n\n{chunk}")
+                    # Stored text includes the prefix; recount that chunk only
+                    child_token_counts[i] = count_tokens(chunks_for_embedding[i])
                 else:
                     chunks_for_embedding.append(chunk)
 
@@ -128,11 +138,29 @@ async def upload_document(request: Request, file: UploadFile):
                 parent_texts=parent_texts,
                 child_to_parent_index=child_to_parent_index,
                 context_prefixes=context_prefixes,
+                token_counts=child_token_counts,
+                parent_token_counts=chunk_result["parent_token_counts"],
             )
             # Build BM25 index on context-enriched chunks for keyword matching
             chunk_ids = [f"{doc_id}_chunk_{i}" for i in range(len(child_chunks))]
             bm25_index_service.add_document(doc_id, chunks_for_embedding, chunk_ids)
             indexing_status = "indexed"
+            metrics_service.INGESTED_DOCUMENTS.inc()
+            metrics_service.INGESTED_CHUNKS.inc(len(child_chunks))
+            metrics_service.INGESTION_DURATION.observe(time.perf_counter() - ingest_started)
+
+            # Pre-tokenize chunks for the cross-encoder; a failure here only
+            # costs query-time tokenization, so it never fails indexing
+            try:
+                reranker_service.build_token_cache(doc_id, chunks_for_embedding)
+            except Exception as e:
+                logger.warning(f"Reranker token cache failed for doc {doc_id}: {str(e)}")
+
+            # Precompute late-interaction token vectors (config-gated)
+            try:
+                late_interaction_service.build_vector_cache(doc_id, chunks_for_embedding)
+            except Exception as e:
+                logger.warning(f"Token vector cache failed for doc {doc_id}: {str(e)}")
         except Exception as e:
             # Log error but don't fail upload - graceful degradation
             logger.warning(f"Indexing failed for doc {doc_id}: {str(e)}")
@@ -190,6 +218,12 @@ async def delete_document_endpoint(request: Request, doc_id: str):
     except Exception as e:
         logger.warning(f"BM25 cleanup failed for doc {doc_id}: {str(e)}")
 
+    # Clean up precomputed chunk artifacts (token ids, token vectors)
+    try:
+        chunk_artifact_service.delete_artifacts(doc_id)
+    except Exception as e:
+        logger.warning(f"Chunk artifact cleanup failed for doc {doc_id}: {str(e)}")
+
     deleted = await delete_document(doc_id)
 
     if not deleted:
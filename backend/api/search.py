@@ -1,75 +1,320 @@
 """
 Search API endpoint for semantic document retrieval.
 
-Provides GET /search endpoint for querying documents using semantic similarity.
+Provides GET /search endpoint for querying documents using semantic similarity,
+GET /search/stream for progressive (fused, then reranked) SSE results, and
+POST /search/batch for many queries with shared embedding and rerank passes.
 """
 
+import dataclasses
+import json
+from typing import Optional
 from uuid import UUID
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, field_validator
 from starlette.requests import Request
-from models.search import SearchResult, SearchResponse
-from services.retrieval_service import search_documents
+from config import BATCH_SEARCH_MAX_QUERIES, SEARCH_STREAM_RERANKER_TIMEOUT_MS
+from models.search import SearchResult, SearchResponse, BatchSearchResponse
+from services.retrieval_service import (
+    RetrievalOptions, asearch_documents, asearch_documents_batch, astream_search,
+    resolve_retrieval_options,
+)
+from services.timing_service import new_timings, log_timings
+from services.metrics_service import observe_stage_timings
 from rate_limiter import limiter
+from validators import validate_retrieval_profile, validate_uuid
 
 router = APIRouter()
 
 
+class BatchSearchQuery(BaseModel):
+    """One query in a batch search request"""
+
+    q: str = Field(..., min_length=1, max_length=1000)
+    doc_ids: Optional[list[str]] = Field(None, max_length=50)
+
+    @field_validator("doc_ids")
+    @classmethod
+    def check_doc_ids(cls, v):
+        if v is not None:
+            for doc_id in v:
+                validate_uuid(doc_id)
+        return v
+
+
+class BatchSearchRequest(BaseModel):
+    """Request body for batch search endpoint"""
+
+    queries: list[BatchSearchQuery] = Field(
+        ..., min_length=1, max_length=BATCH_SEARCH_MAX_QUERIES
+    )
+    top_k: Optional[int] = Field(None, ge=1, le=20)
+    profile: Optional[str] = Field(None, max_length=50)
+    candidate_count: Optional[int] = Field(None, ge=1, le=200)
+    bm25_top_k: Optional[int] = Field(None, ge=1, le=200)
+    rerank: Optional[bool] = None
+    rerank_timeout_ms: Optional[int] = Field(None, ge=1, le=60_000)
+    mmr: Optional[bool] = None
+    mmr_threshold: Optional[float] = Field(None, gt=0, le=1)
+
+    @field_validator("profile")
+    @classmethod
+    def check_profile(cls, v):
+        if v is not None:
+            return validate_retrieval_profile(v)
+        return v
+
+
+def _parse_doc_ids(doc_ids: Optional[str]) -> Optional[list[str]]:
+    """Split comma-separated doc_ids, raising 422 on any non-UUID."""
+    if not doc_ids:
+        return None
+    parsed_doc_ids = [doc_id.strip() for doc_id in doc_ids.split(',') if doc_id.strip()]
+    # Validate each doc_id as UUID
+    for did in parsed_doc_ids:
+        try:
+            UUID(did)
+        except ValueError:
+            raise HTTPException(
+                status_code=422, detail=f"Invalid document ID format: {did}"
+            )
+    return parsed_doc_ids
+
+
+def _resolve_options(profile: Optional[str], top_k: Optional[int], **overrides) -> RetrievalOptions:
+    """Resolve a retrieval profile plus overrides, raising 422 on an unknown profile."""
+    try:
+        return resolve_retrieval_options(profile, top_k, **overrides)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def _embedding_unavailable(e: RuntimeError) -> Optional[HTTPException]:
+    """Map an Ollama embedding failure to 503 (None for other errors)."""
+    if "Ollama" in str(e) or "embedding" in str(e).lower():
+        return HTTPException(
+            status_code=503,
+            detail="Embedding service unavailable. Please ensure Ollama is running."
+        )
+    return None
+
+
 @router.get("/search", response_model=SearchResponse)
 @limiter.limit("60/minute")
 async def search(
     request: Request,
     q: str = Query(..., min_length=1, max_length=1000, description="Search query text"),
-    top_k: int = Query(5, ge=1, le=20, description="Maximum results to return"),
+    top_k: Optional[int] = Query(None, ge=1, le=20, description="Maximum results to return"),
     doc_ids: str = Query(None, description="Comma-separated document IDs to filter"),
+    profile: Optional[str] = Query(None, max_length=50, description="Retrieval profile (fast, balanced, thorough)"),
+    candidate_count: Optional[int] = Query(None, ge=1, le=200, description="Fused candidates sent to the reranker"),
+    bm25_top_k: Optional[int] = Query(None, ge=1, le=200, description="BM25 candidates"),
+    rerank: Optional[bool] = Query(None, description="Rerank fused candidates"),
+    rerank_timeout_ms: Optional[int] = Query(None, ge=1, le=60_000, description="Reranker deadline (ms)"),
+    mmr: Optional[bool] = Query(None, description="Drop near-duplicate results (MMR)"),
+    mmr_threshold: Optional[float] = Query(None, gt=0, le=1, description="MMR duplicate similarity"),
 ):
     """
     Search for relevant document chunks using semantic similarity.
 
     Args:
         q: Search query text (required)
-        top_k: Maximum number of results (1-20, default: 5)
+        top_k: Maximum number of results (1-20, default: profile's, 5)
         doc_ids: Optional comma-separated document IDs for filtering
+        profile: Optional retrieval profile (RETRIEVAL_PROFILES, default
+                 DEFAULT_RETRIEVAL_PROFILE)
+        candidate_count, bm25_top_k, rerank, rerank_timeout_ms, mmr,
+        mmr_threshold: Optional overrides of the profile's settings
 
     Returns:
-        SearchResponse with query, results list, and total count
+        SearchResponse with query, results list, total count and
+        per-stage timings (when STAGE_TIMINGS_ENABLED)
 
     Raises:
         400: Missing or invalid query parameter
+        422: Invalid document ID or unknown profile
         503: Embedding service (Ollama) unavailable
     """
-    # Parse doc_ids if provided
-    parsed_doc_ids = None
-    if doc_ids:
-        parsed_doc_ids = [doc_id.strip() for doc_id in doc_ids.split(',') if doc_id.strip()]
-        # Validate each doc_id as UUID
-        for did in parsed_doc_ids:
-            try:
-                UUID(did)
-            except ValueError:
-                raise HTTPException(
-                    status_code=422, detail=f"Invalid document ID format: {did}"
-                )
+    parsed_doc_ids = _parse_doc_ids(doc_ids)
+    options = _resolve_options(
+        profile, top_k, candidate_count=candidate_count, bm25_top_k=bm25_top_k,
+        rerank=rerank, rerank_timeout_ms=rerank_timeout_ms,
+        mmr=mmr, mmr_threshold=mmr_threshold,
+    )
 
     # Execute search
+    timings = new_timings()
     try:
-        results = search_documents(
+        results = await asearch_documents(
             query=q,
-            top_k=top_k,
-            doc_ids=parsed_doc_ids
+            doc_ids=parsed_doc_ids,
+            timings=timings,
+            options=options,
         )
     except RuntimeError as e:
         # Ollama embedding service unavailable
-        if "Ollama" in str(e) or "embedding" in str(e).lower():
-            raise HTTPException(
-                status_code=503,
-                detail="Embedding service unavailable. Please ensure Ollama is running."
-            ) from e
+        unavailable = _embedding_unavailable(e)
+        if unavailable:
+            raise unavailable from e
         raise
 
     # Format response
     search_results = [SearchResult(**result) for result in results]
+    log_timings(
+        "search", timings,
+        retrieval_method=results[0]["retrieval_method"] if results else None,
+        total_results=len(search_results),
+    )
+    observe_stage_timings("search", timings)
     return SearchResponse(
         query=q,
         results=search_results,
-        total_results=len(search_results)
+        total_results=len(search_results),
+        timings=timings.as_dict(),
+    )
+
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+@limiter.limit("10/minute")
+async def search_batch(request: Request, batch_req: BatchSearchRequest):
+    """
+    Search many queries in one request.
+
+    Queries are embedded in one call, retrieved together and reranked in
+    one combined cross-encoder batch; results come back in request order.
+
+    Args:
+        batch_req: Queries (each with optional doc_ids), top_k, and an
+                   optional retrieval profile and overrides shared by all
+
+    Returns:
+        BatchSearchResponse with one SearchResponse per query
+
+    Raises:
+        422: Invalid document ID, unknown profile or too many queries
+        503: Embedding service (Ollama) unavailable
+    """
+    options = _resolve_options(
+        batch_req.profile, batch_req.top_k,
+        candidate_count=batch_req.candidate_count, bm25_top_k=batch_req.bm25_top_k,
+        rerank=batch_req.rerank, rerank_timeout_ms=batch_req.rerank_timeout_ms,
+        mmr=batch_req.mmr, mmr_threshold=batch_req.mmr_threshold,
+    )
+    timings = new_timings()
+    try:
+        batch_results = await asearch_documents_batch(
+            [item.q for item in batch_req.queries],
+            [item.doc_ids for item in batch_req.queries],
+            timings=timings,
+            options=options,
+        )
+    except RuntimeError as e:
+        unavailable = _embedding_unavailable(e)
+        if unavailable:
+            raise unavailable from e
+        raise
+
+    responses = []
+    for item, results in zip(batch_req.queries, batch_results):
+        search_results = [SearchResult(**result) for result in results]
+        responses.append(SearchResponse(
+            query=item.q,
+            results=search_results,
+            total_results=len(search_results),
+        ))
+
+    log_timings("search_batch", timings, total_queries=len(responses))
+    observe_stage_timings("search_batch", timings)
+    return BatchSearchResponse(
+        results=responses,
+        total_queries=len(responses),
+        timings=timings.as_dict(),
+    )
+
+
+@router.get("/search/stream")
+@limiter.limit("60/minute")
+async def search_stream(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=1000, description="Search query text"),
+    top_k: Optional[int] = Query(None, ge=1, le=20, description="Maximum results to return"),
+    doc_ids: str = Query(None, description="Comma-separated document IDs to filter"),
+    profile: Optional[str] = Query(None, max_length=50, description="Retrieval profile (fast, balanced, thorough)"),
+    candidate_count: Optional[int] = Query(None, ge=1, le=200, description="Fused candidates sent to the reranker"),
+    bm25_top_k: Optional[int] = Query(None, ge=1, le=200, description="BM25 candidates"),
+    rerank: Optional[bool] = Query(None, description="Rerank fused candidates"),
+    rerank_timeout_ms: Optional[int] = Query(None, ge=1, le=60_000, description="Reranker deadline (ms)"),
+    mmr: Optional[bool] = Query(None, description="Drop near-duplicate results (MMR)"),
+    mmr_threshold: Optional[float] = Query(None, gt=0, le=1, description="MMR duplicate similarity"),
+):
+    """
+    Progressive search over Server-Sent Events.
+
+    Sends the fused RRF ranking as soon as retrieval finishes, then the
+    reranked ranking. Unless rerank_timeout_ms is given, the reranker
+    deadline is at least SEARCH_STREAM_RERANKER_TIMEOUT_MS.
+    Each results event carries stage ('fused' | 'final') and
+    retrieval_method so clients know which ranking they are showing.
+
+    Args:
+        q: Search query text (required)
+        top_k: Maximum number of results (1-20, default: profile's, 5)
+        doc_ids: Optional comma-separated document IDs for filtering
+        profile: Optional retrieval profile (RETRIEVAL_PROFILES, default
+                 DEFAULT_RETRIEVAL_PROFILE)
+        candidate_count, bm25_top_k, rerank, rerank_timeout_ms, mmr,
+        mmr_threshold: Optional overrides of the profile's settings
+
+    Returns:
+        StreamingResponse: results events, a timings event (when
+        STAGE_TIMINGS_ENABLED), then done; or an error event
+    """
+    parsed_doc_ids = _parse_doc_ids(doc_ids)
+    options = _resolve_options(
+        profile, top_k, candidate_count=candidate_count, bm25_top_k=bm25_top_k,
+        rerank=rerank, rerank_timeout_ms=rerank_timeout_ms,
+        mmr=mmr, mmr_threshold=mmr_threshold,
+    )
+    if rerank_timeout_ms is None:
+        # Fused results are already on screen, so the reranker can wait longer
+        options = dataclasses.replace(options, rerank_timeout_ms=max(
+            options.rerank_timeout_ms, SEARCH_STREAM_RERANKER_TIMEOUT_MS
+        ))
+
+    async def event_generator():
+        """Generate SSE events as each ranking becomes available"""
+        timings = new_timings()
+        retrieval_method = None
+        try:
+            async for results, final in astream_search(
+                q, parsed_doc_ids, timings=timings, options=options,
+            ):
+                search_results = [SearchResult(**result).model_dump() for result in results]
+                retrieval_method = results[0]["retrieval_method"] if results else None
+                event = {
+                    "stage": "final" if final else "fused",
+                    "retrieval_method": retrieval_method,
+                    "results": search_results,
+                    "total_results": len(search_results),
+                }
+                yield f"data: {json.dumps(event)}\n\n"
+
+            log_timings("search_stream", timings, retrieval_method=retrieval_method)
+            observe_stage_timings("search_stream", timings)
+            if timings.enabled:
+                yield f"data: {json.dumps({'timings': timings.as_dict()})}\n\n"
+            yield f"data: {json.dumps({'done': True})}\n\n"
+
+        except Exception as e:
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
     )
@@ -0,0 +1,73 @@
+"""
+Benchmark batch search throughput against sequential single searches.
+
+Runs the same queries through asearch_documents one at a time and through
+asearch_documents_batch in batches, against the real pipeline (Ollama
+embeddings, ChromaDB, BM25, cross-encoder), and reports queries/sec.
+The result cache is disabled so both paths do the full work.
+
+Usage (from backend/):
+    python -m benchmarks.batch_search_benchmark queries.jsonl [--batch-size 32]
+
+Each JSONL line:
+    {"query": "...", "doc_ids": ["<doc_id>", ...]}   # doc_ids optional
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from services import retrieval_service
+
+
+async def _sequential(items: list[dict]) -> float:
+    start = time.perf_counter()
+    for item in items:
+        await retrieval_service.asearch_documents(item["query"], doc_ids=item.get("doc_ids"))
+    return time.perf_counter() - start
+
+
+async def _batched(items: list[dict], batch_size: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, len(items), batch_size):
+        batch = items[offset:offset + batch_size]
+        await retrieval_service.asearch_documents_batch(
+            [item["query"] for item in batch],
+            [item.get("doc_ids") for item in batch],
+        )
+    return time.perf_counter() - start
+
+
+async def _run(items: list[dict], batch_size: int, warmup: int) -> None:
+    # Untimed warmup loads the reranker and warms ChromaDB
+    for item in items[:warmup]:
+        await retrieval_service.asearch_documents(item["query"], doc_ids=item.get("doc_ids"))
+
+    sequential = await _sequential(items)
+    batched = await _batched(items, batch_size)
+
+    print(f"{len(items)} queries, batch size {batch_size}\n")
+    print(f"{'mode':<14}{'seconds':>10}{'queries/s':>12}")
+    print(f"{'sequential':<14}{sequential:>10.2f}{len(items) / sequential:>12.1f}")
+    print(f"{'batch':<14}{batched:>10.2f}{len(items) / batched:>12.1f}")
+    print(f"\nspeedup: {sequential / batched:.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("queries", help="JSONL file of queries")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=2,
+                        help="Untimed single searches before measuring")
+    args = parser.parse_args()
+
+    with open(args.queries) as f:
+        items = [json.loads(line) for line in f if line.strip()]
+
+    retrieval_service.SEARCH_CACHE_ENABLED = False
+    asyncio.run(_run(items, args.batch_size, args.warmup))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark time-to-first-token across a chat session for each prompt layout.
+
+Replays the same synthetic 10-turn session (new documents every turn,
+growing history) through rag_service.build_prompt_messages with the
+"context_first" and "cache_friendly" layouts and measures, per turn, how
+much of the prompt prefix the model could reuse from its KV cache and the
+resulting TTFT.
+
+By default the model is a local stand-in that keeps the previous prompt's
+tokens (one cache slot, as an Ollama runner with OLLAMA_NUM_PARALLEL=1),
+reuses their longest common prefix and charges a fixed prefill cost per
+new token. With --ollama MODEL the same prompts go to a real Ollama model:
+TTFT is measured and prompt_eval_count (tokens actually prefilled) is
+reported instead of the stand-in's reuse.
+
+Usage (from backend/):
+    python -m benchmarks.prompt_layout_benchmark [--turns 10] [--docs 5]
+        [--prefill-ms 0.5] [--ollama llama3:8b]
+"""
+
+import argparse
+import random
+import re
+import statistics
+import time
+
+import ollama_client
+from services.rag_service import SOURCES_FOOTER, build_prompt_messages
+
+LAYOUTS = ("context_first", "cache_friendly")
+_WORDS = (
+    "revenue quarter growth margin cost supplier contract region forecast "
+    "policy audit risk customer segment pricing inventory demand capacity "
+    "report analysis trend baseline target variance estimate schedule"
+).split()
+
+
+def _tokens(text: str) -> list[str]:
+    """Word/punctuation tokens; a stand-in for the model tokenizer."""
+    return re.findall(r"\w+|[^\w\s]", text)
+
+
+def _render(messages: list[dict]) -> list[str]:
+    """Flatten messages the way a chat template would."""
+    tokens = []
+    for message in messages:
+        tokens += ["<|", message["role"], "|>"] + _tokens(message["content"])
+    return tokens
+
+
+class PrefixCacheModel:
+    """Stand-in model server: one KV cache slot, linear prefill cost."""
+
+    def __init__(self, prefill_ms_per_token: float, base_ms: float = 20.0):
+        self.prefill_ms_per_token = prefill_ms_per_token
+        self.base_ms = base_ms
+        self._cached: list[str] = []
+
+    def first_token(self, messages: list[dict]) -> tuple[float, int, int]:
+        """Returns (TTFT ms, prompt tokens, tokens reused from the cache)."""
+        prompt = _render(messages)
+        reused = 0
+        for cached, token in zip(self._cached, prompt):
+            if cached != token:
+                break
+            reused += 1
+        self._cached = prompt
+        ttft = self.base_ms + (len(prompt) - reused) * self.prefill_ms_per_token
+        return ttft, len(prompt), reused
+
+
+class OllamaModel:
+    """
+    Real Ollama model; reports prompt_eval_count as prefilled tokens.
+
+    Goes through ollama_client, so the calls use the pooled client, the
+    model's options profile (num_ctx) and keep_alive, as chat does.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def first_token(self, messages: list[dict]) -> tuple[float, int, int]:
+        prompt_tokens = len(_render(messages))
+        start = time.perf_counter()
+        ttft = None
+        prefilled = None
+        for chunk in ollama_client.chat(
+            self.model, messages,
+            options={"temperature": 0, "num_predict": 8}, stream=True,
+        ):
+            if ttft is None:
+                ttft = (time.perf_counter() - start) * 1000
+            if chunk.get("done"):
+                prefilled = chunk.get("prompt_eval_count")
+        # Reuse as seen by the server: prompt tokens it did not prefill
+        # (prompt_tokens is the stand-in tokenizer's count, so approximate)
+        reused = max(0, prompt_tokens - prefilled) if prefilled is not None else 0
+        return ttft or 0.0, prompt_tokens, reused
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)) + "."
+
+
+def _session(turns: int, docs: int, seed: int = 7) -> list[tuple[str, str, str]]:
+    """(question, formatted context, answer) per turn, identical per layout."""
+    rng = random.Random(seed)
+    session = []
+    for turn in range(turns):
+        context = "\n\n".join(
+            f"[Doc {n}] Source: report_{turn}_{n}.pdf (Section {n}/{docs}):\n{_text(rng, 220)}"
+            for n in range(1, docs + 1)
+        )
+        answer = _text(rng, 120) + " [Doc 1]" + SOURCES_FOOTER + f"- [Doc 1]: report_{turn}_1.pdf\n"
+        session.append((f"Question {turn}: {_text(rng, 12)}", context, answer))
+    return session
+
+
+def _replay(model, layout: str, session, docs: int) -> list[tuple[float, int, int]]:
+    history: list[dict] = []
+    measurements = []
+    for question, context, answer in session:
+        messages = build_prompt_messages(question, context, docs, history, layout=layout)
+        measurements.append(model.first_token(messages))
+        # History as chat.py replays it: answers without the sources footer
+        history += [
+            {"role": "user", "content": question},
+            {"role": "assistant", "content": answer.split(SOURCES_FOOTER, 1)[0]},
+        ]
+    return measurements
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--docs", type=int, default=5, help="Documents per turn")
+    parser.add_argument("--prefill-ms", type=float, default=0.5,
+                        help="Stand-in prefill cost per token")
+    parser.add_argument("--ollama", metavar="MODEL",
+                        help="Measure against a real Ollama model instead")
+    args = parser.parse_args()
+
+    session = _session(args.turns, args.docs)
+    print(f"{args.turns} turns, {args.docs} documents per turn, "
+          f"{'ollama ' + args.ollama if args.ollama else 'stand-in model'}\n")
+
+    summary = {}
+    for layout in LAYOUTS:
+        model = OllamaModel(args.ollama) if args.ollama else PrefixCacheModel(args.prefill_ms)
+        measurements = _replay(model, layout, session, args.docs)
+        print(f"{layout}")
+        print(f"{'turn':>6}{'prompt':>10}{'reused':>10}{'reuse %':>10}{'TTFT ms':>10}")
+        for turn, (ttft, prompt, reused) in enumerate(measurements, 1):
+            print(f"{turn:>6}{prompt:>10}{reused:>10}{100 * reused / prompt:>10.1f}{ttft:>10.1f}")
+        summary[layout] = (
+            statistics.mean(m[0] for m in measurements),
+            sum(m[2] for m in measurements) / sum(m[1] for m in measurements),
+        )
+        print()
+
+    print(f"{'layout':<16}{'mean TTFT ms':>14}{'reuse %':>10}")
+    for layout, (ttft, reuse) in summary.items():
+        print(f"{layout:<16}{ttft:>14.1f}{100 * reuse:>10.1f}")
+    baseline, candidate = summary["context_first"][0], summary["cache_friendly"][0]
+    print(f"\nTTFT speedup (cache_friendly): {baseline / candidate:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
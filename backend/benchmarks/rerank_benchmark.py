@@ -0,0 +1,107 @@
+"""
+Benchmark rerank strategies: latency versus NDCG on a labeled query set.
+
+Runs the real retrieval pipeline (Ollama embeddings, ChromaDB, BM25) up to
+the rerank stage once per query, then scores the same candidate list with
+each strategy: RRF order (no rerank), the cross-encoder, and the
+late-interaction MaxSim reranker.
+
+Usage (from backend/):
+    python -m benchmarks.rerank_benchmark queries.jsonl [--k 5] [--warmup 2]
+
+Each JSONL line:
+    {"query": "...", "relevant_chunk_ids": ["<doc_id>_chunk_3", ...],
+     "doc_ids": ["<doc_id>", ...]}          # doc_ids optional
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import math
+import statistics
+import time
+
+from config import RERANK_OUTPUT_SIZE
+from services.embedding_service import generate_embeddings
+from services.retrieval_service import _retrieve_candidates
+from services import reranker_service
+from services import late_interaction_service
+
+
+def _ndcg_at_k(ranked_ids: list[str], relevant_ids: set[str], k: int) -> float:
+    """Binary-relevance NDCG@k."""
+    dcg = sum(
+        1.0 / math.log2(rank + 2)
+        for rank, chunk_id in enumerate(ranked_ids[:k])
+        if chunk_id in relevant_ids
+    )
+    ideal = sum(1.0 / math.log2(rank + 2) for rank in range(min(len(relevant_ids), k)))
+    return dcg / ideal if ideal else 0.0
+
+
+def _rrf_order(query: str, candidates: list[dict], top_k: int) -> list[dict]:
+    """Baseline: keep fused RRF order."""
+    return candidates[:top_k]
+
+
+STRATEGIES = {
+    "rrf_only": _rrf_order,
+    "cross_encoder": reranker_service.rerank,
+    "late_interaction": late_interaction_service.rerank,
+}
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("queries", help="JSONL file of labeled queries")
+    parser.add_argument("--k", type=int, default=RERANK_OUTPUT_SIZE)
+    parser.add_argument("--warmup", type=int, default=2,
+                        help="Untimed queries per strategy (model loading)")
+    args = parser.parse_args()
+
+    with open(args.queries) as f:
+        labeled = [json.loads(line) for line in f if line.strip()]
+
+    # Retrieve candidates once so every strategy sees identical inputs
+    embeddings = generate_embeddings([item["query"] for item in labeled])
+    workload = []
+    for item, embedding in zip(labeled, embeddings):
+        candidates, _ = asyncio.run(
+            _retrieve_candidates(item["query"], embedding, item.get("doc_ids"))
+        )
+        if candidates:
+            workload.append((item, candidates))
+
+    print(f"{len(workload)} queries with candidates, NDCG@{args.k}\n")
+    print(f"{'strategy':<18}{'p50 ms':>10}{'p95 ms':>10}{'NDCG':>10}")
+
+    for name, rerank in STRATEGIES.items():
+        for item, candidates in workload[:args.warmup]:
+            rerank(item["query"], copy.deepcopy(candidates), args.k)
+
+        latencies, ndcgs = [], []
+        for item, candidates in workload:
+            batch = copy.deepcopy(candidates)
+            start = time.perf_counter()
+            ranked = rerank(item["query"], batch, args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            ndcgs.append(_ndcg_at_k(
+                [result["chunk_id"] for result in ranked],
+                set(item["relevant_chunk_ids"]),
+                args.k,
+            ))
+
+        print(
+            f"{name:<18}{_percentile(latencies, 0.5):>10.1f}"
+            f"{_percentile(latencies, 0.95):>10.1f}{statistics.mean(ndcgs):>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark chat time-to-first-token with and without speculative retrieval.
+
+Replays a mix of conversational queries through generate_rag_response
+against the real pipeline (Ollama classification/rewrite/HyDE, embeddings,
+ChromaDB, BM25, reranker, chat model), once with SPECULATIVE_RETRIEVAL_ENABLED
+off and once on, and reports TTFT (first streamed chunk) percentiles and
+how often the speculative results were used. The search, rewrite and
+answer caches are disabled so both modes do the full classification,
+rewrite and retrieval work; otherwise the first pass would fill them and
+the second would skip its LLM calls.
+
+Usage (from backend/):
+    python -m benchmarks.speculative_retrieval_benchmark sessions.jsonl [--warmup 2]
+
+Each JSONL line:
+    {"query": "...", "history": [{"role": "user", "content": "..."}, ...],
+     "doc_ids": ["<doc_id>", ...]}          # doc_ids optional
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from services import (
+    metrics_service, query_rewrite_service, rag_service, retrieval_service,
+)
+
+OUTCOMES = ("used", "cancelled", "failed")
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _ttft(item: dict) -> float:
+    """Milliseconds until the first chunk; the rest of the answer is drained."""
+    start = time.perf_counter()
+    first = None
+    async for _ in rag_service.generate_rag_response(
+        item["query"], item.get("history", []), document_ids=item.get("doc_ids"),
+    ):
+        if first is None:
+            first = (time.perf_counter() - start) * 1000
+    return first or 0.0
+
+
+async def _replay(items: list[dict], speculative: bool) -> list[float]:
+    rag_service.SPECULATIVE_RETRIEVAL_ENABLED = speculative
+    return [await _ttft(item) for item in items]
+
+
+async def _run(items: list[dict], warmup: int) -> None:
+    # Untimed warmup loads the chat, rewrite and embedding models
+    for item in items[:warmup]:
+        await _ttft(item)
+
+    baseline = await _replay(items, speculative=False)
+    before = {o: metrics_service.SPECULATIVE_RETRIEVALS.value(outcome=o) for o in OUTCOMES}
+    speculative = await _replay(items, speculative=True)
+    outcomes = {
+        o: int(metrics_service.SPECULATIVE_RETRIEVALS.value(outcome=o) - before[o])
+        for o in OUTCOMES
+    }
+
+    print(f"{len(items)} queries\n")
+    print(f"{'mode':<14}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    for name, ttfts in (("sequential", baseline), ("speculative", speculative)):
+        print(
+            f"{name:<14}{_percentile(ttfts, 0.5):>10.1f}"
+            f"{_percentile(ttfts, 0.95):>10.1f}{statistics.mean(ttfts):>10.1f}"
+        )
+    print(f"\nspeculative outcomes: {outcomes}")
+    print(f"mean TTFT saved: {statistics.mean(baseline) - statistics.mean(speculative):.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("sessions", help="JSONL file of queries with history")
+    parser.add_argument("--warmup", type=int, default=2,
+                        help="Untimed queries before measuring")
+    args = parser.parse_args()
+
+    with open(args.sessions) as f:
+        items = [json.loads(line) for line in f if line.strip()]
+
+    retrieval_service.SEARCH_CACHE_ENABLED = False
+    query_rewrite_service.QUERY_REWRITE_CACHE_ENABLED = False
+    rag_service.ANSWER_CACHE_ENABLED = False
+    asyncio.run(_run(items, args.warmup))
+
+
+if __name__ == "__main__":
+    main()
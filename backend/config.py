@@ -1,7 +1,8 @@
 """
 Retrieval pipeline configuration.
 
-Change defaults here; restart required. Per-request overrides via API params.
+Change defaults here; restart required. Per-request overrides via API params
+(retrieval profiles and explicit overrides, see RETRIEVAL_PROFILES).
 """
 
 # Reranker
@@ -10,6 +11,28 @@ RERANKER_USE_FP16 = True
 RERANKER_CANDIDATE_COUNT = 30
 RERANK_OUTPUT_SIZE = 5
 RERANKER_TIMEOUT_MS = 200
+RERANKER_MAX_LENGTH = 512
+RERANKER_BATCH_SIZE = 256              # pairs per forward pass (FlagReranker default)
+RERANKER_TOKEN_CACHE_ENABLED = True   # pre-tokenize chunks at ingest
+CHUNK_ARTIFACT_CACHE_MAX_BYTES = 512 * 1024 * 1024  # in-memory chunk artifacts (LRU)
+
+# Parent-aware candidates: siblings sharing a parent collapse to their best
+# child before reranking; dense search over-fetches to refill the budget
+PARENT_OVERFETCH_FACTOR = 3
+
+# Late-interaction reranking (bge-m3 ColBERT token vectors)
+RERANK_STRATEGY = "cross_encoder"     # 'cross_encoder' | 'late_interaction'
+LATE_INTERACTION_ENABLED = False      # precompute float16 chunk token vectors at ingest
+LATE_INTERACTION_MODEL = "BAAI/bge-m3"
+LATE_INTERACTION_USE_FP16 = True
+
+# Rerank cascade: cheap first pass trims fused candidates before the
+# cross-encoder; each stage has its own timeout and falls back to the
+# previous stage's order
+RERANK_CASCADE_ENABLED = False
+CASCADE_FIRST_STAGE = "embedding"     # 'embedding' (stored cosine) | 'late_interaction'
+CASCADE_FIRST_STAGE_SIZE = 10
+CASCADE_FIRST_STAGE_TIMEOUT_MS = 50
 
 # RRF Fusion
 RRF_K = 60
@@ -19,6 +42,129 @@ RRF_BM25_WEIGHT = 1.0
 # BM25
 BM25_TOP_K = 30
 
+# Adaptive candidate sizing: an EWMA of per-pair reranker latency plus the
+# work already queued decides how many fused candidates fit the rerank
+# deadline (between MIN and MAX; explicit candidate_count disables it)
+RERANK_ADAPTIVE_ENABLED = False
+RERANK_ADAPTIVE_MIN_CANDIDATES = 10
+RERANK_ADAPTIVE_MAX_CANDIDATES = 60
+RERANK_ADAPTIVE_HEADROOM = 0.8        # fraction of the deadline to plan for
+RERANK_LATENCY_EWMA_ALPHA = 0.2
+
+# Rerank early exit: skip the reranker (retrieval_method 'rerank_skipped')
+# when fewer candidates than requested remain, or the top candidate is
+# first in both dense and BM25 and leads the runner-up's fused score by at
+# least MIN_GAP (relative; 0.25 means the runner-up is missing from one list)
+RERANK_EARLY_EXIT_ENABLED = False
+RERANK_EARLY_EXIT_MIN_GAP = 0.25
+
+# MMR diversification after reranking: near-duplicate passages (cosine of
+# stored embeddings >= threshold to a kept one) are dropped before they
+# reach the prompt; per request via mmr / mmr_threshold
+MMR_ENABLED = False
+MMR_LAMBDA = 0.7                      # relevance vs. novelty in MMR ordering
+MMR_DUPLICATE_THRESHOLD = 0.9
+MMR_CHARS_PER_TOKEN = 4               # tokens-saved estimate
+
+# Concurrent retrieval branches: each is joined against its own deadline
+# (measured from search start) so a slow retriever cannot hold up the other
+DENSE_TIMEOUT_MS = 10000   # query embedding + ChromaDB query
+BM25_TIMEOUT_MS = 2000
+
+# Progressive search (GET /api/search/stream): fused results are sent
+# first, so the reranker can be given a longer deadline
+SEARCH_STREAM_RERANKER_TIMEOUT_MS = 1000
+
+# Batch search (POST /api/search/batch)
+BATCH_SEARCH_MAX_QUERIES = 100
+
+# Latency-budget retrieval profiles, selectable per request (?profile= on
+# /api/search, "profile" on chat). Each overrides the globals above; keys
+# are top_k, candidate_count, bm25_top_k, rerank, rerank_timeout_ms,
+# adaptive, early_exit, mmr, mmr_threshold, rewrite (query
+# rewriting/classification) and hyde. Explicit request
+# params override the profile.
+RETRIEVAL_PROFILES = {
+    "fast": {
+        "candidate_count": 10,
+        "bm25_top_k": 10,
+        "rerank": False,
+        "rewrite": False,
+        "hyde": False,
+    },
+    "balanced": {},                       # the config defaults
+    "thorough": {
+        "candidate_count": 50,
+        "bm25_top_k": 50,
+        "rerank": True,
+        "rerank_timeout_ms": 1000,
+        "rewrite": True,
+        "hyde": True,
+    },
+}
+DEFAULT_RETRIEVAL_PROFILE = "balanced"
+
+# Full-result search cache: entries are tagged with the index generation
+# and dropped once any ingest/delete bumps it
+SEARCH_CACHE_ENABLED = True
+SEARCH_CACHE_MAX_ENTRIES = 1024
+SEARCH_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Semantic answer cache (opt-in): a standalone question whose embedding is
+# within ANSWER_CACHE_SIMILARITY of an earlier one, over the same document
+# filter, model and index generation, replays the stored answer
+ANSWER_CACHE_ENABLED = False
+ANSWER_CACHE_SIMILARITY = 0.97        # cosine floor between query embeddings
+ANSWER_CACHE_MAX_ENTRIES = 256
+ANSWER_CACHE_TTL_S = 3600
+
+# Observability: per-stage latency on /search responses, the chat SSE
+# stream and a structured "stage_timings" log line
+STAGE_TIMINGS_ENABLED = True
+
+# Prompt packing (rag_service): total prompt token budget split between
+# system instructions + query, history (newest first, capped at a share)
+# and retrieved contexts (lowest-ranked dropped or tail-cut first). The
+# prompt and the answer share the model's context window, so the budget
+# leaves CONTEXT_OUTPUT_RESERVE_TOKENS free for generation
+CONTEXT_PACKING_ENABLED = True
+CONTEXT_WINDOW_TOKENS = 8192
+CONTEXT_OUTPUT_RESERVE_TOKENS = 1024
+CONTEXT_TOKEN_BUDGET = CONTEXT_WINDOW_TOKENS - CONTEXT_OUTPUT_RESERVE_TOKENS
+CONTEXT_HISTORY_MAX_SHARE = 0.3
+CONTEXT_MIN_TAIL_TOKENS = 64          # shorter cut tails are dropped instead
+
+# History compaction: the chat model sees a rolling summary of older
+# turns plus at least the last HISTORY_RECENT_MESSAGES verbatim; the
+# summary is updated in the background after responses
+HISTORY_COMPACTION_ENABLED = True
+HISTORY_RECENT_MESSAGES = 6           # 3 user/assistant turns
+HISTORY_SUMMARY_MODEL = None          # None = the session's chat model
+HISTORY_SUMMARY_MAX_TOKENS = 300
+# The summary advances only once this many messages have left the recent
+# window; in between, replayed history only grows (append-only prefix)
+HISTORY_SUMMARY_BATCH_MESSAGES = 6
+
+# Prompt layout (rag_service.build_prompt_messages):
+#   "context_first":  system message with instructions + this turn's
+#                     documents, then history, then the question
+#   "cache_friendly": stable instructions, then history, then documents +
+#                     question last, so Ollama can reuse the cached
+#                     prefix (instructions + earlier turns) across turns
+PROMPT_LAYOUT = "context_first"
+
+# Ollama client (ollama_client): one pooled sync and async client shared
+# by every service. Load-time options (num_ctx, ...) come from a single
+# profile per model so calls never disagree and force a runner reload;
+# num_ctx is the context window the prompt budget was carved from, so a
+# fully packed prompt still leaves CONTEXT_OUTPUT_RESERVE_TOKENS to answer
+OLLAMA_HOST = None                    # None = OLLAMA_HOST env / localhost
+OLLAMA_KEEP_ALIVE = "30m"             # keep models loaded between requests
+OLLAMA_TIMEOUT_S = 300
+OLLAMA_MAX_CONNECTIONS = 16
+OLLAMA_DEFAULT_OPTIONS = {"num_ctx": CONTEXT_WINDOW_TOKENS}
+OLLAMA_MODEL_OPTIONS: dict[str, dict] = {}   # model name -> option overrides
+
 # Embedding
 EMBEDDING_MODEL = "bge-m3"
 EMBEDDING_DIMENSIONS = 1024
@@ -47,6 +193,25 @@ CONTEXT_VALIDATION_THRESHOLD = 0.7  # 70% term overlap required (D-06)
 QUERY_REWRITING_ENABLED = True
 QUERY_REWRITE_MODEL = None            # None = use user's selected chat model
 QUERY_REWRITE_HISTORY_WINDOW = 6      # last N messages for context (per D-02)
+QUERY_REWRITE_MODE = "two_step"       # 'two_step' (classify, then rewrite/HyDE) |
+                                      # 'combined' (one structured call; two_step on parse failure)
+QUERY_REWRITE_CACHE_ENABLED = True    # reuse rewrites for a retried turn (same query + history)
+QUERY_REWRITE_CACHE_MAX_ENTRIES = 1024
 CONFIDENCE_GATE_THRESHOLD = 0.4       # cosine similarity floor for rewrites (per D-05)
 HYDE_CONFIDENCE_GATE_THRESHOLD = 0.3  # lower threshold for HyDE passages (per D-05)
 HYDE_PASSAGE_MAX_TOKENS = 150         # num_predict limit for HyDE generation
+# Fast-path classifier in front of the LLM classifier: reference/pivot
+# heuristics, then nearest-centroid over labeled example embeddings and
+# query-to-history similarity; only ambiguous queries reach the LLM. A
+# sample of fast decisions is re-checked by the LLM in the background
+# (agreement rate in /metrics and /health)
+QUERY_FAST_CLASSIFIER_ENABLED = True
+QUERY_FAST_CLASSIFIER_EMBEDDINGS = True     # embedding stage (one embed call)
+QUERY_FAST_CLASSIFIER_MIN_MARGIN = 0.08     # best vs runner-up centroid similarity
+QUERY_FAST_CLASSIFIER_PIVOT_SIMILARITY = 0.35  # below: topic change -> standalone
+QUERY_FAST_CLASSIFIER_SHADOW_RATE = 0.05    # share of fast decisions re-checked
+QUERY_FAST_CLASSIFIER_RETRY_S = 30          # retry a failed centroid embed after
+# Chat: search with the original query while rewriting runs; results are
+# kept when the query passes through unchanged (standalone), cancelled
+# as soon as the classifier says it will be rewritten
+SPECULATIVE_RETRIEVAL_ENABLED = True
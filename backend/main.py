@@ -2,6 +2,7 @@ from contextlib import asynccontextmanager
 import logging
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field, field_validator
 from starlette.requests import Request
@@ -11,7 +12,12 @@ from slowapi.middleware import SlowAPIMiddleware
 from ollama_client import check_ollama_status, test_completion
 from rate_limiter import limiter
 from services.reranker_service import get_reranker_status
+from services.late_interaction_service import get_late_interaction_status
 from services.bm25_index_service import get_bm25_status
+from services.metrics_service import render_metrics
+from services.search_cache_service import get_cache_stats
+from services import rewrite_cache_service, answer_cache_service
+from services.query_classifier_service import get_classifier_stats
 from validators import validate_model_name as _validate_model_name
 from api.documents import router as documents_router
 from api.search import router as search_router
@@ -96,10 +102,10 @@ async def select_model(request: Request, body: ModelSelection):
     """
     # Validate that the model exists by trying to get it
     try:
-        import ollama
+        from ollama_client import show_model
 
         # Try to show the model details to verify it exists
-        ollama.show(body.model_name)
+        show_model(body.model_name)
     except Exception:
         raise HTTPException(
             status_code=400, detail=f"Model '{body.model_name}' not found in Ollama"
@@ -127,9 +133,9 @@ async def list_models(request: Request):
         dict: List of available models
     """
     try:
-        import ollama
+        from ollama_client import list_models
 
-        response = ollama.list()
+        response = list_models()
         models = (
             [model.model for model in response.models]
             if hasattr(response, "models")
@@ -146,7 +152,7 @@ async def root():
     return {
         "message": "Research Agent API",
         "docs": "/docs",
-        "endpoints": ["/health", "/api/ollama/status", "/search", "/chat"],
+        "endpoints": ["/health", "/metrics", "/api/ollama/status", "/search", "/chat"],
     }
 
 
@@ -160,15 +166,28 @@ async def health_check():
         "service": "research-agent-api",
         "components": {
             "reranker": get_reranker_status(),
+            "late_interaction": get_late_interaction_status(),
             "bm25": get_bm25_status(),
         },
         "embedding": {
             "model": EMBEDDING_MODEL,
             "dimensions": EMBEDDING_DIMENSIONS,
         },
+        "search_cache": get_cache_stats(),
+        "rewrite_cache": rewrite_cache_service.get_cache_stats(),
+        "answer_cache": answer_cache_service.get_cache_stats(),
+        "query_classifier": get_classifier_stats(),
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Pipeline metrics in Prometheus text exposition format."""
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.get("/api/ollama/status")
 @limiter.limit("120/minute")
 async def ollama_status(request: Request):
@@ -18,9 +18,11 @@ class SearchResult(BaseModel):
     relevance_score: float  # 0-1 range (higher = more relevant)
     # Diagnostic scores for retrieval pipeline transparency
     reranker_score: Optional[float] = None  # 0-1 normalized cross-encoder score
+    first_pass_score: Optional[float] = None  # cheap cascade scorer score
     bm25_rank: Optional[int] = None  # rank in BM25 results (1-indexed)
     dense_rank: Optional[int] = None  # rank in dense results (1-indexed)
-    retrieval_method: str = "dense"  # 'reranked' | 'rrf_only' | 'dense'
+    rerank_candidates: Optional[int] = None  # candidates sent to the reranker (adaptive sizing)
+    retrieval_method: str = "dense"  # 'reranked' | 'first_pass' | 'rrf_only' | 'rerank_skipped' | 'dense'
 
 
 class SearchResponse(BaseModel):
@@ -28,3 +30,11 @@ class SearchResponse(BaseModel):
     query: str
     results: list[SearchResult]
     total_results: int
+    timings: Optional[dict[str, float]] = None  # per-stage ms (STAGE_TIMINGS_ENABLED)
+
+
+class BatchSearchResponse(BaseModel):
+    """Batch search response: one SearchResponse per query, in request order."""
+    results: list[SearchResponse]
+    total_queries: int
+    timings: Optional[dict[str, float]] = None  # whole-batch stage ms
@@ -1,11 +1,12 @@
 """
 SQLAlchemy session model for chat persistence.
 
-Provides ChatSession model and database setup for storing conversations.
+Provides ChatSession and SessionSummary models and database setup for
+storing conversations.
 """
 
 from datetime import datetime
-from sqlalchemy import create_engine, String, JSON
+from sqlalchemy import create_engine, String, JSON, Integer, Text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, Session
 
 
@@ -39,6 +40,24 @@ class ChatSession(Base):
     messages: Mapped[list] = mapped_column(JSON, default=list)
 
 
+class SessionSummary(Base):
+    """
+    Rolling summary of a session's older turns (history compaction).
+
+    Attributes:
+        session_id: Chat session the summary belongs to
+        summary: Summary text of messages[:summarized_count]
+        summarized_count: Number of leading messages folded into the summary
+        updated_at: ISO format timestamp string
+    """
+    __tablename__ = "session_summaries"
+
+    session_id: Mapped[str] = mapped_column(String, primary_key=True)
+    summary: Mapped[str] = mapped_column(Text, default="")
+    summarized_count: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[str] = mapped_column(String)
+
+
 # Create tables on import
 Base.metadata.create_all(bind=engine)
 
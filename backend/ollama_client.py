@@ -1,18 +1,43 @@
 """
 Ollama client utility for Research Agent backend.
 
-Provides functions to check Ollama service status and test completions.
-Supports configurable model selection.
+Every Ollama call in the backend goes through this module: one shared
+sync client and one async client per event loop, each with a pooled HTTP
+connection, the configured keep_alive, and one options profile per model
+(model_options). Also provides status checks, test completions and the
+globally selected chat model.
 """
 
+import asyncio
+import threading
+
 import ollama
 from typing import Dict, Any, List, AsyncGenerator, Optional
 
+from config import (
+    OLLAMA_HOST, OLLAMA_KEEP_ALIVE, OLLAMA_TIMEOUT_S, OLLAMA_MAX_CONNECTIONS,
+    OLLAMA_DEFAULT_OPTIONS, OLLAMA_MODEL_OPTIONS,
+)
+from services import metrics_service
+
+ResponseError = ollama.ResponseError
+
+# Options that change how a model is loaded; a call that disagrees with
+# the loaded runner makes Ollama reload the model, so these only ever come
+# from the model's profile
+LOAD_OPTIONS = frozenset({
+    "num_ctx", "num_batch", "num_gpu", "main_gpu", "low_vram", "use_mmap",
+    "use_mlock", "num_thread", "numa",
+})
 
 # Default model configuration
 DEFAULT_MODEL = "llama3:8b"
 _selected_model = DEFAULT_MODEL
 
+_client = None
+_async_clients: dict = {}
+_client_lock = threading.Lock()
+
 
 def set_selected_model(model_name: str):
     """
@@ -35,6 +60,89 @@ def get_selected_model() -> str:
     return _selected_model
 
 
+def _client_kwargs() -> Dict[str, Any]:
+    """HTTP settings shared by the sync and async clients."""
+    import httpx  # ollama's own HTTP dependency
+
+    return {
+        "host": OLLAMA_HOST,
+        "timeout": OLLAMA_TIMEOUT_S,
+        "limits": httpx.Limits(
+            max_connections=OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=OLLAMA_MAX_CONNECTIONS,
+        ),
+    }
+
+
+def get_client() -> "ollama.Client":
+    """Shared sync client (thread-safe; used from executors)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ollama.Client(**_client_kwargs())
+    return _client
+
+
+def get_async_client() -> "ollama.AsyncClient":
+    """Shared async client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        # Connections are bound to the loop that opened them
+        for stale in [other for other in _async_clients if other.is_closed()]:
+            del _async_clients[stale]
+        client = _async_clients[loop] = ollama.AsyncClient(**_client_kwargs())
+    return client
+
+
+def model_options(model: str, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Options for a call to model: the model's profile plus per-call options.
+
+    Per-call options may set sampling parameters (temperature,
+    num_predict, ...); load-time options (LOAD_OPTIONS) always come from
+    the profile (OLLAMA_DEFAULT_OPTIONS updated with
+    OLLAMA_MODEL_OPTIONS[model]).
+    """
+    merged = {**OLLAMA_DEFAULT_OPTIONS, **OLLAMA_MODEL_OPTIONS.get(model, {})}
+    for key, value in (options or {}).items():
+        if key not in LOAD_OPTIONS:
+            merged[key] = value
+    return merged
+
+
+def chat(model: str, messages: List[Dict[str, Any]], options: Optional[Dict[str, Any]] = None, **kwargs):
+    """Non-streaming chat through the shared client (kwargs: format, ...)."""
+    return get_client().chat(
+        model=model,
+        messages=messages,
+        options=model_options(model, options),
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        **kwargs,
+    )
+
+
+def embed(model: str, input: List[str]):
+    """Embed texts through the shared client."""
+    return get_client().embed(
+        model=model,
+        input=input,
+        options=model_options(model),
+        keep_alive=OLLAMA_KEEP_ALIVE,
+    )
+
+
+def list_models():
+    """Models available on the Ollama server."""
+    return get_client().list()
+
+
+def show_model(model: str):
+    """Model details; raises ResponseError if the model does not exist."""
+    return get_client().show(model)
+
+
 def check_ollama_status() -> Dict[str, Any]:
     """
     Check if Ollama service is accessible and list available models.
@@ -47,7 +155,7 @@ def check_ollama_status() -> Dict[str, Any]:
     """
     try:
         # Attempt to list models to verify Ollama is accessible
-        response = ollama.list()
+        response = list_models()
 
         # Extract model names from response
         models = []
@@ -77,11 +185,9 @@ def test_completion(model: Optional[str] = None) -> Dict[str, Any]:
     model_to_use: str = model if model is not None else _selected_model
     try:
         # Test with a simple math prompt
-        response = ollama.chat(
-            model=model_to_use,
-            messages=[
-                {"role": "user", "content": "What is 2+2? Answer with just the number."}
-            ],
+        response = chat(
+            model_to_use,
+            [{"role": "user", "content": "What is 2+2? Answer with just the number."}],
         )
 
         # Extract response text
@@ -120,10 +226,16 @@ async def stream_chat_completion(
     # Use provided model or fallback to selected model
     model_to_use: str = model if model is not None else _selected_model
 
-    client = ollama.AsyncClient()
+    client = get_async_client()
 
     try:
-        stream = await client.chat(model=model_to_use, messages=messages, stream=True)
+        stream = await client.chat(
+            model=model_to_use,
+            messages=messages,
+            stream=True,
+            options=model_options(model_to_use),
+            keep_alive=OLLAMA_KEEP_ALIVE,
+        )
 
         async for chunk in stream:
             # Extract content from chunk
@@ -143,4 +255,5 @@ async def stream_chat_completion(
                 yield content
 
     except Exception as e:
+        metrics_service.record_ollama_failure("chat", e)
         raise Exception(f"Ollama streaming error: {str(e)}") from e
@@ -0,0 +1,186 @@
+"""
+Semantic answer cache for repeated standalone questions.
+
+Stores finished chat answers (including the sources footer) with the
+normalized embedding of the question. A later standalone question whose
+embedding is within ANSWER_CACHE_SIMILARITY of a stored one, under the
+same scope (document filter, chat model, retrieval options, pipeline
+config) and the same index generation, replays the stored answer instead
+of retrieving and generating again.
+
+Lookup is one matrix-vector product over a fixed-size NumPy matrix of
+stored embeddings (one row per slot). Bounded by ANSWER_CACHE_MAX_ENTRIES
+(LRU) and ANSWER_CACHE_TTL_S; entries from an older index generation are
+dropped on lookup, like search_cache_service.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from config import (
+    ANSWER_CACHE_SIMILARITY, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_S,
+    PROMPT_LAYOUT,
+)
+from services import metrics_service
+from services.index_generation_service import current_generation
+from services.search_cache_service import PIPELINE_FINGERPRINT
+
+
+@dataclass(frozen=True)
+class CachedAnswer:
+    """A stored answer and the question it was generated for."""
+    query: str
+    chunks: tuple[str, ...]    # as streamed, so a replay looks the same
+    scope: tuple
+    generation: int
+    stored_at: float           # time.monotonic()
+
+
+# Row i of _vectors is the normalized query embedding of _slots[i]
+_vectors: Optional[np.ndarray] = None
+_slots: list[Optional[CachedAnswer]] = []
+_recent: "OrderedDict[int, None]" = OrderedDict()   # occupied slots, LRU first
+_lock = threading.Lock()
+
+CACHE_HITS = metrics_service.Counter(
+    "aira_answer_cache_hits_total", "Chat answers replayed from the answer cache"
+)
+CACHE_MISSES = metrics_service.Counter(
+    "aira_answer_cache_misses_total", "Answer cache lookups without a close enough question"
+)
+CACHE_ENTRIES = metrics_service.Gauge(
+    "aira_answer_cache_entries", "Answers in the answer cache",
+    callback=lambda: len(_recent),
+)
+
+
+def make_scope(
+    doc_ids: Optional[list[str]], model: str, options: tuple = ()
+) -> tuple:
+    """
+    Everything besides the question that changes the answer: sorted doc
+    filter + chat model + retrieval options + pipeline config.
+    """
+    doc_filter = tuple(sorted(doc_ids)) if doc_ids else None
+    return (doc_filter, model, options, PIPELINE_FINGERPRINT, PROMPT_LAYOUT)
+
+
+def _normalize(embedding: list[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+def _free(slot: int) -> None:
+    """Empty one slot (caller holds the lock)."""
+    _slots[slot] = None
+    _vectors[slot] = 0.0
+    _recent.pop(slot, None)
+
+
+def _usable(entry: CachedAnswer, now: float) -> bool:
+    return (
+        entry.generation == current_generation()
+        and now - entry.stored_at <= ANSWER_CACHE_TTL_S
+    )
+
+
+def get(embedding: list[float], scope: tuple) -> Optional[CachedAnswer]:
+    """
+    Find the stored answer to the closest question in scope.
+
+    Args:
+        embedding: Query embedding of the new question
+        scope: From make_scope
+
+    Returns:
+        CachedAnswer whose question is at least ANSWER_CACHE_SIMILARITY
+        similar, or None
+    """
+    now = time.monotonic()
+    with _lock:
+        if _vectors is None or len(embedding) != _vectors.shape[1]:
+            CACHE_MISSES.inc()
+            return None
+        scores = _vectors @ _normalize(embedding)
+        candidates = np.flatnonzero(scores >= ANSWER_CACHE_SIMILARITY)
+        for slot in candidates[np.argsort(-scores[candidates])]:
+            entry = _slots[slot]
+            if entry is None:
+                continue
+            if not _usable(entry, now):
+                _free(int(slot))
+                continue
+            if entry.scope == scope:
+                _recent.move_to_end(int(slot))
+                CACHE_HITS.inc()
+                return entry
+    CACHE_MISSES.inc()
+    return None
+
+
+def put(
+    query: str,
+    embedding: list[float],
+    scope: tuple,
+    generation: int,
+    chunks: list[str],
+) -> None:
+    """
+    Store an answer computed at `generation`.
+
+    The caller captures the generation before retrieving, so an index
+    mutation that lands mid-answer leaves the entry already stale. A
+    stored near-duplicate question in the same scope is replaced.
+    """
+    global _vectors, _slots
+    if generation != current_generation():
+        return
+    vector = _normalize(embedding)
+    entry = CachedAnswer(query, tuple(chunks), scope, generation, time.monotonic())
+    with _lock:
+        if _vectors is None or _vectors.shape[1] != vector.shape[0]:
+            # First entry, or the embedding model changed
+            _vectors = np.zeros((ANSWER_CACHE_MAX_ENTRIES, vector.shape[0]), dtype=np.float32)
+            _slots = [None] * ANSWER_CACHE_MAX_ENTRIES
+            _recent.clear()
+
+        scores = _vectors @ vector
+        slot = next(
+            (int(i) for i in np.flatnonzero(scores >= ANSWER_CACHE_SIMILARITY)
+             if _slots[i] is not None and _slots[i].scope == scope),
+            None,
+        )
+        if slot is None:
+            slot = next((i for i, other in enumerate(_slots) if other is None), None)
+        if slot is None:
+            slot = next(iter(_recent))
+        _free(slot)
+        _slots[slot] = entry
+        _vectors[slot] = vector
+        _recent[slot] = None
+
+
+def clear() -> None:
+    """Drop every entry."""
+    global _vectors, _slots
+    with _lock:
+        _vectors = None
+        _slots = []
+        _recent.clear()
+
+
+def get_cache_stats() -> dict:
+    """Entry count and lifetime hit rate."""
+    hits, misses = CACHE_HITS.value(), CACHE_MISSES.value()
+    lookups = hits + misses
+    return {
+        "entries": len(_recent),
+        "hits": int(hits),
+        "misses": int(misses),
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+    }
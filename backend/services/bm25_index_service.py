@@ -5,6 +5,13 @@ Maintains a BM25Okapi index in memory with disk persistence via pickle.
 Pickle is required here because BM25Okapi objects cannot be serialized
 with JSON. The index is only loaded from files written by this service.
 Supports add, remove, search, and automatic rebuild on corruption.
+
+Searches run concurrently on retrieval's CPU executor while ingest and
+delete mutate the index from request threads. Mutators are serialized by
+_write_lock and build the next index version (corpus and BM25Okapi)
+copy-on-write without blocking searches; _lock is held only to swap the
+module references, and search reads one consistent snapshot under it
+before scoring outside it. The new version is persisted after the swap.
 """
 
 import json
@@ -12,12 +19,14 @@ import logging
 import os
 import pickle
 import tempfile
+import threading
 from pathlib import Path
 from typing import Dict, List, Optional
 
 from rank_bm25 import BM25Okapi
 
 from config import BM25_TOP_K
+from services.index_generation_service import bump_generation
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +41,11 @@ _tokenized_corpus: List[List[str]] = []
 _corpus_chunk_ids: List[str] = []
 _doc_to_chunks: Dict[str, List[int]] = {}
 _loaded: bool = False
+# Guards loading and the swap of the index state above; held only for
+# reference assignments so searches never wait for a rebuild
+_lock = threading.Lock()
+# Serializes ingest/delete: each builds the next version from the current one
+_write_lock = threading.Lock()
 
 
 def _tokenize(text: str) -> List[str]:
@@ -43,8 +57,10 @@ def _ensure_loaded():
     """Load index from disk if not already loaded."""
     global _loaded
     if not _loaded:
-        _try_load_from_disk()
-        _loaded = True
+        with _lock:
+            if not _loaded:
+                _try_load_from_disk()
+                _loaded = True
 
 
 def _try_load_from_disk():
@@ -73,13 +89,18 @@ def _try_load_from_disk():
         _doc_to_chunks = {}
 
 
-def _persist_to_disk():
-    """Atomically write BM25 index state to disk."""
+def _persist_to_disk(
+    bm25: Optional[BM25Okapi],
+    tokenized_corpus: List[List[str]],
+    corpus_chunk_ids: List[str],
+    doc_to_chunks: Dict[str, List[int]],
+):
+    """Atomically write one version of the BM25 index state to disk."""
     data = {
-        "bm25": _bm25,
-        "tokenized_corpus": _tokenized_corpus,
-        "corpus_chunk_ids": _corpus_chunk_ids,
-        "doc_to_chunks": _doc_to_chunks,
+        "bm25": bm25,
+        "tokenized_corpus": tokenized_corpus,
+        "corpus_chunk_ids": corpus_chunk_ids,
+        "doc_to_chunks": doc_to_chunks,
     }
 
     # Atomic write: temp file then rename (Pitfall 6 mitigation)
@@ -95,29 +116,29 @@ def _persist_to_disk():
 
     # Write corpus map JSON for rebuild capability
     corpus_map = {}
-    for doc_id, indices in _doc_to_chunks.items():
+    for doc_id, indices in doc_to_chunks.items():
         for idx in indices:
-            if idx < len(_corpus_chunk_ids):
-                corpus_map[_corpus_chunk_ids[idx]] = doc_id
+            if idx < len(corpus_chunk_ids):
+                corpus_map[corpus_chunk_ids[idx]] = doc_id
 
     with open(CORPUS_MAP_PATH, "w") as f:
         json.dump(corpus_map, f)
 
 
-def _reindex_doc_to_chunks():
-    """Rebuild _doc_to_chunks by scanning chunk_ids for doc_id prefixes."""
-    global _doc_to_chunks
-
+def _reindex_doc_to_chunks(
+    corpus_chunk_ids: List[str], doc_ids: List[str]
+) -> Dict[str, List[int]]:
+    """Map each doc_id to its chunk positions by scanning chunk_id prefixes."""
     new_mapping: Dict[str, List[int]] = {}
-    for idx, chunk_id in enumerate(_corpus_chunk_ids):
-        for doc_id in list(_doc_to_chunks.keys()):
+    for idx, chunk_id in enumerate(corpus_chunk_ids):
+        for doc_id in doc_ids:
             if chunk_id.startswith(doc_id):
                 if doc_id not in new_mapping:
                     new_mapping[doc_id] = []
                 new_mapping[doc_id].append(idx)
                 break
 
-    _doc_to_chunks = new_mapping
+    return new_mapping
 
 
 def get_bm25_status() -> str:
@@ -128,6 +149,12 @@ def get_bm25_status() -> str:
     return "empty"
 
 
+def corpus_size() -> int:
+    """Return the number of chunks in the index."""
+    _ensure_loaded()
+    return len(_corpus_chunk_ids)
+
+
 def add_document(doc_id: str, chunks: List[str], chunk_ids: List[str]) -> None:
     """
     Add a document's chunks to the BM25 index.
@@ -140,18 +167,26 @@ def add_document(doc_id: str, chunks: List[str], chunk_ids: List[str]) -> None:
     global _bm25, _tokenized_corpus, _corpus_chunk_ids, _doc_to_chunks
 
     _ensure_loaded()
-
-    start_index = len(_tokenized_corpus)
     tokenized_chunks = [_tokenize(chunk) for chunk in chunks]
 
-    _tokenized_corpus.extend(tokenized_chunks)
-    _corpus_chunk_ids.extend(chunk_ids)
-    _doc_to_chunks[doc_id] = list(range(start_index, start_index + len(chunks)))
+    with _write_lock:
+        # New objects rather than in-place edits: searches keep reading
+        # the snapshot they took
+        start_index = len(_tokenized_corpus)
+        tokenized_corpus = _tokenized_corpus + tokenized_chunks
+        corpus_chunk_ids = _corpus_chunk_ids + list(chunk_ids)
+        doc_to_chunks = dict(_doc_to_chunks)
+        doc_to_chunks[doc_id] = list(range(start_index, start_index + len(chunks)))
+
+        # rank_bm25 has no incremental add; rebuild from full corpus
+        bm25 = BM25Okapi(tokenized_corpus)
 
-    # rank_bm25 has no incremental add; rebuild from full corpus
-    _bm25 = BM25Okapi(_tokenized_corpus)
+        with _lock:
+            _bm25, _tokenized_corpus = bm25, tokenized_corpus
+            _corpus_chunk_ids, _doc_to_chunks = corpus_chunk_ids, doc_to_chunks
 
-    _persist_to_disk()
+        _persist_to_disk(bm25, tokenized_corpus, corpus_chunk_ids, doc_to_chunks)
+    bump_generation()
     logger.info("Added %d chunks for document %s to BM25 index", len(chunks), doc_id)
 
 
@@ -166,39 +201,46 @@ def remove_document(doc_id: str) -> None:
 
     _ensure_loaded()
 
-    indices_to_remove = _doc_to_chunks.pop(doc_id, [])
-    if not indices_to_remove:
-        return
-
-    removal_set = set(indices_to_remove)
-
-    _tokenized_corpus = [
-        tokens for idx, tokens in enumerate(_tokenized_corpus)
-        if idx not in removal_set
-    ]
-    _corpus_chunk_ids = [
-        chunk_id for idx, chunk_id in enumerate(_corpus_chunk_ids)
-        if idx not in removal_set
-    ]
-
-    _reindex_doc_to_chunks()
-
-    if _tokenized_corpus:
-        _bm25 = BM25Okapi(_tokenized_corpus)
-    else:
-        _bm25 = None
-
-    _persist_to_disk()
+    with _write_lock:
+        indices_to_remove = _doc_to_chunks.get(doc_id, [])
+        if not indices_to_remove:
+            return
+
+        removal_set = set(indices_to_remove)
+        tokenized_corpus = [
+            tokens for idx, tokens in enumerate(_tokenized_corpus)
+            if idx not in removal_set
+        ]
+        corpus_chunk_ids = [
+            chunk_id for idx, chunk_id in enumerate(_corpus_chunk_ids)
+            if idx not in removal_set
+        ]
+        doc_to_chunks = _reindex_doc_to_chunks(
+            corpus_chunk_ids, [other for other in _doc_to_chunks if other != doc_id]
+        )
+        bm25 = BM25Okapi(tokenized_corpus) if tokenized_corpus else None
+
+        with _lock:
+            _bm25, _tokenized_corpus = bm25, tokenized_corpus
+            _corpus_chunk_ids, _doc_to_chunks = corpus_chunk_ids, doc_to_chunks
+
+        _persist_to_disk(bm25, tokenized_corpus, corpus_chunk_ids, doc_to_chunks)
+    bump_generation()
     logger.info("Removed document %s from BM25 index", doc_id)
 
 
-def search(query: str, top_k: int = BM25_TOP_K) -> List[dict]:
+def search(
+    query: str,
+    top_k: int = BM25_TOP_K,
+    doc_ids: Optional[List[str]] = None,
+) -> List[dict]:
     """
     Search the BM25 index for relevant chunks.
 
     Args:
         query: Search query text
         top_k: Maximum number of results to return
+        doc_ids: Optional document ID filter (None = all documents)
 
     Returns:
         List of dicts with "chunk_id" and "bm25_score" keys,
@@ -206,14 +248,25 @@ def search(query: str, top_k: int = BM25_TOP_K) -> List[dict]:
     """
     _ensure_loaded()
 
-    if _bm25 is None or len(_tokenized_corpus) == 0:
+    # One consistent snapshot: mutators replace these objects, never edit them
+    with _lock:
+        bm25, chunk_ids, doc_to_chunks = _bm25, _corpus_chunk_ids, _doc_to_chunks
+
+    if bm25 is None or not chunk_ids:
         return []
 
     tokenized_query = _tokenize(query)
-    scores = _bm25.get_scores(tokenized_query)
+    scores = bm25.get_scores(tokenized_query)
+
+    if doc_ids:
+        candidate_indices = [
+            idx for doc_id in doc_ids for idx in doc_to_chunks.get(doc_id, [])
+        ]
+    else:
+        candidate_indices = range(len(scores))
 
     scored_indices = sorted(
-        range(len(scores)),
+        candidate_indices,
         key=lambda i: scores[i],
         reverse=True
     )
@@ -223,7 +276,7 @@ def search(query: str, top_k: int = BM25_TOP_K) -> List[dict]:
         score = float(scores[idx])
         if score > 0:
             results.append({
-                "chunk_id": _corpus_chunk_ids[idx],
+                "chunk_id": chunk_ids[idx],
                 "bm25_score": score,
             })
 
@@ -0,0 +1,166 @@
+"""
+Per-chunk artifact store for precomputed model inputs.
+
+Persists one ragged array per chunk (e.g. reranker token ids) alongside
+each document as a compact .npz sidecar: all chunk arrays concatenated
+into a single buffer plus an offsets index. Each file is tagged with the
+model that produced it so stale artifacts are rejected after a model
+change. Recently used documents are kept in an in-memory LRU bounded by
+total array bytes (token vectors are far larger than token ids).
+"""
+
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from config import CHUNK_ARTIFACT_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_DIR = Path("uploads/chunk_artifacts")
+ARTIFACT_DIR.mkdir(parents=True, exist_ok=True)
+
+_memory_cache: "OrderedDict[tuple[str, str], tuple[str, list[np.ndarray]]]" = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def _artifact_path(kind: str, doc_id: str) -> Path:
+    """Location of a document's artifact file for the given kind."""
+    return ARTIFACT_DIR / kind / f"{doc_id}.npz"
+
+
+def _nbytes(arrays: list[np.ndarray]) -> int:
+    """Total size of a document's arrays."""
+    return sum(array.nbytes for array in arrays)
+
+
+def _forget(key: tuple[str, str]) -> None:
+    """Drop one document from the in-memory LRU (caller holds the lock)."""
+    global _cache_bytes
+    _, arrays = _memory_cache.pop(key)
+    _cache_bytes -= _nbytes(arrays)
+
+
+def _remember(kind: str, doc_id: str, model: str, arrays: list[np.ndarray]) -> None:
+    """Insert arrays into the in-memory LRU, evicting least recently used documents."""
+    global _cache_bytes
+    with _cache_lock:
+        if (kind, doc_id) in _memory_cache:
+            _forget((kind, doc_id))
+        _memory_cache[(kind, doc_id)] = (model, arrays)
+        _cache_bytes += _nbytes(arrays)
+        while _cache_bytes > CHUNK_ARTIFACT_CACHE_MAX_BYTES and len(_memory_cache) > 1:
+            _forget(next(iter(_memory_cache)))
+
+
+def save_artifacts(
+    kind: str, doc_id: str, arrays: list[np.ndarray], model: str
+) -> None:
+    """
+    Persist one array per chunk for a document.
+
+    Arrays are concatenated along their first axis so a document costs a
+    single file regardless of chunk count.
+
+    Args:
+        kind: Artifact family (e.g. "rerank_tokens")
+        doc_id: Document identifier
+        arrays: Per-chunk arrays in chunk_index order (same dtype)
+        model: Name of the model that produced the arrays
+    """
+    path = _artifact_path(kind, doc_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    lengths = [len(array) for array in arrays]
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    data = np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int32)
+
+    # Atomic write: temp file then rename
+    temp_fd, temp_path = tempfile.mkstemp(dir=str(path.parent), suffix=".tmp")
+    try:
+        with os.fdopen(temp_fd, "wb") as f:
+            np.savez(f, data=data, offsets=offsets, model=np.array(model))
+        os.replace(temp_path, str(path))
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+    _remember(kind, doc_id, model, _split(data, offsets))
+
+
+def _split(data: np.ndarray, offsets: np.ndarray) -> list[np.ndarray]:
+    """Slice the concatenated buffer back into per-chunk views."""
+    return [data[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def load_artifacts(kind: str, doc_id: str, model: str) -> Optional[list[np.ndarray]]:
+    """
+    Load a document's per-chunk arrays.
+
+    Args:
+        kind: Artifact family
+        doc_id: Document identifier
+        model: Model the caller expects the arrays to come from
+
+    Returns:
+        List of per-chunk arrays indexed by chunk_index, or None if the
+        document has no artifacts or they were built by another model
+    """
+    with _cache_lock:
+        cached = _memory_cache.get((kind, doc_id))
+        if cached is not None:
+            _memory_cache.move_to_end((kind, doc_id))
+    if cached is not None:
+        cached_model, arrays = cached
+        return arrays if cached_model == model else None
+
+    path = _artifact_path(kind, doc_id)
+    try:
+        with np.load(path) as npz:
+            stored_model = str(npz["model"])
+            data = npz["data"]
+            offsets = npz["offsets"]
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.warning("Corrupt %s artifacts for doc %s, ignoring", kind, doc_id, exc_info=True)
+        return None
+
+    arrays = _split(data, offsets)
+    _remember(kind, doc_id, stored_model, arrays)
+    if stored_model != model:
+        logger.info(
+            "%s artifacts for doc %s built with %s, expected %s",
+            kind, doc_id, stored_model, model,
+        )
+        return None
+    return arrays
+
+
+def delete_artifacts(doc_id: str) -> None:
+    """
+    Remove every artifact kind stored for a document.
+
+    Args:
+        doc_id: Document identifier
+    """
+    with _cache_lock:
+        for key in [key for key in _memory_cache if key[1] == doc_id]:
+            _forget(key)
+
+    if not ARTIFACT_DIR.exists():
+        return
+    for kind_dir in ARTIFACT_DIR.iterdir():
+        path = kind_dir / f"{doc_id}.npz"
+        if path.exists():
+            path.unlink()
+
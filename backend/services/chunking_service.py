@@ -47,12 +47,16 @@ def chunk_document(text_content: str) -> dict:
             - child_chunks: list[str] -- small chunks for embedding
             - parent_texts: list[str] -- larger parent text per child
             - child_to_parent_index: list[int] -- maps child index to parent index
+            - child_token_counts: list[int] -- tokens per child chunk
+            - parent_token_counts: list[int] -- tokens of each child's parent
     """
     if not text_content or not text_content.strip():
         return {
             "child_chunks": [],
             "parent_texts": [],
             "child_to_parent_index": [],
+            "child_token_counts": [],
+            "parent_token_counts": [],
         }
 
     parent_splitter = RecursiveCharacterTextSplitter(
@@ -76,6 +80,8 @@ def chunk_document(text_content: str) -> dict:
     child_chunks = []
     parent_texts = []
     child_to_parent_index = []
+    child_token_counts = []
+    parent_token_counts = []
 
     for parent_idx, parent_text in enumerate(parent_chunks):
         children = child_splitter.split_text(parent_text)
@@ -84,13 +90,19 @@ def chunk_document(text_content: str) -> dict:
             # Parent is too small to split further; use as its own child
             children = [parent_text]
 
+        # Counted once here and stored, so prompt packing never re-tokenizes
+        parent_tokens = _tiktoken_len(parent_text)
         for child_text in children:
             child_chunks.append(child_text)
             parent_texts.append(parent_text)
             child_to_parent_index.append(parent_idx)
+            child_token_counts.append(_tiktoken_len(child_text))
+            parent_token_counts.append(parent_tokens)
 
     return {
         "child_chunks": child_chunks,
         "parent_texts": parent_texts,
         "child_to_parent_index": child_to_parent_index,
+        "child_token_counts": child_token_counts,
+        "parent_token_counts": parent_token_counts,
     }
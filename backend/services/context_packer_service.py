@@ -0,0 +1,160 @@
+"""
+Token-budgeted packing of retrieved contexts and history for the RAG prompt.
+
+Splits CONTEXT_TOKEN_BUDGET between the fixed part of the prompt (system
+instructions and the user query), conversation history (newest messages
+first, capped at CONTEXT_HISTORY_MAX_SHARE of what remains) and retrieved
+contexts (in rank order). When contexts do not fit, the lowest-ranked ones
+are dropped and the last one that partly fits is cut at its tail. Context
+token counts come from ingest-time metadata (token_count); only history,
+the query and legacy chunks without stored counts are tokenized per request.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from config import (
+    CONTEXT_PACKING_ENABLED, CONTEXT_TOKEN_BUDGET, CONTEXT_HISTORY_MAX_SHARE,
+    CONTEXT_MIN_TAIL_TOKENS,
+)
+from services.token_service import count_tokens, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+# "[Doc N] Source: <filename> (Section i/n):" header plus separator
+ENTRY_OVERHEAD_TOKENS = 24
+# Role and message delimiters added by the chat template
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@dataclass
+class PackedContext:
+    """Contexts and history that fit the prompt budget."""
+    results: list[dict]
+    history: list[dict]
+    fixed_tokens: int = 0
+    context_tokens: int = 0
+    history_tokens: int = 0
+    dropped_results: int = 0
+    truncated_results: int = 0
+    dropped_messages: int = 0
+    budget: Optional[int] = None
+
+    def as_dict(self) -> dict:
+        """Token accounting for logs and diagnostics."""
+        return {
+            "budget": self.budget,
+            "fixed": self.fixed_tokens,
+            "context": self.context_tokens,
+            "history": self.history_tokens,
+            "dropped_results": self.dropped_results,
+            "truncated_results": self.truncated_results,
+            "dropped_messages": self.dropped_messages,
+        }
+
+
+def _result_tokens(result: dict) -> int:
+    """Tokens of a result's text: stored at ingest, counted for legacy chunks."""
+    stored = result.get("token_count")
+    if stored is not None:
+        return stored
+    return count_tokens(result.get("text", ""))
+
+
+def _message_tokens(message: dict) -> int:
+    return count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _fit_history(
+    history: list[dict], costs: list[int], limit: int, keep_from: int
+) -> tuple[int, int]:
+    """
+    Extend the kept suffix history[keep_from:] with older messages while
+    they fit `limit` tokens in total.
+
+    Returns:
+        (new keep_from, tokens used)
+    """
+    used = sum(costs[keep_from:])
+    while keep_from > 0 and used + costs[keep_from - 1] <= limit:
+        keep_from -= 1
+        used += costs[keep_from]
+    return keep_from, used
+
+
+def pack_context(
+    results: list[dict],
+    conversation_history: list[dict],
+    fixed_tokens: int,
+    budget: Optional[int] = None,
+) -> PackedContext:
+    """
+    Fit retrieved contexts and history into the prompt token budget.
+
+    Args:
+        results: Search results in rank order (text already parent-expanded)
+        conversation_history: Previous messages, oldest first
+        fixed_tokens: Tokens of the system instructions and user query
+        budget: Total prompt budget (default: CONTEXT_TOKEN_BUDGET)
+
+    Returns:
+        PackedContext with the kept results (copies; a truncated one has
+        its text cut and "truncated" set) and the kept newest messages
+    """
+    if not CONTEXT_PACKING_ENABLED:
+        return PackedContext(results=results, history=conversation_history)
+
+    budget = budget or CONTEXT_TOKEN_BUDGET
+    available = max(0, budget - fixed_tokens)
+
+    # History: newest messages first, up to its share of the budget
+    costs = [_message_tokens(message) for message in conversation_history]
+    keep_from, history_tokens = _fit_history(
+        conversation_history, costs, int(available * CONTEXT_HISTORY_MAX_SHARE),
+        len(conversation_history),
+    )
+
+    # Contexts in rank order; the first that does not fit is cut at its
+    # tail (if enough room is left) and everything ranked below is dropped
+    remaining = available - history_tokens
+    packed: list[dict] = []
+    truncated = 0
+    for result in results:
+        cost = _result_tokens(result) + ENTRY_OVERHEAD_TOKENS
+        if cost <= remaining:
+            packed.append(result)
+            remaining -= cost
+            continue
+        room = remaining - ENTRY_OVERHEAD_TOKENS
+        if room >= CONTEXT_MIN_TAIL_TOKENS or not packed:
+            cut = dict(result)
+            cut["text"] = truncate_tokens(result.get("text", ""), max(room, 0))
+            cut["token_count"] = count_tokens(cut["text"])
+            cut["truncated"] = True
+            if cut["text"]:
+                packed.append(cut)
+                remaining -= cut["token_count"] + ENTRY_OVERHEAD_TOKENS
+                truncated = 1
+        break
+    context_tokens = available - history_tokens - remaining
+
+    # Context budget left over goes back to older history
+    keep_from, history_tokens = _fit_history(
+        conversation_history, costs, history_tokens + remaining, keep_from
+    )
+
+    packed_context = PackedContext(
+        results=packed,
+        history=conversation_history[keep_from:],
+        fixed_tokens=fixed_tokens,
+        context_tokens=context_tokens,
+        history_tokens=history_tokens,
+        dropped_results=len(results) - len(packed),
+        truncated_results=truncated,
+        dropped_messages=keep_from,
+        budget=budget,
+    )
+    if packed_context.dropped_results or truncated or keep_from:
+        logger.info("Prompt packed to budget: %s", packed_context.as_dict())
+    return packed_context
@@ -11,14 +11,14 @@ import re
 import time
 from typing import Optional
 
-import ollama
-
 from config import (
     CONTEXT_GENERATION_MODEL,
     CONTEXT_GENERATION_TIMEOUT,
     CONTEXT_VALIDATION_THRESHOLD,
 )
+import ollama_client
 from ollama_client import get_selected_model
+from services import metrics_service
 
 logger = logging.getLogger(__name__)
 
@@ -81,11 +81,8 @@ def generate_chunk_context(
     )
 
     try:
-        response = ollama.chat(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            options={"num_ctx": 8192},
-        )
+        # num_ctx comes from the model's profile (OLLAMA_DEFAULT_OPTIONS)
+        response = ollama_client.chat(model, [{"role": "user", "content": prompt}])
         context = response["message"]["content"].strip()
 
         # Validate against hallucination
@@ -98,6 +95,7 @@ def generate_chunk_context(
             )
             return ""
     except Exception as exc:
+        metrics_service.record_ollama_failure("context", exc)
         logger.warning("Context generation failed: %s", str(exc))
         return ""
 
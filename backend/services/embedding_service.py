@@ -3,10 +3,18 @@ Embedding service for generating vector embeddings via Ollama.
 
 Uses Ollama's bge-m3 model to generate dense embeddings for text chunks.
 Model name and expected dimensions are configured in config.py.
+
+EmbeddingContext memoizes vectors for one chat request, so the fast
+classifier, the confidence gate, HyDE and search share one embed call
+instead of each embedding the same strings again.
 """
 
-import ollama
+import threading
+from typing import Optional
+
+import ollama_client
 from config import EMBEDDING_MODEL, EMBEDDING_DIMENSIONS
+from services import metrics_service
 
 
 def generate_embeddings(texts: list[str]) -> list[list[float]]:
@@ -23,12 +31,14 @@ def generate_embeddings(texts: list[str]) -> list[list[float]]:
         RuntimeError: If Ollama service fails or returns unexpected format
         ValueError: If embeddings don't have expected dimensions
     """
+    metrics_service.EMBEDDING_BATCH_SIZE.observe(len(texts))
     try:
         # Call Ollama embed API with batch of texts
-        response = ollama.embed(
-            model=EMBEDDING_MODEL,
-            input=texts
-        )
+        try:
+            response = ollama_client.embed(EMBEDDING_MODEL, texts)
+        except Exception as e:
+            metrics_service.record_ollama_failure("embed", e)
+            raise
 
         # Extract embeddings from response
         embeddings = response['embeddings']
@@ -43,7 +53,51 @@ def generate_embeddings(texts: list[str]) -> list[list[float]]:
 
         return embeddings
 
-    except ollama.ResponseError as e:
+    except ollama_client.ResponseError as e:
         raise RuntimeError(
             f"Ollama embedding failed: {str(e)}"
         ) from e
+
+
+class EmbeddingContext:
+    """
+    Request-scoped memo of text -> embedding.
+
+    Not a cache: created per request and dropped with it, so it never
+    outlives a change of embedding model. Thread-safe (rewriting runs on
+    an executor thread, search on the event loop); embed calls that miss
+    run one at a time, so a text requested concurrently (the query, by
+    the classifier and a speculative search) is embedded once.
+    """
+
+    def __init__(self):
+        self._vectors: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+        self._embed_lock = threading.Lock()
+
+    def _missing(self, texts: list[str]) -> list[str]:
+        with self._lock:
+            return list(dict.fromkeys(t for t in texts if t not in self._vectors))
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeddings for texts, embedding only the ones not seen yet (one call).
+
+        Raises:
+            Same as generate_embeddings
+        """
+        if self._missing(texts):
+            with self._embed_lock:
+                # Another caller may have embedded them while this one waited
+                missing = self._missing(texts)
+                if missing:
+                    vectors = generate_embeddings(missing)
+                    with self._lock:
+                        self._vectors.update(zip(missing, vectors))
+        with self._lock:
+            return [self._vectors[text] for text in texts]
+
+    def get(self, text: str) -> Optional[list[float]]:
+        """Embedding of text if it was already computed, else None."""
+        with self._lock:
+            return self._vectors.get(text)
@@ -0,0 +1,167 @@
+"""
+Rolling conversation-history compaction for long chat sessions.
+
+The chat model sees a summary of older turns plus the most recent
+HISTORY_RECENT_MESSAGES verbatim instead of the whole session, so
+per-turn prompt size stays bounded. The summary (SessionSummary) is
+updated incrementally in the background after a response, once
+HISTORY_SUMMARY_BATCH_MESSAGES messages have left the recent window; only
+those are folded into it. Between refreshes the replayed history only
+grows, which keeps the prompt prefix cacheable (PROMPT_LAYOUT).
+Derived content (the sources footer appended to every answer) is
+stripped before any message goes back to a model.
+"""
+
+import logging
+from typing import Optional
+
+from config import (
+    HISTORY_COMPACTION_ENABLED, HISTORY_RECENT_MESSAGES, HISTORY_SUMMARY_MODEL,
+    HISTORY_SUMMARY_MAX_TOKENS, HISTORY_SUMMARY_BATCH_MESSAGES,
+)
+import ollama_client
+from ollama_client import get_selected_model
+from services import metrics_service
+from services.rag_service import SOURCES_FOOTER
+
+logger = logging.getLogger(__name__)
+
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and a research assistant that answers from the user's documents.
+
+Update the summary with the new messages. Keep facts, figures, names, document references, decisions and open questions the user may refer back to. Drop greetings and citation markers. Write plain prose, at most {max_words} words.
+
+CURRENT SUMMARY:
+{summary}
+
+NEW MESSAGES:
+{messages}
+
+UPDATED SUMMARY:"""
+
+SUMMARY_MESSAGE_PREFIX = "Summary of the earlier conversation:\n"
+
+
+def strip_derived_content(message: dict) -> dict:
+    """Copy of a message without content the system appended (sources footer)."""
+    content = message.get("content", "")
+    if message.get("role") == "assistant" and SOURCES_FOOTER in content:
+        return {**message, "content": content.split(SOURCES_FOOTER, 1)[0]}
+    return message
+
+
+def compact_history(messages: list[dict], summary=None) -> list[dict]:
+    """
+    History as the chat model should see it.
+
+    Args:
+        messages: Full stored session messages, oldest first
+        summary: Optional SessionSummary for the session
+
+    Returns:
+        Messages with derived content stripped; with compaction enabled
+        and a summary written, the messages after those the summary covers
+        (at most HISTORY_RECENT_MESSAGES + HISTORY_SUMMARY_BATCH_MESSAGES),
+        preceded by the summary of older turns as a system message. Until
+        the first summary exists nothing is dropped.
+    """
+    stripped = [strip_derived_content(message) for message in messages]
+    if not HISTORY_COMPACTION_ENABLED or summary is None or not summary.summary:
+        return stripped
+
+    window = HISTORY_RECENT_MESSAGES + HISTORY_SUMMARY_BATCH_MESSAGES
+    start = max(summary.summarized_count, len(stripped) - window, 0)
+    recent = stripped[start:]
+    if start:
+        return [{
+            "role": "system",
+            "content": SUMMARY_MESSAGE_PREFIX + summary.summary,
+        }] + recent
+    return recent
+
+
+def _format_messages(messages: list[dict]) -> str:
+    lines = []
+    for message in messages:
+        role_label = "User" if message["role"] == "user" else "Assistant"
+        lines.append(f"{role_label}: {message['content']}")
+    return "\n\n".join(lines)
+
+
+def summarize(previous_summary: str, new_messages: list[dict], model: str) -> Optional[str]:
+    """
+    Fold new messages into the running summary.
+
+    Returns:
+        Updated summary, or None on failure (the caller keeps the old one)
+    """
+    try:
+        response = ollama_client.chat(
+            model=model,
+            messages=[{
+                "role": "user",
+                "content": SUMMARY_PROMPT.format(
+                    max_words=int(HISTORY_SUMMARY_MAX_TOKENS * 0.75),
+                    summary=previous_summary or "(none yet)",
+                    messages=_format_messages(new_messages),
+                ),
+            }],
+            options={"temperature": 0, "num_predict": HISTORY_SUMMARY_MAX_TOKENS},
+        )
+        summary = response["message"]["content"].strip()
+        return summary or None
+    except Exception as exc:
+        metrics_service.record_ollama_failure("summarize", exc)
+        logger.warning("History summarization failed: %s", str(exc))
+        return None
+
+
+def refresh_session_summary(session_id: str, model: Optional[str] = None) -> None:
+    """
+    Fold messages that have left the recent window into the session summary.
+
+    Runs as a background task after a chat response has been sent, with
+    its own database session. No-op until HISTORY_SUMMARY_BATCH_MESSAGES
+    messages are waiting to be folded in.
+
+    Args:
+        session_id: Chat session to compact
+        model: Chat model of the request (used unless HISTORY_SUMMARY_MODEL)
+    """
+    if not HISTORY_COMPACTION_ENABLED:
+        return
+    # Database layer imported here so the prompt-side helpers stay light
+    from services import session_service
+
+    db_iter = session_service.get_db()
+    db = next(db_iter)
+    try:
+        session = session_service.get_session(db, session_id)
+        if session is None:
+            return
+        messages = session.messages or []
+        window_start = len(messages) - HISTORY_RECENT_MESSAGES
+        record = session_service.get_session_summary(db, session_id)
+        summarized_count = record.summarized_count if record else 0
+        if window_start - summarized_count < max(1, HISTORY_SUMMARY_BATCH_MESSAGES):
+            return
+
+        new_messages = [
+            strip_derived_content(message)
+            for message in messages[summarized_count:window_start]
+        ]
+        summary = summarize(
+            record.summary if record else "",
+            new_messages,
+            HISTORY_SUMMARY_MODEL or model or get_selected_model(),
+        )
+        if summary is None:
+            return  # retried after the next turn
+        session_service.save_session_summary(db, session_id, summary, window_start)
+        logger.info(
+            "Session %s summary now covers %d messages", session_id, window_start
+        )
+    except Exception as exc:
+        logger.warning("Session summary refresh failed for %s: %s", session_id, str(exc))
+    finally:
+        db_iter.close()
@@ -0,0 +1,26 @@
+"""
+Global index generation counter.
+
+Every mutation of the searchable corpus (ChromaDB vectors or the BM25
+index) bumps the generation. Caches tag entries with the generation they
+were computed at and treat any other generation as stale, so results are
+never served across an ingest or delete.
+"""
+
+import threading
+
+_generation = 0
+_lock = threading.Lock()
+
+
+def current_generation() -> int:
+    """Return the current index generation."""
+    return _generation
+
+
+def bump_generation() -> int:
+    """Advance the generation after an index mutation; returns the new value."""
+    global _generation
+    with _lock:
+        _generation += 1
+        return _generation
@@ -0,0 +1,233 @@
+"""
+Late-interaction (ColBERT-style) reranking with bge-m3 token vectors.
+
+Chunk token vectors are computed once at ingest and stored as float16
+arrays via chunk_artifact_service. At query time only the query is
+encoded; candidates are scored with MaxSim (best-matching chunk token
+per query token, averaged over query tokens) in a single NumPy matrix
+product. Cheaper than the cross-encoder and usable as a replacement for
+reranker_service.rerank (RERANK_STRATEGY = "late_interaction").
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+from FlagEmbedding import BGEM3FlagModel
+
+from config import (
+    LATE_INTERACTION_ENABLED, LATE_INTERACTION_MODEL, LATE_INTERACTION_USE_FP16,
+)
+from services import chunk_artifact_service
+from services import metrics_service
+
+logger = logging.getLogger(__name__)
+
+VECTOR_CACHE_KIND = "colbert_vecs"
+
+_model: BGEM3FlagModel = None
+_model_status: str = "unavailable"
+
+_rebuild_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="colbert-cache")
+_pending_rebuilds: set = set()
+_pending_lock = threading.Lock()
+
+
+def get_late_interaction_status() -> str:
+    """Return current model status: 'unavailable', 'loading', or 'ready'."""
+    return _model_status
+
+
+def _get_model() -> BGEM3FlagModel:
+    """Lazy-load the bge-m3 model singleton."""
+    global _model, _model_status
+    if _model is None:
+        _model_status = "loading"
+        try:
+            logger.info("Loading late-interaction model...")
+            _model = BGEM3FlagModel(
+                LATE_INTERACTION_MODEL,
+                use_fp16=LATE_INTERACTION_USE_FP16
+            )
+            _model_status = "ready"
+            logger.info("Late-interaction model loaded")
+        except Exception:
+            _model_status = "unavailable"
+            logger.error("Failed to load late-interaction model", exc_info=True)
+            raise
+    return _model
+
+
+def encode_token_vectors(texts: List[str]) -> List[np.ndarray]:
+    """
+    Encode texts into per-token ColBERT vectors.
+
+    Args:
+        texts: Texts to encode
+
+    Returns:
+        One (num_tokens, dim) float16 array per text (L2-normalized rows)
+    """
+    output = _get_model().encode(
+        texts,
+        return_dense=False,
+        return_sparse=False,
+        return_colbert_vecs=True,
+    )
+    return [np.asarray(vecs, dtype=np.float16) for vecs in output["colbert_vecs"]]
+
+
+def build_vector_cache(doc_id: str, chunks: List[str]) -> None:
+    """
+    Precompute and store token vectors for a document's chunks.
+
+    No-op unless LATE_INTERACTION_ENABLED.
+
+    Args:
+        doc_id: Document identifier
+        chunks: Chunk texts in chunk_index order
+    """
+    if not LATE_INTERACTION_ENABLED or not chunks:
+        return
+    chunk_artifact_service.save_artifacts(
+        VECTOR_CACHE_KIND, doc_id, encode_token_vectors(chunks), LATE_INTERACTION_MODEL
+    )
+
+
+def _rebuild_vector_cache(doc_id: str) -> None:
+    """Re-encode a document's stored chunks (missing or stale cache)."""
+    from services.vector_service import get_collection
+
+    try:
+        result = get_collection().get(
+            where={"doc_id": {"$eq": doc_id}},
+            include=["documents", "metadatas"],
+        )
+        ordered = sorted(
+            zip(result["metadatas"], result["documents"]),
+            key=lambda item: item[0]["chunk_index"],
+        )
+        build_vector_cache(doc_id, [text for _, text in ordered])
+        logger.info("Rebuilt late-interaction vector cache for doc %s", doc_id)
+    except Exception:
+        logger.warning("Vector cache rebuild failed for doc %s", doc_id, exc_info=True)
+    finally:
+        with _pending_lock:
+            _pending_rebuilds.discard(doc_id)
+
+
+def _schedule_rebuild(doc_id: str) -> None:
+    """Queue a background rebuild unless one is already pending."""
+    if not LATE_INTERACTION_ENABLED:
+        return
+    with _pending_lock:
+        if doc_id in _pending_rebuilds:
+            return
+        _pending_rebuilds.add(doc_id)
+    _rebuild_executor.submit(_rebuild_vector_cache, doc_id)
+
+
+def _candidate_vectors(candidates: List[dict]) -> List[np.ndarray]:
+    """
+    Gather stored token vectors for each candidate.
+
+    Candidates without stored vectors (legacy documents or vectors built
+    by another model) are encoded inline in one batch, and their
+    documents are scheduled for a background rebuild so later queries
+    find them cached.
+    """
+    vectors: List[np.ndarray] = [None] * len(candidates)
+    missing = []
+    missing_docs = set()
+    for position, candidate in enumerate(candidates):
+        chunk_id = candidate.get("chunk_id")
+        doc_id = candidate.get("source_doc_id")
+        doc_vectors = None
+        if chunk_id and doc_id:
+            doc_vectors = chunk_artifact_service.load_artifacts(
+                VECTOR_CACHE_KIND, doc_id, LATE_INTERACTION_MODEL
+            )
+        chunk_index = int(chunk_id.rsplit("_chunk_", 1)[1]) if chunk_id else -1
+        if doc_vectors is not None and 0 <= chunk_index < len(doc_vectors):
+            vectors[position] = doc_vectors[chunk_index]
+        else:
+            missing.append(position)
+            if doc_id:
+                missing_docs.add(doc_id)
+
+    for doc_id in missing_docs:
+        _schedule_rebuild(doc_id)
+    if missing:
+        logger.info("Encoding %d candidates without stored token vectors", len(missing))
+        encoded = encode_token_vectors([candidates[i]["text"] for i in missing])
+        for position, vecs in zip(missing, encoded):
+            vectors[position] = vecs
+    return vectors
+
+
+def maxsim_scores(query_vectors: np.ndarray, candidate_vectors: List[np.ndarray]) -> np.ndarray:
+    """
+    Vectorized MaxSim over all candidates at once.
+
+    Stacks every candidate's token vectors into one matrix, computes all
+    query-token/chunk-token similarities in a single product, then takes
+    the per-candidate max with np.maximum.reduceat.
+
+    Args:
+        query_vectors: (num_query_tokens, dim) array
+        candidate_vectors: One (num_tokens, dim) array per candidate
+
+    Returns:
+        Array of scores, one per candidate (mean over query tokens of the
+        best chunk-token similarity)
+    """
+    lengths = np.array([len(vecs) for vecs in candidate_vectors])
+    scores = np.zeros(len(candidate_vectors), dtype=np.float32)
+    non_empty = lengths > 0
+    if not non_empty.any():
+        return scores
+
+    stacked = np.concatenate(
+        [vecs for vecs in candidate_vectors if len(vecs)]
+    ).astype(np.float32)
+    starts = np.concatenate([[0], np.cumsum(lengths[non_empty])[:-1]])
+
+    similarities = query_vectors.astype(np.float32) @ stacked.T
+    per_candidate_max = np.maximum.reduceat(similarities, starts, axis=1)
+    scores[non_empty] = per_candidate_max.mean(axis=0)
+    return scores
+
+
+def rerank(
+    query: str,
+    candidates: List[dict],
+    top_k: int = 5
+) -> List[dict]:
+    """
+    Rerank candidates by late-interaction MaxSim score.
+
+    Same contract as reranker_service.rerank: scores are written to
+    "reranker_score" and the top_k candidates are returned.
+
+    Args:
+        query: The search query text
+        candidates: List of dicts, each must contain a "text" key
+        top_k: Number of top results to return
+
+    Returns:
+        Top-k candidates sorted by reranker_score descending
+    """
+    if not candidates:
+        return []
+
+    metrics_service.RERANK_BATCH_SIZE.observe(len(candidates), scorer="late_interaction")
+    query_vectors = encode_token_vectors([query])[0]
+    scores = maxsim_scores(query_vectors, _candidate_vectors(candidates))
+
+    for candidate, score in zip(candidates, scores):
+        candidate["reranker_score"] = float(score)
+
+    ranked = sorted(candidates, key=lambda x: x["reranker_score"], reverse=True)
+    return ranked[:top_k]
@@ -0,0 +1,320 @@
+"""
+In-process metrics registry rendered in Prometheus text format.
+
+Counters, gauges and histograms live in module-level objects updated from
+the hot paths; GET /metrics renders them on demand, so no external
+collector or client library is needed. Each metric guards its values
+with its own lock held only for a dict update, and histograms locate
+their bucket with bisect before taking it. Gauges that mirror existing
+state (corpus sizes) are computed by callbacks at scrape time instead of
+being updated on every change.
+"""
+
+import logging
+import threading
+from bisect import bisect_left
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets (seconds): sub-ms BM25 up to multi-second LLM streams
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+_registry: list = []
+
+
+def _format_labels(names: tuple[str, ...], values: tuple) -> str:
+    """Render {name="value",...} (empty string when unlabeled)."""
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Render integers without a trailing .0, as Prometheus clients do."""
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Shared registration, label handling and HELP/TYPE rendering."""
+
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def _header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self._header()
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is computed at scrape time."""
+
+    metric_type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        callback: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+        self._callback = callback
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        if self._callback is not None:
+            try:
+                self.set(self._callback())
+            except Exception as exc:
+                logger.warning("Gauge %s callback failed: %s", self.name, str(exc))
+                return []
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self._header()
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Bucketed distribution with _bucket, _sum and _count series."""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [per-bucket counts (+Inf last), sum, count]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._values.get(self._key(labels))
+        return series[2] if series else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(
+                (key, (list(series[0]), series[1], series[2]))
+                for key, series in self._values.items()
+            )
+        lines = self._header()
+        for key, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _format_labels(self.labelnames + ("le",), key + (le,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render_metrics() -> str:
+    """Render every registered metric in Prometheus text format 0.0.4."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# Pipeline metrics
+# ---------------------------------------------------------------------------
+
+STAGE_DURATION = Histogram(
+    "aira_stage_duration_seconds",
+    "Wall time per pipeline stage (from StageTimings)",
+    ("kind", "stage"),
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "aira_embedding_batch_size",
+    "Texts per Ollama embed call",
+    buckets=BATCH_SIZE_BUCKETS,
+)
+RERANK_BATCH_SIZE = Histogram(
+    "aira_rerank_batch_size",
+    "Candidates scored per rerank call",
+    ("scorer",),
+    buckets=BATCH_SIZE_BUCKETS,
+)
+OLLAMA_ERRORS = Counter(
+    "aira_ollama_errors_total",
+    "Failed Ollama calls (including timeouts)",
+    ("operation",),
+)
+OLLAMA_TIMEOUTS = Counter(
+    "aira_ollama_timeouts_total",
+    "Ollama calls that failed with a timeout",
+    ("operation",),
+)
+RETRIEVAL_METHOD = Counter(
+    "aira_retrieval_method_total",
+    "Searches by final ranking stage (rrf_only = reranker fallback)",
+    ("method",),
+)
+SPECULATIVE_RETRIEVALS = Counter(
+    "aira_speculative_retrievals_total",
+    "Chat retrievals started with the original query during rewriting",
+    ("outcome",),
+)
+RERANK_EARLY_EXITS = Counter(
+    "aira_rerank_early_exits_total",
+    "Searches that skipped reranking because fusion was decisive",
+    ("reason",),
+)
+MMR_DROPPED = Counter(
+    "aira_mmr_dropped_results_total",
+    "Near-duplicate results removed by MMR diversification",
+)
+MMR_TOKENS_SAVED = Histogram(
+    "aira_mmr_prompt_tokens_saved",
+    "Approximate prompt tokens removed per query by MMR diversification",
+    buckets=(0, 100, 250, 500, 1000, 2000, 4000, 8000),
+)
+BRANCH_TIMEOUTS = Counter(
+    "aira_retrieval_branch_timeouts_total",
+    "Retrieval branches dropped after their deadline",
+    ("branch",),
+)
+INGESTED_DOCUMENTS = Counter(
+    "aira_ingested_documents_total",
+    "Documents indexed",
+)
+INGESTED_CHUNKS = Counter(
+    "aira_ingested_chunks_total",
+    "Child chunks embedded and indexed",
+)
+INGESTION_DURATION = Histogram(
+    "aira_ingestion_duration_seconds",
+    "Chunk, embed and index time per document",
+)
+SSE_STREAMS_IN_FLIGHT = Gauge(
+    "aira_sse_streams_in_flight",
+    "Chat SSE responses currently streaming",
+)
+
+
+def _bm25_corpus_size() -> float:
+    from services import bm25_index_service
+    return bm25_index_service.corpus_size()
+
+
+def _vector_corpus_size() -> float:
+    from services.vector_service import get_collection
+    return get_collection().count()
+
+
+BM25_CORPUS_CHUNKS = Gauge(
+    "aira_bm25_corpus_chunks",
+    "Chunks in the BM25 index",
+    callback=_bm25_corpus_size,
+)
+VECTOR_CORPUS_CHUNKS = Gauge(
+    "aira_vector_corpus_chunks",
+    "Chunks in the ChromaDB collection",
+    callback=_vector_corpus_size,
+)
+
+
+def observe_stage_timings(request_kind: str, timings) -> None:
+    """
+    Feed a finished request's StageTimings into the stage histogram.
+
+    Args:
+        request_kind: 'search' or 'chat'
+        timings: StageTimings (no-op recorders are skipped)
+    """
+    recorded = timings.as_dict()
+    if not recorded:
+        return
+    for stage, elapsed_ms in recorded.items():
+        STAGE_DURATION.observe(elapsed_ms / 1000.0, kind=request_kind, stage=stage)
+
+
+def record_ollama_failure(operation: str, exc: BaseException) -> None:
+    """Count a failed Ollama call, separately flagging timeouts."""
+    OLLAMA_ERRORS.inc(operation=operation)
+    if isinstance(exc, TimeoutError) or "timeout" in type(exc).__name__.lower():
+        OLLAMA_TIMEOUTS.inc(operation=operation)
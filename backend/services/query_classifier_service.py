@@ -0,0 +1,320 @@
+"""
+In-process fast-path query classifier in front of the LLM classifier.
+
+Decides standalone / follow_up / abstract without an LLM call when it is
+confident, in two stages:
+
+1. Heuristics: follow-up cues (leading "what about", "tell me more",
+   ordinal references, pronouns in short queries) and standalone cues
+   (explicit topic pivots, specific names/numbers/quoted terms).
+2. Embeddings (QUERY_FAST_CLASSIFIER_EMBEDDINGS), for queries without
+   reference words: the query and the last
+   user message are embedded in one call. A query unrelated to the last
+   one is a topic change (standalone); otherwise the nearest class
+   centroid over labeled example embeddings wins if it leads the
+   runner-up by QUERY_FAST_CLASSIFIER_MIN_MARGIN.
+
+Anything else returns None and goes to the LLM. A sample of fast
+decisions (QUERY_FAST_CLASSIFIER_SHADOW_RATE) is re-classified by the LLM
+in the background to measure agreement.
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+
+from config import (
+    QUERY_FAST_CLASSIFIER_EMBEDDINGS, QUERY_FAST_CLASSIFIER_MIN_MARGIN,
+    QUERY_FAST_CLASSIFIER_PIVOT_SIMILARITY, QUERY_FAST_CLASSIFIER_SHADOW_RATE,
+    QUERY_FAST_CLASSIFIER_RETRY_S,
+)
+from services.embedding_service import EmbeddingContext, generate_embeddings
+from services import metrics_service
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FastClassification:
+    """A confident fast-path decision."""
+    query_type: str        # QueryType value
+    reasoning: str
+    stage: str             # 'heuristic' | 'embedding'
+
+
+# Labeled examples per class (the LLM prompt's examples plus variants);
+# their normalized mean embeddings are the class centroids
+LABELED_EXAMPLES = {
+    "standalone": [
+        "What is machine learning?",
+        "Now tell me about climate change.",
+        "What was the total revenue reported in the 2023 annual report?",
+        "Summarize the section on data retention policies.",
+        "Who are the authors of the transformer paper?",
+        "List the safety requirements for lithium battery storage.",
+    ],
+    "follow_up": [
+        "What about the costs?",
+        "Tell me more",
+        "Can you explain that part?",
+        "How does it compare to the second one?",
+        "Why is that?",
+        "What did they conclude about it?",
+    ],
+    "abstract": [
+        "What approaches exist for handling concurrent access?",
+        "How should a company think about data governance?",
+        "What are the trade-offs between consistency and availability?",
+        "Why do large projects tend to run over budget?",
+        "What makes a good onboarding process?",
+        "How can teams reduce technical debt over time?",
+    ],
+}
+
+# "there" is left out: existential "is there ...?" opens standalone questions
+REFERENCE_WORDS = frozenset({
+    "it", "its", "they", "them", "their", "that", "this", "those", "these",
+    "he", "she", "him", "her", "above", "former", "latter",
+})
+# "this year", "this quarter", ... refer to the calendar, not the conversation
+_TIME_WORDS = frozenset({
+    "year", "quarter", "month", "week", "day", "morning", "season", "time",
+})
+
+_FOLLOW_UP_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r"^(and|but|also|so)\b",
+    r"^(what|how) about\b",
+    r"^(tell me|say|explain) more\b",
+    r"\bmore (about|on) (that|this|it|those|these)\b",
+    r"\b(the|that|this) (first|second|third|last|previous|same|other|former|latter) "
+    r"(one|document|doc|point|part|section|option|source|example)\b",
+    r"\b(you|it) (said|mentioned|described)\b",
+    r"^(why|how|really|example|examples)\W*$",
+)]
+_PIVOT_PATTERN = re.compile(
+    r"^(now|next|new question|different question|different topic|switching topics?|"
+    r"unrelated|separately|on another note)\b",
+    re.IGNORECASE,
+)
+# Specific identifiers: numbers, quoted phrases, file names, mid-sentence
+# capitalized names; abstract queries by definition contain none
+_SPECIFIC_PATTERN = re.compile(
+    r"\d|\"[^\"]+\"|'[^']+'|\b\w+\.(pdf|docx?|txt|md)\b|(?<=\w )[A-Z][a-z]+"
+)
+
+_centroids: Optional[dict[str, np.ndarray]] = None
+_centroids_retry_at = 0.0       # time.monotonic() before which a failed embed is not retried
+_centroids_lock = threading.Lock()
+
+_shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="classifier-shadow")
+# At most two shadow checks queued; extra samples are skipped
+_shadow_slots = threading.BoundedSemaphore(2)
+
+
+def _words(text: str) -> list[str]:
+    return re.findall(r"[a-z]+", text.lower())
+
+
+def _has_reference(words: list[str]) -> bool:
+    return any(
+        word in REFERENCE_WORDS
+        and not (word == "this" and next_word in _TIME_WORDS)
+        for word, next_word in zip(words, words[1:] + [""])
+    )
+
+
+def _heuristic(query: str) -> Optional[FastClassification]:
+    words = _words(query)
+    has_reference = _has_reference(words)
+
+    for pattern in _FOLLOW_UP_PATTERNS:
+        if pattern.search(query.strip()):
+            return FastClassification("follow_up", f"Follow-up cue /{pattern.pattern}/", "heuristic")
+    if has_reference and len(words) <= 6:
+        return FastClassification("follow_up", "Reference word in a short query", "heuristic")
+    if has_reference:
+        return None
+    if _PIVOT_PATTERN.search(query.strip()):
+        return FastClassification("standalone", "Explicit topic change", "heuristic")
+    if len(words) >= 5 and _SPECIFIC_PATTERN.search(query):
+        return FastClassification("standalone", "Self-contained query with specific terms", "heuristic")
+    return None
+
+
+def _normalize(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _get_centroids() -> Optional[dict[str, np.ndarray]]:
+    """
+    Embed the labeled examples once (one call); None if unavailable.
+
+    A failed embed (e.g. Ollama not up yet) is retried once
+    QUERY_FAST_CLASSIFIER_RETRY_S have passed, not on every query.
+    """
+    global _centroids, _centroids_retry_at
+    if _centroids is None and time.monotonic() >= _centroids_retry_at:
+        with _centroids_lock:
+            if _centroids is None and time.monotonic() >= _centroids_retry_at:
+                labels = [label for label, texts in LABELED_EXAMPLES.items() for _ in texts]
+                texts = [text for texts in LABELED_EXAMPLES.values() for text in texts]
+                try:
+                    embeddings = _normalize(generate_embeddings(texts))
+                except Exception as exc:
+                    _centroids_retry_at = time.monotonic() + QUERY_FAST_CLASSIFIER_RETRY_S
+                    logger.warning("Classifier centroids unavailable: %s", str(exc))
+                    return None
+                _centroids = {
+                    label: _normalize(embeddings[
+                        [i for i, other in enumerate(labels) if other == label]
+                    ].mean(axis=0))
+                    for label in LABELED_EXAMPLES
+                }
+    return _centroids
+
+
+def _last_user_message(conversation_history: list[dict]) -> Optional[str]:
+    for message in reversed(conversation_history):
+        if message.get("role") == "user" and message.get("content"):
+            return message["content"]
+    return None
+
+
+def _embedding_decision(
+    query: str,
+    conversation_history: list[dict],
+    embeddings: Optional[EmbeddingContext],
+) -> Optional[FastClassification]:
+    centroids = _get_centroids()
+    if centroids is None:
+        return None
+    previous = _last_user_message(conversation_history)
+    embed = embeddings.embed if embeddings is not None else generate_embeddings
+    try:
+        vectors = _normalize(embed([query] + ([previous] if previous else [])))
+    except Exception as exc:
+        logger.warning("Fast classifier embedding failed: %s", str(exc))
+        return None
+
+    query_vector = vectors[0]
+    if previous is not None:
+        history_similarity = float(query_vector @ vectors[1])
+        if history_similarity < QUERY_FAST_CLASSIFIER_PIVOT_SIMILARITY:
+            return FastClassification(
+                "standalone",
+                f"Unrelated to the previous query (similarity {history_similarity:.2f})",
+                "embedding",
+            )
+
+    scores = sorted(
+        ((float(query_vector @ centroid), label) for label, centroid in centroids.items()),
+        reverse=True,
+    )
+    (best, label), (runner_up, _) = scores[0], scores[1]
+    if best - runner_up >= QUERY_FAST_CLASSIFIER_MIN_MARGIN:
+        return FastClassification(
+            label, f"Nearest example centroid (margin {best - runner_up:.2f})", "embedding"
+        )
+    return None
+
+
+def fast_classify(
+    query: str,
+    conversation_history: list[dict],
+    embeddings: Optional[EmbeddingContext] = None,
+) -> Optional[FastClassification]:
+    """
+    Classify a query without the LLM when confident.
+
+    Args:
+        query: The user's current query.
+        conversation_history: List of {role, content} message dicts.
+        embeddings: Optional request EmbeddingContext, so the query
+            vector is reused by the confidence gate and search.
+
+    Returns:
+        FastClassification, or None when the query needs the LLM.
+    """
+    decision = _heuristic(query)
+    # Longer queries with reference words are left to the LLM: similarity
+    # cannot tell what "that" points to
+    if (decision is None and QUERY_FAST_CLASSIFIER_EMBEDDINGS
+            and not _has_reference(_words(query))):
+        decision = _embedding_decision(query, conversation_history, embeddings)
+    if decision is not None:
+        CLASSIFICATIONS.inc(source=f"fast_{decision.stage}")
+    return decision
+
+
+def record_llm_classification() -> None:
+    """Count a query that needed the LLM classifier."""
+    CLASSIFICATIONS.inc(source="llm")
+
+
+def shadow_check(decision: FastClassification, llm_classify: Callable[[], str]) -> None:
+    """
+    Re-classify a sample of fast decisions with the LLM in the background.
+
+    Args:
+        decision: The fast-path decision that was used
+        llm_classify: Returns the LLM's query type; raises on failure
+    """
+    if random.random() >= QUERY_FAST_CLASSIFIER_SHADOW_RATE:
+        return
+    if not _shadow_slots.acquire(blocking=False):
+        return
+
+    def _check():
+        try:
+            llm_type = llm_classify()
+            SHADOW_CHECKS.inc(
+                result="agree" if llm_type == decision.query_type else "disagree",
+                stage=decision.stage,
+            )
+            if llm_type != decision.query_type:
+                logger.info(
+                    "Fast classifier disagreed with LLM: %s (%s) vs %s",
+                    decision.query_type, decision.stage, llm_type,
+                )
+        except Exception as exc:
+            logger.debug("Shadow classification failed: %s", str(exc))
+        finally:
+            _shadow_slots.release()
+
+    _shadow_executor.submit(_check)
+
+
+def get_classifier_stats() -> dict:
+    """Share of classifications that skipped the LLM and shadow agreement."""
+    fast = sum(CLASSIFICATIONS.value(source=f"fast_{stage}") for stage in ("heuristic", "embedding"))
+    llm = CLASSIFICATIONS.value(source="llm")
+    agree = sum(SHADOW_CHECKS.value(result="agree", stage=s) for s in ("heuristic", "embedding"))
+    disagree = sum(SHADOW_CHECKS.value(result="disagree", stage=s) for s in ("heuristic", "embedding"))
+    return {
+        "fast_path": int(fast),
+        "llm": int(llm),
+        "llm_calls_avoided_rate": round(fast / (fast + llm), 4) if fast + llm else None,
+        "shadow_checks": int(agree + disagree),
+        "agreement_rate": round(agree / (agree + disagree), 4) if agree + disagree else None,
+    }
+
+
+CLASSIFICATIONS = metrics_service.Counter(
+    "aira_query_classifications_total",
+    "Query classifications by source (fast_heuristic, fast_embedding, llm)",
+    ("source",),
+)
+SHADOW_CHECKS = metrics_service.Counter(
+    "aira_query_classifier_shadow_total",
+    "Fast-path decisions re-checked by the LLM classifier",
+    ("result", "stage"),
+)
@@ -6,28 +6,34 @@ follow-up queries using session history, generates hypothetical passages
 for abstract queries, and applies an embedding-based confidence gate to
 detect topic drift.
 
-Config-gated via QUERY_REWRITING_ENABLED. All LLM failures gracefully
-fall back to the original query.
+Config-gated via QUERY_REWRITING_ENABLED. QUERY_REWRITE_MODE = "combined"
+classifies and rewrites (or writes the HyDE passage) in one structured
+call, falling back to the two-step calls if its output does not parse.
+All LLM failures gracefully fall back to the original query.
 """
 
 import logging
-import math
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Optional
+from typing import Callable, Optional
 
-import ollama
+import numpy as np
 from pydantic import BaseModel
 
 from config import (
     QUERY_REWRITE_MODEL,
     QUERY_REWRITE_HISTORY_WINDOW,
+    QUERY_REWRITE_MODE,
+    QUERY_FAST_CLASSIFIER_ENABLED,
+    QUERY_REWRITE_CACHE_ENABLED,
     CONFIDENCE_GATE_THRESHOLD,
     HYDE_CONFIDENCE_GATE_THRESHOLD,
     HYDE_PASSAGE_MAX_TOKENS,
 )
+import ollama_client
 from ollama_client import get_selected_model
-from services.embedding_service import generate_embeddings
+from services.embedding_service import EmbeddingContext
+from services import metrics_service, query_classifier_service, rewrite_cache_service
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +55,14 @@ class QueryClassification(BaseModel):
     reasoning: str
 
 
+class QueryAnalysis(BaseModel):
+    """Structured output from the combined classify-and-rewrite call."""
+    query_type: QueryType
+    reasoning: str
+    rewritten_query: Optional[str] = None
+    hyde_passage: Optional[str] = None
+
+
 @dataclass
 class RewriteResult:
     """Result of the query rewriting pipeline."""
@@ -60,6 +74,11 @@ class RewriteResult:
     hyde_embedding: Optional[list] = field(default=None)
     confidence_score: Optional[float] = None
     used_fallback: bool = False
+    # An LLM or embedding step failed along the way (never cached)
+    degraded: bool = False
+
+
+CLASSIFICATION_FAILED = "Classification failed:"
 
 
 # ---------------------------------------------------------------------------
@@ -98,6 +117,17 @@ LATEST QUERY: {query}
 
 STANDALONE SEARCH QUERY:"""
 
+ANALYSIS_PROMPT = CLASSIFICATION_PROMPT.replace(
+    "Return your classification and a brief reasoning.",
+    """Return your classification, a brief reasoning, and:
+- "rewritten_query": for "follow_up" only, the latest query rewritten as one standalone search-query-style sentence. Resolve all pronouns and references using the conversation; do not answer the question or add information the user did not express or imply. Otherwise null.
+{hyde_instruction}""",
+)
+
+ANALYSIS_HYDE_INSTRUCTION = """- "hyde_passage": for "abstract" only, a short passage (3-5 sentences) that would appear in a document answering the query, written as the document author in a factual tone. Otherwise null."""
+
+ANALYSIS_NO_HYDE_INSTRUCTION = """- "hyde_passage": always null."""
+
 HYDE_PROMPT = """Write a short passage (3-5 sentences) that would appear in a document answering this question. Write as if you are the document author, not as if you are answering the user. Be factual in tone. Do not hedge or qualify.
 
 QUESTION: {query}
@@ -123,6 +153,8 @@ def _format_history(conversation_history: list[dict], window: int) -> str:
     Takes the last `window` messages and formats as:
         User: ...
         Assistant: ...
+    A system message (the compacted-history summary, which names itself)
+    is included as-is rather than attributed to the assistant.
 
     Args:
         conversation_history: List of {role, content} dicts.
@@ -134,42 +166,101 @@ def _format_history(conversation_history: list[dict], window: int) -> str:
     recent_messages = conversation_history[-window:]
     lines = []
     for message in recent_messages:
+        if message["role"] == "system":
+            lines.append(message["content"])
+            continue
         role_label = "User" if message["role"] == "user" else "Assistant"
         lines.append(f"{role_label}: {message['content']}")
     return "\n".join(lines)
 
 
+def _non_empty(text: Optional[str]) -> Optional[str]:
+    """Stripped text, or None if it is missing or blank."""
+    return text.strip() or None if text else None
+
+
 def _cosine_similarity(vec_a: list[float], vec_b: list[float]) -> float:
     """
     Compute cosine similarity between two vectors.
 
     Returns 0.0 if either vector has zero magnitude.
     """
-    dot_product = sum(a * b for a, b in zip(vec_a, vec_b))
-    magnitude_a = math.sqrt(sum(a * a for a in vec_a))
-    magnitude_b = math.sqrt(sum(b * b for b in vec_b))
-    if magnitude_a == 0 or magnitude_b == 0:
+    a = np.asarray(vec_a, dtype=np.float64)
+    b = np.asarray(vec_b, dtype=np.float64)
+    magnitude = np.linalg.norm(a) * np.linalg.norm(b)
+    if magnitude == 0:
         return 0.0
-    return dot_product / (magnitude_a * magnitude_b)
+    return float(a @ b / magnitude)
 
 
 # ---------------------------------------------------------------------------
 # Core functions
 # ---------------------------------------------------------------------------
 
-def classify_query(
+def _fast_classification(
+    query: str,
+    conversation_history: list[dict],
+    embeddings: Optional[EmbeddingContext] = None,
+) -> Optional[QueryClassification]:
+    """Fast-path decision (query_classifier_service), None if the LLM is needed."""
+    if not QUERY_FAST_CLASSIFIER_ENABLED:
+        return None
+    decision = query_classifier_service.fast_classify(
+        query, conversation_history, embeddings,
+    )
+    if decision is None:
+        return None
+    query_classifier_service.shadow_check(
+        decision,
+        lambda: _llm_classify(query, conversation_history).query_type.value,
+    )
+    return QueryClassification(
+        query_type=QueryType(decision.query_type), reasoning=decision.reasoning,
+    )
+
+
+def _llm_classify(
     query: str, conversation_history: list[dict]
+) -> QueryClassification:
+    """Classify with the LLM (structured output); raises on failure."""
+    model = _get_rewrite_model()
+    history_text = _format_history(
+        conversation_history, QUERY_REWRITE_HISTORY_WINDOW
+    )
+
+    response = ollama_client.chat(
+        model=model,
+        messages=[{
+            "role": "user",
+            "content": CLASSIFICATION_PROMPT.format(
+                history=history_text, query=query,
+            ),
+        }],
+        format=QueryClassification.model_json_schema(),
+        options={"temperature": 0, "num_predict": 100},
+    )
+
+    return QueryClassification.model_validate_json(
+        response["message"]["content"]
+    )
+
+
+def classify_query(
+    query: str, conversation_history: list[dict], fast_path: bool = True
 ) -> QueryClassification:
     """
     Classify a user query as standalone, follow_up, or abstract.
 
     Short-circuits to standalone when conversation_history is empty.
-    Uses Ollama structured output with Pydantic schema.
-    Falls back to standalone on any error.
+    Confident cases are decided by the in-process fast-path classifier
+    (QUERY_FAST_CLASSIFIER_ENABLED); the rest use Ollama structured output
+    with Pydantic schema. Falls back to standalone on any error.
 
     Args:
         query: The user's current query.
         conversation_history: List of {role, content} message dicts.
+        fast_path: Try the fast-path classifier first (False when the
+            caller already has).
 
     Returns:
         QueryClassification with query_type and reasoning.
@@ -180,33 +271,68 @@ def classify_query(
             reasoning="No conversation history",
         )
 
+    if fast_path:
+        classification = _fast_classification(query, conversation_history)
+        if classification is not None:
+            return classification
+
+    query_classifier_service.record_llm_classification()
+    try:
+        return _llm_classify(query, conversation_history)
+    except Exception as exc:
+        metrics_service.record_ollama_failure("classify", exc)
+        logger.warning("Query classification failed: %s, defaulting to standalone", str(exc))
+        return QueryClassification(
+            query_type=QueryType.standalone,
+            reasoning=f"{CLASSIFICATION_FAILED} {str(exc)}",
+        )
+
+
+def analyze_query(
+    query: str, conversation_history: list[dict], allow_hyde: bool = True
+) -> Optional[QueryAnalysis]:
+    """
+    Classify a query and produce its rewrite or HyDE passage in one call.
+
+    Uses Ollama structured output with the QueryAnalysis schema.
+
+    Args:
+        query: The user's current query.
+        conversation_history: List of {role, content} message dicts.
+        allow_hyde: Whether to ask for a HyDE passage for abstract queries.
+
+    Returns:
+        QueryAnalysis, or None on any error or unparseable output (the
+        caller falls back to the two-step calls).
+    """
     model = _get_rewrite_model()
     history_text = _format_history(
         conversation_history, QUERY_REWRITE_HISTORY_WINDOW
     )
 
     try:
-        response = ollama.chat(
+        response = ollama_client.chat(
             model=model,
             messages=[{
                 "role": "user",
-                "content": CLASSIFICATION_PROMPT.format(
-                    history=history_text, query=query,
+                "content": ANALYSIS_PROMPT.format(
+                    history=history_text,
+                    query=query,
+                    hyde_instruction=(
+                        ANALYSIS_HYDE_INSTRUCTION if allow_hyde
+                        else ANALYSIS_NO_HYDE_INSTRUCTION
+                    ),
                 ),
             }],
-            format=QueryClassification.model_json_schema(),
-            options={"temperature": 0, "num_predict": 100},
+            format=QueryAnalysis.model_json_schema(),
+            options={"temperature": 0, "num_predict": 100 + HYDE_PASSAGE_MAX_TOKENS},
         )
 
-        return QueryClassification.model_validate_json(
-            response["message"]["content"]
-        )
+        return QueryAnalysis.model_validate_json(response["message"]["content"])
     except Exception as exc:
-        logger.warning("Query classification failed: %s, defaulting to standalone", str(exc))
-        return QueryClassification(
-            query_type=QueryType.standalone,
-            reasoning=f"Classification failed: {str(exc)}",
-        )
+        metrics_service.record_ollama_failure("analyze", exc)
+        logger.warning("Combined query analysis failed: %s, using two-step rewrite", str(exc))
+        return None
 
 
 def rewrite_followup(
@@ -231,7 +357,7 @@ def rewrite_followup(
     )
 
     try:
-        response = ollama.chat(
+        response = ollama_client.chat(
             model=model,
             messages=[{
                 "role": "user",
@@ -245,6 +371,7 @@ def rewrite_followup(
         rewritten = response["message"]["content"].strip()
         return rewritten if rewritten else query
     except Exception as exc:
+        metrics_service.record_ollama_failure("rewrite", exc)
         logger.warning("Query rewriting failed: %s, using original", str(exc))
         return query
 
@@ -265,7 +392,7 @@ def generate_hyde_passage(query: str) -> Optional[str]:
     model = _get_rewrite_model()
 
     try:
-        response = ollama.chat(
+        response = ollama_client.chat(
             model=model,
             messages=[{
                 "role": "user",
@@ -277,6 +404,7 @@ def generate_hyde_passage(query: str) -> Optional[str]:
         passage = response["message"]["content"].strip()
         return passage if passage else None
     except Exception as exc:
+        metrics_service.record_ollama_failure("hyde", exc)
         logger.warning("HyDE passage generation failed: %s", str(exc))
         return None
 
@@ -285,6 +413,7 @@ def confidence_gate(
     original_query: str,
     rewritten_query: str,
     threshold: float,
+    embeddings: Optional[EmbeddingContext] = None,
 ) -> tuple[str, Optional[float]]:
     """
     Check if a rewritten query drifted from the original intent.
@@ -296,14 +425,18 @@ def confidence_gate(
         original_query: The user's original query.
         rewritten_query: The rewritten or HyDE-generated query.
         threshold: Minimum cosine similarity to accept the rewrite.
+        embeddings: Optional request EmbeddingContext; both texts are
+            embedded in one call and kept there for search.
 
     Returns:
         Tuple of (selected_query, similarity_score).
         similarity_score is None if embedding failed.
     """
     try:
-        original_embedding = generate_embeddings([original_query])[0]
-        rewritten_embedding = generate_embeddings([rewritten_query])[0]
+        embeddings = embeddings or EmbeddingContext()
+        original_embedding, rewritten_embedding = embeddings.embed(
+            [original_query, rewritten_query]
+        )
 
         similarity = _cosine_similarity(original_embedding, rewritten_embedding)
 
@@ -320,45 +453,126 @@ def confidence_gate(
         return original_query, None
 
 
+def _passes_through(query_type: QueryType, allow_hyde: bool) -> bool:
+    """Whether a query of this type is searched unchanged."""
+    return query_type == QueryType.standalone or (
+        query_type == QueryType.abstract and not allow_hyde
+    )
+
+
 def rewrite_query(
-    query: str, conversation_history: list[dict]
+    query: str,
+    conversation_history: list[dict],
+    allow_hyde: bool = True,
+    on_classified: Optional[Callable[[bool], None]] = None,
+    embeddings: Optional[EmbeddingContext] = None,
 ) -> RewriteResult:
     """
     Main query rewriting orchestrator.
 
     Pipeline: classify -> rewrite/HyDE -> confidence gate.
 
-    1. Classify the query (standalone / follow_up / abstract)
+    1. Classify the query (standalone / follow_up / abstract); in
+       "combined" mode (QUERY_REWRITE_MODE) the same call also returns the
+       rewrite or HyDE passage, and a missing one is generated separately
     2. If standalone: pass through unchanged
     3. If follow_up: rewrite using history, apply confidence gate
     4. If abstract: generate HyDE passage, embed it, apply confidence gate
+       (pass through unchanged when allow_hyde is False)
 
     All failures fall back to the original query.
 
     Args:
         query: The user's current query.
         conversation_history: List of {role, content} message dicts.
+        allow_hyde: Whether abstract queries may use HyDE (retrieval
+            profiles turn it off to save an LLM call).
+        on_classified: Optional callback, called right after
+            classification with whether the query will be rewritten
+            (speculative retrieval cancels early on True).
+        embeddings: Optional request EmbeddingContext. The classifier and
+            confidence gate embed through it, so afterwards it holds the
+            effective query's vector for search.
 
     Returns:
         RewriteResult with effective_query and metadata.
+
+    Note:
+        With QUERY_REWRITE_CACHE_ENABLED, results are cached per query,
+        history window and rewrite model, so a retried turn makes no LLM
+        or embedding calls. Degraded results are not cached.
     """
+    key = None
+    if QUERY_REWRITE_CACHE_ENABLED and conversation_history:
+        key = rewrite_cache_service.make_key(
+            query, conversation_history, _get_rewrite_model(),
+            allow_hyde, QUERY_REWRITE_MODE,
+        )
+        cached = rewrite_cache_service.get(key)
+        if cached is not None:
+            if on_classified is not None:
+                on_classified(not _passes_through(QueryType(cached.query_type), allow_hyde))
+            # The key normalizes case and spacing; a query that passed
+            # through must come back as typed, or callers see a rewrite
+            if cached.effective_query == cached.original_query:
+                cached.effective_query = query
+            cached.original_query = query
+            return cached
+
+    result = _rewrite_query(
+        query, conversation_history, allow_hyde, on_classified,
+        embeddings or EmbeddingContext(),
+    )
+    if key is not None and not result.degraded:
+        rewrite_cache_service.put(key, result)
+    return result
+
+
+def _rewrite_query(
+    query: str,
+    conversation_history: list[dict],
+    allow_hyde: bool,
+    on_classified: Optional[Callable[[bool], None]],
+    embeddings: EmbeddingContext,
+) -> RewriteResult:
+    """rewrite_query without the cache."""
     try:
-        classification = classify_query(query, conversation_history)
+        # Fast path first: an obvious query needs no classification call
+        # (combined mode then rewrites with the single-purpose call)
+        classification = (
+            _fast_classification(query, conversation_history, embeddings)
+            if conversation_history else None
+        )
+        analysis = None
+        if classification is None and QUERY_REWRITE_MODE == "combined" and conversation_history:
+            analysis = analyze_query(query, conversation_history, allow_hyde)
+            if analysis is not None:
+                query_classifier_service.record_llm_classification()
+        classification = classification or analysis or classify_query(
+            query, conversation_history, fast_path=False,
+        )
         query_type = classification.query_type
+        passes_through = _passes_through(query_type, allow_hyde)
+        if on_classified is not None:
+            on_classified(not passes_through)
 
-        # Standalone: pass through
-        if query_type == QueryType.standalone:
+        # Standalone (or abstract with HyDE disabled): pass through
+        if passes_through:
             return RewriteResult(
                 original_query=query,
                 effective_query=query,
                 query_type=query_type.value,
+                degraded=classification.reasoning.startswith(CLASSIFICATION_FAILED),
             )
 
         # Follow-up: rewrite + confidence gate
         if query_type == QueryType.follow_up:
-            rewritten = rewrite_followup(query, conversation_history)
+            rewritten = (
+                _non_empty(analysis and analysis.rewritten_query)
+                or rewrite_followup(query, conversation_history)
+            )
             gated_query, similarity = confidence_gate(
-                query, rewritten, CONFIDENCE_GATE_THRESHOLD,
+                query, rewritten, CONFIDENCE_GATE_THRESHOLD, embeddings,
             )
             used_fallback = gated_query == query and rewritten != query
             return RewriteResult(
@@ -368,33 +582,39 @@ def rewrite_query(
                 rewritten_query=rewritten,
                 confidence_score=similarity,
                 used_fallback=used_fallback,
+                degraded=rewritten == query or similarity is None,
             )
 
         # Abstract: HyDE + confidence gate
         if query_type == QueryType.abstract:
-            hyde_passage = generate_hyde_passage(query)
+            hyde_passage = (
+                _non_empty(analysis and analysis.hyde_passage)
+                or generate_hyde_passage(query)
+            )
             hyde_embedding = None
             confidence_score = None
             effective_query = query
+            degraded = hyde_passage is None
 
             if hyde_passage:
                 gated_query, similarity = confidence_gate(
-                    query, hyde_passage, HYDE_CONFIDENCE_GATE_THRESHOLD,
+                    query, hyde_passage, HYDE_CONFIDENCE_GATE_THRESHOLD, embeddings,
                 )
                 confidence_score = similarity
                 effective_query = gated_query
+                degraded = similarity is None
 
-                # Embed the HyDE passage for use in search
+                # The gate already embedded the passage
                 if gated_query == hyde_passage:
                     try:
-                        embeddings = generate_embeddings([hyde_passage])
-                        hyde_embedding = embeddings[0]
+                        hyde_embedding = embeddings.embed([hyde_passage])[0]
                     except Exception as embed_exc:
                         logger.warning(
                             "HyDE embedding failed: %s, using original query",
                             str(embed_exc),
                         )
                         effective_query = query
+                        degraded = True
 
             used_fallback = effective_query == query and hyde_passage is not None
             return RewriteResult(
@@ -405,6 +625,7 @@ def rewrite_query(
                 hyde_embedding=hyde_embedding,
                 confidence_score=confidence_score,
                 used_fallback=used_fallback,
+                degraded=degraded,
             )
 
         # Unknown type fallback (should not happen)
@@ -422,4 +643,5 @@ def rewrite_query(
             effective_query=query,
             query_type=QueryType.standalone.value,
             used_fallback=True,
+            degraded=True,
         )
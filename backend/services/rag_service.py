@@ -4,16 +4,35 @@ RAG service orchestrating document retrieval and LLM response generation.
 Combines semantic search with streaming chat completion for context-aware answers.
 """
 
+import asyncio
+import functools
 import logging
-from typing import AsyncGenerator, Optional
+import time
+from typing import AsyncGenerator, Callable, Optional
 
-from services.retrieval_service import search_documents
+from services.retrieval_service import (
+    RetrievalOptions, asearch_documents, resolve_retrieval_options,
+)
 from services.query_rewrite_service import rewrite_query
-from ollama_client import stream_chat_completion
-from config import QUERY_REWRITING_ENABLED
+from services.embedding_service import EmbeddingContext
+from services.context_packer_service import pack_context
+from services.token_service import count_tokens
+from services.timing_service import NULL_TIMINGS, new_timings
+from services.metrics_service import SPECULATIVE_RETRIEVALS
+from services import answer_cache_service
+from services.index_generation_service import current_generation
+from ollama_client import stream_chat_completion, get_selected_model
+from config import (
+    QUERY_REWRITING_ENABLED, PROMPT_LAYOUT, SPECULATIVE_RETRIEVAL_ENABLED,
+    ANSWER_CACHE_ENABLED,
+)
 
 logger = logging.getLogger(__name__)
 
+# Appended after every answer; derived content, stripped from history
+# before it goes back to the model (history_compaction_service)
+SOURCES_FOOTER = "\n\n---\n\n**Sources Referenced**\n"
+
 
 # System prompt template for RAG responses
 SYSTEM_PROMPT_TEMPLATE = """You are a helpful research assistant. Answer the user's question based ONLY on the provided document excerpts below.
@@ -56,13 +75,151 @@ REMINDERS:
 
 Now answer the user's question based on these documents."""
 
+# PROMPT_LAYOUT = "cache_friendly": the system message carries only these
+# turn-independent instructions, so it and the append-only history form a
+# prefix the model server can reuse from its KV cache; each turn's
+# documents travel with the question in the final user message
+STABLE_SYSTEM_PROMPT = """You are a helpful research assistant. Answer each user question based ONLY on the document excerpts provided with that question.
+
+**OUTPUT FORMAT**
+Structure your answer as clear markdown. Consider using:
+- Bold text (**text**) for key terms and emphasis
+- Section headers (## Main Topic, ### Subtopic) when organizing complex answers
+- Bullet points for lists and multiple items
+- Clear paragraphs for narrative explanations
+
+Adapt your structure to the question type. Simple questions may need just a paragraph; complex topics benefit from sections.
+
+**CITATION REQUIREMENTS**
+- Use inline citations in the format [Doc N] immediately after factual claims
+- Only cite documents provided with the current question; earlier questions' documents are no longer available
+- Each major claim or piece of information should reference its source document
+- Multiple facts from the same document still need citations: "Fact one [Doc 2]. Fact two [Doc 2]."
+- CORRECT citation format examples:
+  "The report found a 15% increase [Doc 1]. This was driven by market growth [Doc 2]."
+  "According to the analysis [Doc 3], three factors contributed."
+- WRONG citation formats (DO NOT USE): "Document 1 states...", "Doc 1 (Section 3/10) says...", "Source: filename.pdf"
+- Always use the bracket format: [Doc 1], [Doc 2], etc. — never spell out "Document" or include filenames inline.
+
+**GROUNDING RULES**
+- Answer ONLY using the provided documents
+- If documents don't fully answer the question, explicitly state what information is missing
+- Never add information from your training knowledge
+- When uncertain, acknowledge the limitation rather than speculating
+- If no documents are relevant, say so clearly
+
+**IMPORTANT: Do NOT generate a "Sources", "References", or "Sources Referenced" section at the end of your response. The system will automatically append source references. Your job is ONLY to use inline [Doc N] citations within your answer text.**"""
+
+TURN_PROMPT_TEMPLATE = """DOCUMENTS:
+{context}
+
+REMINDERS:
+- Use ONLY [Doc N] format for citations (Doc 1 through Doc {num_docs})
+- Do NOT write a sources/references section — it is added automatically
+
+QUESTION: {query}"""
+
+
+def build_prompt_messages(
+    query: str,
+    context: str,
+    num_docs: int,
+    history: list[dict],
+    layout: Optional[str] = None,
+) -> list[dict]:
+    """
+    Arrange instructions, documents, history and the question for the LLM.
+
+    Args:
+        query: User's question
+        context: Formatted document excerpts ("[Doc N] Source: ...")
+        num_docs: Number of excerpts in context
+        history: Previous messages to include, oldest first
+        layout: "context_first" (documents in the leading system message)
+                or "cache_friendly" (stable system message, history, then
+                documents and question last); default: PROMPT_LAYOUT
+
+    Returns:
+        Chat messages
+    """
+    layout = layout or PROMPT_LAYOUT
+    if layout == "cache_friendly":
+        return (
+            [{"role": "system", "content": STABLE_SYSTEM_PROMPT}]
+            + list(history)
+            + [{
+                "role": "user",
+                "content": TURN_PROMPT_TEMPLATE.format(
+                    context=context, num_docs=num_docs, query=query
+                ),
+            }]
+        )
+    return (
+        [{
+            "role": "system",
+            "content": SYSTEM_PROMPT_TEMPLATE.format(context=context, num_docs=num_docs),
+        }]
+        + list(history)
+        + [{"role": "user", "content": query}]
+    )
+
+
+async def _speculative_results(
+    task: asyncio.Task, usable: bool, timings, speculative_timings
+) -> Optional[list[dict]]:
+    """
+    Settle a speculative search started with the original query.
+
+    Returns its results when the query was not rewritten and the search
+    succeeded (its stage timings are merged into the request's), None
+    when the caller has to search again.
+    """
+    if not usable:
+        task.cancel()
+        SPECULATIVE_RETRIEVALS.inc(outcome="cancelled")
+        return None
+    # wait() rather than await: a client disconnect must not look like
+    # the task's own cancellation
+    await asyncio.wait({task})
+    if task.cancelled() or task.exception() is not None:
+        if not task.cancelled():
+            logger.warning("Speculative retrieval failed: %s", str(task.exception()))
+        SPECULATIVE_RETRIEVALS.inc(outcome="failed")
+        return None
+    timings.merge(speculative_timings)
+    SPECULATIVE_RETRIEVALS.inc(outcome="used")
+    return task.result()
+
+
+async def _lookup_answer(
+    query: str, scope: tuple, embeddings: EmbeddingContext, timings
+) -> tuple[Optional[list[float]], Optional[answer_cache_service.CachedAnswer]]:
+    """
+    Embed the query (kept in the request's EmbeddingContext for search)
+    and look for a stored answer to a close enough question.
+
+    Returns:
+        (query embedding or None if embedding failed, cached answer or None)
+    """
+    loop = asyncio.get_running_loop()
+    with timings.stage("answer_cache"):
+        try:
+            vector = (await loop.run_in_executor(None, embeddings.embed, [query]))[0]
+        except Exception as exc:
+            logger.warning("Answer cache lookup skipped: %s", str(exc))
+            return None, None
+        return vector, answer_cache_service.get(vector, scope)
+
 
 async def generate_rag_response(
     query: str,
     conversation_history: list[dict],
-    top_k: int = 5,
+    top_k: Optional[int] = None,
     model: Optional[str] = None,
     document_ids: Optional[list[str]] = None,
+    timings=NULL_TIMINGS,
+    options: Optional[RetrievalOptions] = None,
+    on_cached: Optional[Callable[[], None]] = None,
 ) -> AsyncGenerator[str, None]:
     """
     Generate a streaming RAG response by retrieving relevant chunks and calling LLM.
@@ -70,9 +227,17 @@ async def generate_rag_response(
     Args:
         query: User's question/query text
         conversation_history: List of previous message dicts (role, content)
-        top_k: Number of document chunks to retrieve (default: 5)
+        top_k: Number of document chunks to retrieve (default: the
+               profile's top_k)
         model: Optional model name override
         document_ids: Optional list of document IDs to filter search results
+        timings: Optional StageTimings; records rewrite, the retrieval
+                 stages, pack, llm_first_token and llm (ms); a speculative
+                 search's stages are recorded only when its results are used
+        options: Optional RetrievalOptions (retrieval profile); also gates
+                 query rewriting (options.rewrite) and HyDE (options.hyde)
+        on_cached: Optional callback, called before the first chunk when
+                   the answer is replayed from the answer cache
 
     Yields:
         str: Response content chunks from LLM
@@ -80,32 +245,137 @@ async def generate_rag_response(
     Note:
         If no relevant documents are found, yields an informative message
         instead of calling the LLM.
+
+        With SPECULATIVE_RETRIEVAL_ENABLED, retrieval with the original
+        query runs while the query is being classified and rewritten; it
+        is cancelled as soon as the classifier says the query will be
+        rewritten, and otherwise its results are used as-is. It reranks
+        only once the query is known to pass through.
+
+        With ANSWER_CACHE_ENABLED, a standalone query (no history, or
+        classified standalone) close to an earlier question over the same
+        documents, model and index generation replays the earlier answer
+        (answer_cache_service); new answers are stored once fully streamed.
     """
     # Query rewriting: resolve follow-ups and abstract queries before search
+    options = options or resolve_retrieval_options()
     effective_query = query
     hyde_embedding = None
+    # Vectors computed while rewriting are reused by search
+    embeddings = EmbeddingContext()
+    model_to_use = model if model else get_selected_model()
+    # Captured before retrieval: an ingest mid-answer leaves the entry stale
+    generation = current_generation()
+
+    search_results = None
+    speculative = None
+    rewrite_result = None
+
+    rewrite_enabled = QUERY_REWRITING_ENABLED if options.rewrite is None else options.rewrite
+    if rewrite_enabled and conversation_history:
+        loop = asyncio.get_running_loop()
+        on_classified = None
+        if SPECULATIVE_RETRIEVAL_ENABLED:
+            speculative_timings = new_timings() if timings.enabled else NULL_TIMINGS
+            # Reranking waits for the classifier: a rerank already queued on
+            # the single rerank worker would delay the rewritten query's
+            rerank_gate = asyncio.Event()
+            speculative = asyncio.create_task(asearch_documents(
+                query,
+                top_k=top_k,
+                doc_ids=document_ids,
+                timings=speculative_timings,
+                options=options,
+                embeddings=embeddings,
+                rerank_gate=rerank_gate,
+            ))
+
+            def on_classified(will_rewrite: bool) -> None:
+                # Called on the executor thread
+                if will_rewrite:
+                    loop.call_soon_threadsafe(speculative.cancel)
+                else:
+                    loop.call_soon_threadsafe(rerank_gate.set)
 
-    if QUERY_REWRITING_ENABLED and conversation_history:
         try:
-            rewrite_result = rewrite_query(query, conversation_history)
+            # Blocking Ollama calls: keep them off the event loop
+            with timings.stage("rewrite"):
+                rewrite_result = await loop.run_in_executor(
+                    None, functools.partial(
+                        rewrite_query, query, conversation_history,
+                        allow_hyde=options.hyde, on_classified=on_classified,
+                        embeddings=embeddings,
+                    )
+                )
             effective_query = rewrite_result.effective_query
             hyde_embedding = rewrite_result.hyde_embedding
         except Exception as exc:
             logger.warning("Query rewriting failed: %s, using original query", str(exc))
+        finally:
+            if speculative is not None and not speculative.done():
+                # Left running only if the query passed through
+                if effective_query != query or hyde_embedding is not None:
+                    speculative.cancel()
+                else:
+                    rerank_gate.set()
+
+    # Answer cache: standalone questions only, since the answer to a
+    # follow-up depends on the conversation
+    answer_embedding = None
+    answer_scope = None
+    if ANSWER_CACHE_ENABLED and (not conversation_history or (
+        rewrite_result is not None
+        and rewrite_result.query_type == "standalone"
+        and not rewrite_result.degraded
+    )):
+        answer_scope = answer_cache_service.make_scope(
+            document_ids, model_to_use, (top_k, options.cache_fingerprint()),
+        )
+        answer_embedding, cached = await _lookup_answer(
+            query, answer_scope, embeddings, timings
+        )
+        if cached is not None:
+            if speculative is not None:
+                await _speculative_results(speculative, False, timings, speculative_timings)
+            if on_cached is not None:
+                on_cached()
+            for chunk in cached.chunks:
+                yield chunk
+            return
+
+    if speculative is not None:
+        search_results = await _speculative_results(
+            speculative,
+            effective_query == query and hyde_embedding is None,
+            timings, speculative_timings,
+        )
 
     # Retrieve relevant document chunks
-    search_results = search_documents(
-        effective_query,
-        top_k=top_k,
-        doc_ids=document_ids,
-        query_embedding=hyde_embedding,
-    )
+    if search_results is None:
+        search_results = await asearch_documents(
+            effective_query,
+            top_k=top_k,
+            doc_ids=document_ids,
+            query_embedding=hyde_embedding,
+            timings=timings,
+            options=options,
+            embeddings=embeddings,
+        )
 
     # Handle case where no documents are found
     if not search_results:
         yield "I couldn't find any relevant documents to answer your question. Please upload documents related to your query first."
         return
 
+    # Fit contexts and history into the prompt token budget
+    with timings.stage("pack"):
+        fixed_tokens = sum(
+            count_tokens(message["content"])
+            for message in build_prompt_messages(query, "", len(search_results), [])
+        )
+        packed = pack_context(search_results, conversation_history, fixed_tokens)
+    search_results = packed.results
+
     # Build context string from search results and track source mapping
     context_parts = []
     source_map = []
@@ -129,30 +399,30 @@ async def generate_rag_response(
 
     context = "\n\n".join(context_parts)
 
-    # Build messages list for LLM
-    messages = [
-        {
-            "role": "system",
-            "content": SYSTEM_PROMPT_TEMPLATE.format(
-                context=context, num_docs=len(search_results)
-            ),
-        }
-    ]
-
-    # Add conversation history
-    messages.extend(conversation_history)
-
-    # Add current user query
-    messages.append({"role": "user", "content": query})
+    # Build messages list for LLM: history holds the newest messages that
+    # fit the budget; PROMPT_LAYOUT decides where the documents go
+    messages = build_prompt_messages(query, context, len(search_results), packed.history)
 
     # Stream LLM response with selected model (use passed model or fall back to global)
-    from ollama_client import get_selected_model
-
-    model_to_use = model if model else get_selected_model()
+    streamed = []
+    llm_started = time.perf_counter()
+    first_token = True
     async for chunk in stream_chat_completion(messages, model_to_use):
+        if first_token:
+            timings.record("llm_first_token", (time.perf_counter() - llm_started) * 1000)
+            first_token = False
+        streamed.append(chunk)
         yield chunk
+    timings.record("llm", (time.perf_counter() - llm_started) * 1000)
 
     # Append sources footer after LLM completes
-    yield "\n\n---\n\n**Sources Referenced**\n"
+    streamed.append(SOURCES_FOOTER)
+    yield SOURCES_FOOTER
     for source in source_map:
-        yield f"- [Doc {source['doc_number']}]: {source['filename']} (Section {source['chunk_position']})\n"
+        line = f"- [Doc {source['doc_number']}]: {source['filename']} (Section {source['chunk_position']})\n"
+        streamed.append(line)
+        yield line
+
+    # Reached only when the whole answer was streamed
+    if answer_embedding is not None:
+        answer_cache_service.put(query, answer_embedding, answer_scope, generation, streamed)
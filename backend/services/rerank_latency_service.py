@@ -0,0 +1,120 @@
+"""
+Reranker latency model for adaptive candidate sizing.
+
+Keeps an exponentially weighted moving average of per-pair scoring time
+for each reranker (cross-encoder, late interaction) and tracks the pairs
+currently queued on or running in the rerank executor. Before a rerank
+is submitted, fit_candidate_count() picks the largest candidate count
+whose expected queue wait plus scoring time fits the deadline, so a
+loaded box reranks fewer candidates instead of timing out to rrf_only,
+and an idle box reranks more.
+"""
+
+import math
+import threading
+from typing import Optional
+
+from config import (
+    RERANK_LATENCY_EWMA_ALPHA, RERANK_ADAPTIVE_HEADROOM,
+    RERANK_ADAPTIVE_MIN_CANDIDATES,
+)
+from services import metrics_service
+
+# Scorer -> EWMA of scoring time per (query, passage) pair, in ms
+_per_pair_ms: dict[str, float] = {}
+# Pairs submitted to the rerank executor and not yet finished
+_outstanding_pairs = 0
+_lock = threading.Lock()
+
+
+def per_pair_ms(scorer: str) -> Optional[float]:
+    """Current per-pair latency estimate (None until the first observation)."""
+    return _per_pair_ms.get(scorer)
+
+
+def queue_wait_ms(scorer: str) -> float:
+    """Expected wait for the work already queued ahead of a new submission."""
+    estimate = _per_pair_ms.get(scorer)
+    if estimate is None:
+        return 0.0
+    return _outstanding_pairs * estimate
+
+
+def fit_candidate_count(
+    scorer: str,
+    deadline_ms: float,
+    max_count: int,
+    queries: int = 1,
+    default: Optional[int] = None,
+) -> int:
+    """
+    Largest candidate count per query whose rerank is expected to finish
+    within the deadline.
+
+    Args:
+        scorer: Reranker name (estimates are kept per scorer)
+        deadline_ms: Rerank deadline for the whole submission
+        max_count: Upper bound (the candidates available or allowed)
+        queries: Queries sharing the submission (batch search)
+        default: Count to use until the scorer has been observed
+                 (default: max_count)
+
+    Returns:
+        Count in [min(RERANK_ADAPTIVE_MIN_CANDIDATES, max_count), max_count]
+    """
+    estimate = _per_pair_ms.get(scorer)
+    if estimate is None or estimate <= 0:
+        return min(max_count, default) if default is not None else max_count
+    budget_ms = deadline_ms * RERANK_ADAPTIVE_HEADROOM - queue_wait_ms(scorer)
+    fitted = math.floor(budget_ms / (estimate * queries)) if budget_ms > 0 else 0
+    floor = min(RERANK_ADAPTIVE_MIN_CANDIDATES, max_count)
+    return max(floor, min(max_count, fitted))
+
+
+def submitted(pairs: int) -> None:
+    """Register pairs queued on the rerank executor."""
+    global _outstanding_pairs
+    with _lock:
+        _outstanding_pairs += pairs
+
+
+def finished(scorer: str, pairs: int, elapsed_ms: Optional[float] = None) -> None:
+    """
+    Release queued pairs and record the scoring time of a completed rerank.
+
+    Called from the worker, also after the caller has timed out, so slow
+    calls still update the estimate. elapsed_ms=None (failed or never
+    started) only releases the pairs.
+    """
+    global _outstanding_pairs
+    with _lock:
+        _outstanding_pairs = max(0, _outstanding_pairs - pairs)
+        if elapsed_ms is None or pairs <= 0:
+            return
+        observed = elapsed_ms / pairs
+        previous = _per_pair_ms.get(scorer)
+        _per_pair_ms[scorer] = observed if previous is None else (
+            RERANK_LATENCY_EWMA_ALPHA * observed
+            + (1 - RERANK_LATENCY_EWMA_ALPHA) * previous
+        )
+        PER_PAIR_LATENCY.set(_per_pair_ms[scorer], scorer=scorer)
+
+
+def reset() -> None:
+    """Forget all estimates and outstanding work."""
+    global _outstanding_pairs
+    with _lock:
+        _per_pair_ms.clear()
+        _outstanding_pairs = 0
+
+
+PER_PAIR_LATENCY = metrics_service.Gauge(
+    "aira_rerank_per_pair_ms",
+    "EWMA reranker scoring time per query-passage pair",
+    ("scorer",),
+)
+OUTSTANDING_PAIRS = metrics_service.Gauge(
+    "aira_rerank_outstanding_pairs",
+    "Pairs queued on or running in the rerank executor",
+    callback=lambda: _outstanding_pairs,
+)
@@ -3,19 +3,39 @@ Reranker service using cross-encoder for relevance scoring.
 
 Lazy-loads bge-reranker-v2-m3 on first use. Provides status tracking
 for health endpoint integration.
+
+Chunk texts are tokenized once at ingest and cached as int32 token ids
+(see chunk_artifact_service), so at query time only the query is
+tokenized. Caches built with a different RERANKER_MODEL are rebuilt in
+the background from the chunk texts stored in ChromaDB.
 """
 
 import logging
-from typing import List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Union
 
+import numpy as np
 from FlagEmbedding import FlagReranker
 
-from config import RERANKER_MODEL, RERANKER_USE_FP16
+from config import (
+    RERANKER_MODEL, RERANKER_USE_FP16, RERANKER_MAX_LENGTH,
+    RERANKER_BATCH_SIZE, RERANKER_TOKEN_CACHE_ENABLED,
+)
+from services import chunk_artifact_service
+from services import metrics_service
 
 logger = logging.getLogger(__name__)
 
+TOKEN_CACHE_KIND = "rerank_tokens"
+
 _reranker: FlagReranker = None
 _reranker_status: str = "unavailable"
+_tokenizer = None
+
+_rebuild_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="token-cache")
+_pending_rebuilds: set = set()
+_pending_lock = threading.Lock()
 
 
 def get_reranker_status() -> str:
@@ -43,6 +63,169 @@ def _get_reranker() -> FlagReranker:
     return _reranker
 
 
+def _get_tokenizer():
+    """
+    Return the reranker's tokenizer without loading the model weights.
+
+    Reuses the loaded reranker's tokenizer when available so ingest-time
+    and query-time token ids always come from the same vocabulary.
+    """
+    global _tokenizer
+    if _reranker is not None:
+        return _reranker.tokenizer
+    if _tokenizer is None:
+        from transformers import AutoTokenizer
+        _tokenizer = AutoTokenizer.from_pretrained(RERANKER_MODEL)
+    return _tokenizer
+
+
+def tokenize_chunks(texts: List[str]) -> List[np.ndarray]:
+    """
+    Tokenize chunk texts for the cross-encoder without special tokens.
+
+    Args:
+        texts: Chunk texts as stored in ChromaDB
+
+    Returns:
+        One int32 token id array per text, truncated to RERANKER_MAX_LENGTH
+    """
+    encoded = _get_tokenizer()(
+        texts,
+        add_special_tokens=False,
+        truncation=True,
+        max_length=RERANKER_MAX_LENGTH,
+    )
+    return [np.asarray(ids, dtype=np.int32) for ids in encoded["input_ids"]]
+
+
+def build_token_cache(doc_id: str, chunks: List[str]) -> None:
+    """
+    Precompute and store reranker token ids for a document's chunks.
+
+    Called at ingest so queries never re-tokenize chunk text.
+
+    Args:
+        doc_id: Document identifier
+        chunks: Chunk texts in chunk_index order
+    """
+    if not RERANKER_TOKEN_CACHE_ENABLED or not chunks:
+        return
+    chunk_artifact_service.save_artifacts(
+        TOKEN_CACHE_KIND, doc_id, tokenize_chunks(chunks), RERANKER_MODEL
+    )
+
+
+def _rebuild_token_cache(doc_id: str) -> None:
+    """Re-tokenize a document's stored chunks (missing or stale cache)."""
+    from services.vector_service import get_collection
+
+    try:
+        result = get_collection().get(
+            where={"doc_id": {"$eq": doc_id}},
+            include=["documents", "metadatas"],
+        )
+        ordered = sorted(
+            zip(result["metadatas"], result["documents"]),
+            key=lambda item: item[0]["chunk_index"],
+        )
+        build_token_cache(doc_id, [text for _, text in ordered])
+        logger.info("Rebuilt reranker token cache for doc %s", doc_id)
+    except Exception:
+        logger.warning("Token cache rebuild failed for doc %s", doc_id, exc_info=True)
+    finally:
+        with _pending_lock:
+            _pending_rebuilds.discard(doc_id)
+
+
+def _schedule_rebuild(doc_id: str) -> None:
+    """Queue a background rebuild unless one is already pending."""
+    with _pending_lock:
+        if doc_id in _pending_rebuilds:
+            return
+        _pending_rebuilds.add(doc_id)
+    _rebuild_executor.submit(_rebuild_token_cache, doc_id)
+
+
+def _cached_token_ids(candidates: List[dict]) -> Optional[List[np.ndarray]]:
+    """
+    Look up precomputed token ids for every candidate.
+
+    Returns None if any candidate is missing from the cache (legacy
+    chunk, or cache built with another model); those documents are
+    scheduled for a background rebuild.
+    """
+    if not RERANKER_TOKEN_CACHE_ENABLED:
+        return None
+
+    token_ids = []
+    missing_docs = set()
+    for candidate in candidates:
+        chunk_id = candidate.get("chunk_id")
+        doc_id = candidate.get("source_doc_id")
+        if not chunk_id or not doc_id:
+            return None
+        doc_tokens = chunk_artifact_service.load_artifacts(
+            TOKEN_CACHE_KIND, doc_id, RERANKER_MODEL
+        )
+        chunk_index = int(chunk_id.rsplit("_chunk_", 1)[1])
+        if doc_tokens is None or chunk_index >= len(doc_tokens):
+            missing_docs.add(doc_id)
+            continue
+        token_ids.append(doc_tokens[chunk_index])
+
+    for doc_id in missing_docs:
+        _schedule_rebuild(doc_id)
+    return None if missing_docs else token_ids
+
+
+def _compute_scores_from_token_ids(
+    reranker: FlagReranker,
+    query: Union[str, List[str]],
+    passage_token_ids: List[np.ndarray],
+) -> List[float]:
+    """
+    Score query/passage pairs from pre-tokenized passages.
+
+    Mirrors FlagReranker.compute_score(normalize=True) but only the query
+    is tokenized; passage ids are concatenated with the model's special
+    tokens via prepare_for_model. Pairs go through the model in slices of
+    RERANKER_BATCH_SIZE, so a large batched search never pads thousands
+    of pairs into one forward pass.
+
+    Args:
+        query: One query for every passage, or one query per passage
+            (batched searches); each distinct query is tokenized once
+    """
+    import torch
+
+    tokenizer = reranker.tokenizer
+    pair_queries = [query] * len(passage_token_ids) if isinstance(query, str) else query
+    query_ids = {
+        text: tokenizer(
+            text, add_special_tokens=False, truncation=True,
+            max_length=RERANKER_MAX_LENGTH,
+        )["input_ids"]
+        for text in set(pair_queries)
+    }
+    features = [
+        tokenizer.prepare_for_model(
+            query_ids[pair_query], passage_ids.tolist(),
+            truncation="longest_first", max_length=RERANKER_MAX_LENGTH,
+        )
+        for pair_query, passage_ids in zip(pair_queries, passage_token_ids)
+    ]
+    slice_logits = []
+    for start in range(0, len(features), RERANKER_BATCH_SIZE):
+        inputs = tokenizer.pad(
+            features[start:start + RERANKER_BATCH_SIZE], padding=True, return_tensors="pt",
+        ).to(reranker.device)
+        with torch.no_grad():
+            logits = reranker.model(**inputs, return_dict=True).logits.view(-1).float()
+        slice_logits.append(logits.cpu().numpy())
+    logits = np.concatenate(slice_logits) if slice_logits else np.zeros(0, dtype=np.float32)
+    return (1.0 / (1.0 + np.exp(-logits))).tolist()
+
+
 def rerank(
     query: str,
     candidates: List[dict],
@@ -51,6 +234,9 @@ def rerank(
     """
     Rerank candidates using cross-encoder scoring.
 
+    Uses cached chunk token ids when every candidate has them; otherwise
+    falls back to tokenizing candidate text.
+
     Args:
         query: The search query text
         candidates: List of dicts, each must contain a "text" key
@@ -61,8 +247,16 @@ def rerank(
         each with "reranker_score" key added
     """
     reranker = _get_reranker()
-    pairs = [[query, candidate["text"]] for candidate in candidates]
-    scores = reranker.compute_score(pairs, normalize=True)
+    metrics_service.RERANK_BATCH_SIZE.observe(len(candidates), scorer="cross_encoder")
+
+    token_ids = _cached_token_ids(candidates)
+    if token_ids is not None:
+        scores = _compute_scores_from_token_ids(reranker, query, token_ids)
+    else:
+        pairs = [[query, candidate["text"]] for candidate in candidates]
+        scores = reranker.compute_score(
+            pairs, batch_size=RERANKER_BATCH_SIZE, normalize=True
+        )
 
     # Pitfall 3: compute_score returns float for single pair
     if isinstance(scores, float):
@@ -73,3 +267,54 @@ def rerank(
 
     ranked = sorted(candidates, key=lambda x: x["reranker_score"], reverse=True)
     return ranked[:top_k]
+
+
+def rerank_batch(
+    queries: List[str],
+    candidate_lists: List[List[dict]],
+    top_k: int = 5
+) -> List[List[dict]]:
+    """
+    Rerank candidates for several queries in one cross-encoder pass.
+
+    All query/candidate pairs are scored together so the model sees full
+    batches instead of one small batch per query.
+
+    Args:
+        queries: Search query texts
+        candidate_lists: Candidates per query (parallel to queries)
+        top_k: Number of top results to return per query
+
+    Returns:
+        Top-k candidates per query, each sorted by reranker_score descending
+    """
+    reranker = _get_reranker()
+
+    pair_queries = [
+        query for query, candidates in zip(queries, candidate_lists)
+        for _ in candidates
+    ]
+    flat = [candidate for candidates in candidate_lists for candidate in candidates]
+    if not flat:
+        return [[] for _ in queries]
+    metrics_service.RERANK_BATCH_SIZE.observe(len(flat), scorer="cross_encoder")
+
+    token_ids = _cached_token_ids(flat)
+    if token_ids is not None:
+        scores = _compute_scores_from_token_ids(reranker, pair_queries, token_ids)
+    else:
+        pairs = [[query, candidate["text"]] for query, candidate in zip(pair_queries, flat)]
+        scores = reranker.compute_score(
+            pairs, batch_size=RERANKER_BATCH_SIZE, normalize=True
+        )
+
+    if isinstance(scores, float):
+        scores = [scores]
+
+    for candidate, score in zip(flat, scores):
+        candidate["reranker_score"] = score
+
+    return [
+        sorted(candidates, key=lambda x: x["reranker_score"], reverse=True)[:top_k]
+        for candidates in candidate_lists
+    ]
@@ -3,41 +3,152 @@ Hybrid retrieval service with dense + BM25 search, RRF fusion, and reranking.
 
 Embeds user queries, performs dense search via ChromaDB, keyword search via
 BM25, fuses results using Reciprocal Rank Fusion, and reranks with a
-cross-encoder model (timeout-guarded with graceful fallback).
+cross-encoder or late-interaction model (timeout-guarded with graceful
+fallback).
+
+The pipeline is async (asearch_documents) so searches never block the
+event loop serving chat streams; search_documents is a sync wrapper.
 """
 
+import asyncio
+import dataclasses
 import logging
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
-from typing import Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Optional
+
+import numpy as np
 
-from services.embedding_service import generate_embeddings
+from services.embedding_service import EmbeddingContext, generate_embeddings
 from services.vector_service import get_collection
 from services import reranker_service
+from services import late_interaction_service
 from services import bm25_index_service
+from services import metrics_service
+from services import rerank_latency_service
+from services import search_cache_service
+from services.index_generation_service import current_generation
+from services.timing_service import NULL_TIMINGS
 from config import (
     RERANKER_CANDIDATE_COUNT, RERANK_OUTPUT_SIZE, RERANKER_TIMEOUT_MS,
+    PARENT_OVERFETCH_FACTOR, RERANK_STRATEGY,
+    RERANK_CASCADE_ENABLED, CASCADE_FIRST_STAGE, CASCADE_FIRST_STAGE_SIZE,
+    CASCADE_FIRST_STAGE_TIMEOUT_MS,
     RRF_K, RRF_DENSE_WEIGHT, RRF_BM25_WEIGHT, BM25_TOP_K,
+    DENSE_TIMEOUT_MS, BM25_TIMEOUT_MS, SEARCH_CACHE_ENABLED,
+    RETRIEVAL_PROFILES, DEFAULT_RETRIEVAL_PROFILE,
+    RERANK_ADAPTIVE_ENABLED, RERANK_ADAPTIVE_MAX_CANDIDATES,
+    RERANK_EARLY_EXIT_ENABLED, RERANK_EARLY_EXIT_MIN_GAP,
+    MMR_ENABLED, MMR_LAMBDA, MMR_DUPLICATE_THRESHOLD, MMR_CHARS_PER_TOKEN,
 )
 
 logger = logging.getLogger(__name__)
+# Blocking client calls (Ollama embed, embedded ChromaDB)
+_io_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieval-io")
+# CPU-bound BM25 scoring
+_cpu_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bm25")
 _rerank_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+# Separate pool so a slow cross-encoder call cannot starve the cheap stage
+_first_pass_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="first-pass")
 
 
-def _query_dense(
-    query_embedding: list[float],
+@dataclass(frozen=True)
+class RetrievalOptions:
+    """Per-request retrieval settings: a named profile plus overrides."""
+
+    profile: str
+    top_k: int                    # results returned
+    candidate_count: int          # fused candidates sent to the reranker
+    bm25_top_k: int
+    rerank: bool                  # False = return RRF order ('rrf_only')
+    rerank_timeout_ms: int
+    rewrite: Optional[bool] = None  # None = QUERY_REWRITING_ENABLED
+    hyde: bool = True
+    adaptive: bool = False        # size candidate_count from reranker latency
+    early_exit: bool = False      # skip reranking when fusion is decisive
+    mmr: bool = False             # drop near-duplicate results after reranking
+    mmr_threshold: float = MMR_DUPLICATE_THRESHOLD
+
+    def cache_fingerprint(self) -> tuple:
+        """Fields that change which results a query returns."""
+        return (
+            self.top_k, self.candidate_count, self.bm25_top_k, self.rerank,
+            self.early_exit, self.mmr, self.mmr_threshold,
+        )
+
+
+def resolve_retrieval_options(
+    profile: Optional[str] = None, top_k: Optional[int] = None, **overrides
+) -> RetrievalOptions:
+    """
+    Build RetrievalOptions from config defaults, a profile and overrides.
+
+    Precedence: explicit overrides > profile (RETRIEVAL_PROFILES) >
+    global config. None values are ignored so API params can be passed
+    through unconditionally. An explicit candidate_count turns adaptive
+    candidate sizing off.
+
+    Args:
+        profile: Profile name (default: DEFAULT_RETRIEVAL_PROFILE)
+        top_k: Number of results to return
+        **overrides: Any other RetrievalOptions field
+
+    Returns:
+        Resolved RetrievalOptions
+
+    Raises:
+        ValueError: If the profile or an override name is unknown
+    """
+    name = profile or DEFAULT_RETRIEVAL_PROFILE
+    if name not in RETRIEVAL_PROFILES:
+        raise ValueError(
+            f"Unknown retrieval profile '{name}'. "
+            f"Available: {', '.join(RETRIEVAL_PROFILES)}"
+        )
+
+    values = {
+        "top_k": RERANK_OUTPUT_SIZE,
+        "candidate_count": RERANKER_CANDIDATE_COUNT,
+        "bm25_top_k": BM25_TOP_K,
+        "rerank": True,
+        "rerank_timeout_ms": RERANKER_TIMEOUT_MS,
+        "adaptive": RERANK_ADAPTIVE_ENABLED,
+        "early_exit": RERANK_EARLY_EXIT_ENABLED,
+        "mmr": MMR_ENABLED,
+        "mmr_threshold": MMR_DUPLICATE_THRESHOLD,
+    }
+    values.update(RETRIEVAL_PROFILES[name])
+    if top_k is not None:
+        values["top_k"] = top_k
+    overrides = {key: value for key, value in overrides.items() if value is not None}
+    # RetrievalOptions(**values) would raise TypeError, which API callers
+    # (catching ValueError for a 400) do not expect
+    known = {field.name for field in dataclasses.fields(RetrievalOptions)} - {"profile"}
+    unknown = sorted(set(values) - known | set(overrides) - known)
+    if unknown:
+        raise ValueError(f"Unknown retrieval option(s): {', '.join(unknown)}")
+    if "candidate_count" in overrides:
+        overrides.setdefault("adaptive", False)
+    values.update(overrides)
+    return RetrievalOptions(profile=name, **values)
+
+
+def _query_dense_batch(
+    query_embeddings: list[list[float]],
     candidate_count: int,
     doc_ids: Optional[list[str]] = None
-) -> list[dict]:
+) -> list[list[dict]]:
     """
-    Query ChromaDB for dense (embedding-based) retrieval candidates.
+    Query ChromaDB for dense candidates for several query vectors at once.
 
     Args:
-        query_embedding: Query vector
-        candidate_count: Number of candidates to over-retrieve
-        doc_ids: Optional document ID filter
+        query_embeddings: Query vectors (one ChromaDB call for all of them)
+        candidate_count: Number of candidates to over-retrieve per query
+        doc_ids: Optional document ID filter shared by every query
 
     Returns:
-        List of result dicts with chunk_id for RRF matching
+        One result list per query vector, each with chunk_id for RRF matching
     """
     where_clause = None
     if doc_ids:
@@ -50,24 +161,32 @@ def _query_dense(
 
     try:
         results = collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=query_embeddings,
             n_results=candidate_count,
             where=where_clause,
             include=["documents", "metadatas", "distances"]
         )
     except Exception as e:
         if "no results" in str(e).lower():
-            return []
+            return [[] for _ in query_embeddings]
         raise
 
-    if not results["ids"] or not results["ids"][0]:
-        return []
+    if not results["ids"]:
+        return [[] for _ in query_embeddings]
+
+    return [
+        _format_dense_row(documents, metadatas, distances)
+        for documents, metadatas, distances in zip(
+            results["documents"], results["metadatas"], results["distances"]
+        )
+    ]
 
-    formatted_results = []
-    documents = results["documents"][0]
-    metadatas = results["metadatas"][0]
-    distances = results["distances"][0]
 
+def _format_dense_row(
+    documents: list[str], metadatas: list[dict], distances: list[float]
+) -> list[dict]:
+    """Convert one ChromaDB result row into result dicts, best first."""
+    formatted_results = []
     for text, metadata, distance in zip(documents, metadatas, distances):
         relevance_score = 1.0 / (1.0 + distance)
         chunk_index = metadata["chunk_index"]
@@ -83,12 +202,34 @@ def _query_dense(
             "relevance_score": relevance_score,
             "chunk_id": chunk_id,
             "parent_text": metadata.get("parent_text"),
+            "parent_chunk_index": metadata.get("parent_chunk_index"),
+            "token_count": metadata.get("token_count"),
+            "parent_token_count": metadata.get("parent_token_count"),
         })
 
     formatted_results.sort(key=lambda x: x["relevance_score"], reverse=True)
     return formatted_results
 
 
+def _query_dense(
+    query_embedding: list[float],
+    candidate_count: int,
+    doc_ids: Optional[list[str]] = None
+) -> list[dict]:
+    """
+    Query ChromaDB for dense (embedding-based) retrieval candidates.
+
+    Args:
+        query_embedding: Query vector
+        candidate_count: Number of candidates to over-retrieve
+        doc_ids: Optional document ID filter
+
+    Returns:
+        List of result dicts with chunk_id for RRF matching
+    """
+    return _query_dense_batch([query_embedding], candidate_count, doc_ids)[0]
+
+
 def reciprocal_rank_fusion(
     dense_results: list[dict],
     bm25_results: list[dict],
@@ -188,12 +329,340 @@ def _fetch_chunk_metadata(chunk_id: str) -> Optional[dict]:
             "relevance_score": 0.0,
             "chunk_id": chunk_id,
             "parent_text": metadata.get("parent_text"),
+            "parent_chunk_index": metadata.get("parent_chunk_index"),
+            "token_count": metadata.get("token_count"),
+            "parent_token_count": metadata.get("parent_token_count"),
         }
     except Exception:
         logger.warning("Failed to fetch metadata for chunk %s", chunk_id)
         return None
 
 
+def _parent_key(result: dict) -> str:
+    """
+    Identify the parent chunk a retrieval result belongs to.
+
+    Children of the same parent share a key; legacy chunks without
+    parent metadata are keyed by their own chunk_id.
+    """
+    parent_index = result.get("parent_chunk_index")
+    if parent_index is None:
+        return result["chunk_id"]
+    return f"{result['source_doc_id']}_parent_{parent_index}"
+
+
+def _collapse_to_parents(candidates: list[dict], limit: int) -> list[dict]:
+    """
+    Keep only the best-ranked child per parent chunk.
+
+    Siblings would be deduplicated by _expand_parents after reranking
+    anyway, so scoring them wastes cross-encoder time and leaves fewer
+    distinct contexts in the final output.
+
+    Args:
+        candidates: Fused candidates sorted best-first
+        limit: Maximum number of distinct parents to keep
+
+    Returns:
+        Up to `limit` candidates, one per parent, in original order
+    """
+    seen_parents = set()
+    collapsed = []
+    for candidate in candidates:
+        parent_key = _parent_key(candidate)
+        if parent_key in seen_parents:
+            continue
+        seen_parents.add(parent_key)
+        collapsed.append(candidate)
+        if len(collapsed) >= limit:
+            break
+    return collapsed
+
+
+def _get_reranker():
+    """Return the rerank stage module selected by RERANK_STRATEGY."""
+    if RERANK_STRATEGY == "late_interaction":
+        return late_interaction_service
+    return reranker_service
+
+
+def _scorer_ready(scorer: str) -> bool:
+    """Whether the scorer's model is already loaded (no lazy load in the call)."""
+    if scorer == "late_interaction":
+        return late_interaction_service.get_late_interaction_status() == "ready"
+    return reranker_service.get_reranker_status() == "ready"
+
+
+def _scorer_name() -> str:
+    """Name of the final rerank stage (latency estimates are kept per scorer)."""
+    if RERANK_CASCADE_ENABLED or RERANK_STRATEGY != "late_interaction":
+        return "cross_encoder"
+    return "late_interaction"
+
+
+def _size_candidates(options: RetrievalOptions, queries: int = 1) -> RetrievalOptions:
+    """
+    Pick the fused candidate count from observed reranker latency.
+
+    Applies when options.adaptive and reranking is on (not under the
+    cascade, where the first pass fixes the cross-encoder's input size).
+    Grows up to RERANK_ADAPTIVE_MAX_CANDIDATES on an idle box and shrinks
+    toward RERANK_ADAPTIVE_MIN_CANDIDATES under load; keeps
+    options.candidate_count until the reranker has been observed.
+    """
+    if not (options.adaptive and options.rerank) or RERANK_CASCADE_ENABLED:
+        return options
+    count = rerank_latency_service.fit_candidate_count(
+        _scorer_name(), options.rerank_timeout_ms * queries,
+        max(options.candidate_count, RERANK_ADAPTIVE_MAX_CANDIDATES),
+        queries=queries, default=options.candidate_count,
+    )
+    if count == options.candidate_count:
+        return options
+    return dataclasses.replace(options, candidate_count=count)
+
+
+def _score_by_embedding(
+    query_embedding: list[float],
+    candidates: list[dict],
+    top_k: int,
+) -> list[dict]:
+    """
+    Cheap first-pass scorer: cosine similarity of stored chunk embeddings.
+
+    Fetches every candidate's embedding in one ChromaDB call (BM25-only
+    candidates have no dense score yet) and scores them in one NumPy
+    matrix-vector product.
+
+    Args:
+        query_embedding: Query vector
+        candidates: Fused candidates with chunk_id keys
+        top_k: Number of candidates to keep
+
+    Returns:
+        Top-k candidates by cosine similarity, each with "first_pass_score"
+    """
+    chunk_ids = [candidate["chunk_id"] for candidate in candidates]
+    stored = get_collection().get(ids=chunk_ids, include=["embeddings"])
+    embedding_by_id = dict(zip(stored["ids"], stored["embeddings"]))
+
+    dimensions = len(query_embedding)
+    matrix = np.array([
+        embedding_by_id.get(chunk_id, np.zeros(dimensions))
+        for chunk_id in chunk_ids
+    ], dtype=np.float32)
+    query_vector = np.asarray(query_embedding, dtype=np.float32)
+
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector)
+    scores = np.divide(
+        matrix @ query_vector, norms,
+        out=np.zeros(len(chunk_ids), dtype=np.float32), where=norms > 0,
+    )
+
+    for candidate, score in zip(candidates, scores):
+        candidate["first_pass_score"] = float(score)
+
+    ranked = sorted(candidates, key=lambda x: x["first_pass_score"], reverse=True)
+    return ranked[:top_k]
+
+
+def _score_by_late_interaction(
+    query: str, candidates: list[dict], top_k: int
+) -> list[dict]:
+    """First-pass scorer using late-interaction MaxSim scores."""
+    ranked = late_interaction_service.rerank(query, candidates, top_k)
+    for candidate in ranked:
+        candidate["first_pass_score"] = candidate.pop("reranker_score")
+    return ranked
+
+
+async def _run_with_timeout(
+    executor: ThreadPoolExecutor, timeout_ms: int, fn: Callable, *args
+):
+    """
+    Run fn on a dedicated executor and await it without blocking the loop.
+
+    Raises:
+        asyncio.TimeoutError: If fn does not finish within timeout_ms
+            (the worker keeps running; its result is discarded)
+    """
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(
+        loop.run_in_executor(executor, fn, *args), timeout_ms / 1000.0
+    )
+
+
+def _early_exit_reason(candidates: list[dict], top_k: int) -> Optional[str]:
+    """
+    Why reranking can be skipped for these fused candidates, if it can.
+
+    'few_candidates': fewer candidates than results requested (e.g. a
+    narrow doc filter). 'decisive': the top candidate is first in both the
+    dense and BM25 lists and leads the runner-up's fused score by at least
+    RERANK_EARLY_EXIT_MIN_GAP (relative), as for exact identifier lookups.
+    """
+    if len(candidates) < top_k:
+        return "few_candidates"
+    top = candidates[0]
+    if top.get("dense_rank") != 1 or top.get("bm25_rank") != 1:
+        return None
+    if len(candidates) == 1:
+        return "decisive"
+    top_score = top.get("fused_score") or 0.0
+    runner_up = candidates[1].get("fused_score") or 0.0
+    if top_score > 0 and (top_score - runner_up) / top_score >= RERANK_EARLY_EXIT_MIN_GAP:
+        return "decisive"
+    return None
+
+
+def _skip_rerank(candidates: list[dict], options: RetrievalOptions) -> Optional[list[dict]]:
+    """Fused top options.top_k when the early-exit rule fires, else None."""
+    if not options.early_exit:
+        return None
+    reason = _early_exit_reason(candidates, options.top_k)
+    if reason is None:
+        return None
+    metrics_service.RERANK_EARLY_EXITS.inc(reason=reason)
+    logger.debug("Skipping rerank (%s)", reason)
+    return candidates[:options.top_k]
+
+
+async def _run_rerank(
+    scorer: str, timeout_ms: int, pairs: int, fn: Callable, *args
+):
+    """
+    _run_with_timeout for the rerank executor, feeding rerank_latency_service.
+
+    Pairs count as queued from submission until the worker finishes (or
+    the submission is cancelled before it starts); successful calls
+    update the per-pair latency estimate even if the caller timed out.
+    A call that had to load the model first is not timed: its load time
+    would seed the estimate with seconds per pair.
+    """
+    def _timed():
+        warm = _scorer_ready(scorer)
+        started = time.perf_counter()
+        elapsed_ms = None
+        try:
+            result = fn(*args)
+            if warm:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            return result
+        finally:
+            rerank_latency_service.finished(scorer, pairs, elapsed_ms)
+
+    rerank_latency_service.submitted(pairs)
+    future = _rerank_executor.submit(_timed)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout_ms / 1000.0)
+    finally:
+        # Cancelled while still queued: the worker never releases the pairs
+        if future.cancelled():
+            rerank_latency_service.finished(scorer, pairs)
+
+
+async def _first_pass(
+    query: str,
+    query_embedding: Optional[list[float]],
+    candidates: list[dict],
+    timings=NULL_TIMINGS,
+) -> tuple[list[dict], str]:
+    """
+    Cascade stage 1: trim fused candidates with the cheap scorer.
+
+    Returns:
+        (trimmed candidates, stage label). Falls back to RRF order
+        ('rrf_only') on timeout or error.
+    """
+    if CASCADE_FIRST_STAGE == "late_interaction":
+        scorer, args = _score_by_late_interaction, (query,)
+    else:
+        scorer, args = _score_by_embedding, (query_embedding,)
+
+    try:
+        with timings.stage("first_pass"):
+            trimmed = await _run_with_timeout(
+                _first_pass_executor, CASCADE_FIRST_STAGE_TIMEOUT_MS,
+                scorer, *args, candidates, CASCADE_FIRST_STAGE_SIZE,
+            )
+        return trimmed, "first_pass"
+    except asyncio.TimeoutError:
+        logger.warning(
+            "First-pass scorer timed out after %dms, trimming by RRF order",
+            CASCADE_FIRST_STAGE_TIMEOUT_MS
+        )
+    except Exception as e:
+        logger.warning("First-pass scorer failed: %s, trimming by RRF order", str(e))
+    return candidates[:CASCADE_FIRST_STAGE_SIZE], "rrf_only"
+
+
+async def _rerank_stage(
+    query: str,
+    query_embedding: Optional[list[float]],
+    candidates: list[dict],
+    options: RetrievalOptions,
+    timings=NULL_TIMINGS,
+) -> tuple[list[dict], str]:
+    """
+    Rerank fused candidates, optionally as a two-stage cascade.
+
+    With RERANK_CASCADE_ENABLED a cheap first pass trims the candidates
+    before the cross-encoder. Each stage has its own timeout; on failure
+    the output of the previous stage is used. Skipped entirely when
+    options.rerank is False, or when options.early_exit and the fused
+    ranking is decisive (_early_exit_reason).
+
+    Returns:
+        (top options.top_k results, retrieval_method) where the
+        method names the stage that produced the final order:
+        'reranked' | 'first_pass' | 'rrf_only' | 'rerank_skipped'
+    """
+    if not options.rerank:
+        return candidates[:options.top_k], "rrf_only"
+    skipped = _skip_rerank(candidates, options)
+    if skipped is not None:
+        return skipped, "rerank_skipped"
+
+    reranker = _get_reranker()
+    fallback_method = "rrf_only"
+    if RERANK_CASCADE_ENABLED:
+        candidates, fallback_method = await _first_pass(
+            query, query_embedding, candidates, timings
+        )
+        reranker = reranker_service
+
+    # Re-fit right before submitting: the queue may have grown since
+    # retrieval started
+    scorer = _scorer_name()
+    submitted = candidates
+    if options.adaptive:
+        count = rerank_latency_service.fit_candidate_count(
+            scorer, options.rerank_timeout_ms, len(candidates)
+        )
+        submitted = candidates[:count]
+
+    try:
+        with timings.stage("rerank"):
+            reranked = await _run_rerank(
+                scorer, options.rerank_timeout_ms, len(submitted),
+                reranker.rerank, query, submitted, options.top_k,
+            )
+        for result in reranked:
+            result["rerank_candidates"] = len(submitted)
+        return reranked, "reranked"
+    except asyncio.TimeoutError:
+        logger.warning(
+            "Reranker timed out after %dms, using %s results",
+            options.rerank_timeout_ms, fallback_method
+        )
+    except Exception as e:
+        logger.warning("Reranker failed: %s, using %s results", str(e), fallback_method)
+    fallback = candidates[:options.top_k]
+    for result in fallback:
+        result["rerank_candidates"] = len(submitted)
+    return fallback, fallback_method
+
+
 def _expand_parents(results: list[dict]) -> list[dict]:
     """
     Replace child text with parent text for LLM context.
@@ -219,57 +688,63 @@ def _expand_parents(results: list[dict]) -> list[dict]:
             seen_parents.add(parent_key)
             result["child_text"] = result["text"]
             result["text"] = parent_text
+            # token_count always describes the text field
+            result["token_count"] = result.get("parent_token_count")
         expanded.append(result)
     return expanded
 
 
-def search_documents(
+async def _dense_branch(
     query: str,
-    top_k: int = 5,
-    doc_ids: Optional[list[str]] = None,
-    query_embedding: Optional[list[float]] = None,
-) -> list[dict]:
+    query_embedding: Optional[list[float]],
+    doc_ids: Optional[list[str]],
+    candidate_count: int,
+    timings=NULL_TIMINGS,
+    embeddings: Optional[EmbeddingContext] = None,
+) -> tuple[list[dict], list[float]]:
     """
-    Search for relevant document chunks using hybrid retrieval.
+    Embed the query (unless pre-computed) and run dense retrieval.
 
-    Pipeline: dense over-retrieval -> BM25 keyword search -> RRF fusion ->
-    cross-encoder reranking (with timeout fallback to RRF-only results).
-
-    Args:
-        query: User's search query text
-        top_k: Maximum number of results (default: 5, internally uses config)
-        doc_ids: Optional list of document IDs to filter results
-                 (None = search all documents)
-        query_embedding: Optional pre-computed embedding vector (for HyDE).
-                         When provided, skips generate_embeddings call.
+    Both calls are blocking client libraries (Ollama, embedded ChromaDB),
+    so they run on the I/O executor. Over-fetches so the candidate budget
+    still holds distinct parents after sibling collapse. With a request
+    EmbeddingContext the query is embedded through it, so rewriting
+    running concurrently reuses the vector instead of embedding it again.
 
     Returns:
-        List of dicts with all SearchResult fields plus diagnostic scores,
-        sorted by final ranking
+        (dense results, query embedding)
 
     Raises:
         RuntimeError: If Ollama embedding service is unavailable
     """
-    # Generate query embedding (or use provided HyDE embedding)
+    loop = asyncio.get_running_loop()
     if query_embedding is None:
+        embed = embeddings.embed if embeddings is not None else generate_embeddings
         try:
-            query_embeddings = generate_embeddings([query])
+            with timings.stage("embed"):
+                query_embeddings = await loop.run_in_executor(
+                    _io_executor, embed, [query]
+                )
             query_embedding = query_embeddings[0]
         except RuntimeError as e:
             raise RuntimeError(f"Cannot search: {str(e)}") from e
 
-    # Dense over-retrieval from ChromaDB
-    dense_results = _query_dense(
-        query_embedding, RERANKER_CANDIDATE_COUNT, doc_ids
-    )
+    with timings.stage("dense_query"):
+        dense_results = await loop.run_in_executor(
+            _io_executor, _query_dense, query_embedding,
+            candidate_count * PARENT_OVERFETCH_FACTOR, doc_ids,
+        )
+    return dense_results, query_embedding
 
-    if not dense_results:
-        return []
 
-    # BM25 keyword search
-    bm25_results = bm25_index_service.search(query, BM25_TOP_K)
+def _fuse_candidates(
+    dense_results: list[dict], bm25_results: list[dict], candidate_count: int
+) -> list[dict]:
+    """
+    Fuse branch results via RRF (or dense-only) and collapse siblings.
 
-    # Determine candidates for reranking
+    Blocking: BM25-only hits are hydrated from ChromaDB.
+    """
     if bm25_results:
         # Hybrid path: fuse dense + BM25 via RRF
         fused_candidates = reciprocal_rank_fusion(
@@ -285,34 +760,662 @@ def search_documents(
             candidate.setdefault("bm25_rank", None)
             candidate.setdefault("fused_score", candidate["relevance_score"])
 
-    # Timeout-guarded reranking
+    # One candidate per parent so the reranker never scores siblings
+    return _collapse_to_parents(fused_candidates, candidate_count)
+
+
+async def _join_branch(task: asyncio.Future, timeout_ms: int, started: float):
+    """Await a retrieval branch until timeout_ms after `started`."""
+    remaining = timeout_ms / 1000.0 - (time.monotonic() - started)
+    return await asyncio.wait_for(task, max(0.0, remaining))
+
+
+async def _retrieve_candidates(
+    query: str,
+    query_embedding: Optional[list[float]] = None,
+    doc_ids: Optional[list[str]] = None,
+    timings=NULL_TIMINGS,
+    options: Optional[RetrievalOptions] = None,
+    embeddings: Optional[EmbeddingContext] = None,
+) -> tuple[list[dict], Optional[list[float]]]:
+    """
+    Build the rerank candidate list: dense + BM25 retrieval fused via RRF.
+
+    BM25 only needs the raw query, so it starts immediately on the CPU
+    executor and runs concurrently with query embedding + the ChromaDB
+    query. Each branch has its own timeout: a slow dense branch degrades
+    to BM25-only, a slow or failing BM25 branch to dense-only. Candidates
+    are then collapsed to one child per parent.
+
+    Args:
+        query: User's search query text (for BM25)
+        query_embedding: Optional pre-computed query vector (for HyDE)
+        doc_ids: Optional document ID filter
+        timings: Optional StageTimings recorder
+        options: Optional RetrievalOptions (default profile when omitted)
+        embeddings: Optional request EmbeddingContext the query is embedded
+                    through (see _dense_branch)
+
+    Returns:
+        (up to options.candidate_count fused candidates best first,
+        query embedding or None if the dense branch timed out).
+        Candidates are empty if dense retrieval found nothing.
+
+    Raises:
+        RuntimeError: If Ollama embedding service is unavailable
+    """
+    options = options or resolve_retrieval_options()
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    bm25_task = loop.run_in_executor(
+        _cpu_executor, timings.timed("bm25", bm25_index_service.search),
+        query, options.bm25_top_k, doc_ids,
+    )
+    dense_task = asyncio.ensure_future(
+        _dense_branch(
+            query, query_embedding, doc_ids, options.candidate_count, timings, embeddings
+        )
+    )
+
+    dense_timed_out = False
     try:
-        future = _rerank_executor.submit(
-            reranker_service.rerank, query, fused_candidates,
-            RERANK_OUTPUT_SIZE
+        dense_results, query_embedding = await _join_branch(
+            dense_task, DENSE_TIMEOUT_MS, started
         )
-        reranked = future.result(timeout=RERANKER_TIMEOUT_MS / 1000.0)
-        retrieval_method = "reranked"
-    except FuturesTimeoutError:
+    except asyncio.TimeoutError:
+        metrics_service.BRANCH_TIMEOUTS.inc(branch="dense")
         logger.warning(
-            "Reranker timed out after %dms, using RRF-only results",
-            RERANKER_TIMEOUT_MS
+            "Dense retrieval timed out after %dms, using BM25-only results",
+            DENSE_TIMEOUT_MS
         )
-        reranked = fused_candidates[:RERANK_OUTPUT_SIZE]
-        retrieval_method = "rrf_only"
+        dense_results, dense_timed_out = [], True
+    except Exception:
+        bm25_task.cancel()
+        raise
+
+    try:
+        bm25_results = await _join_branch(bm25_task, BM25_TIMEOUT_MS, started)
+    except asyncio.TimeoutError:
+        metrics_service.BRANCH_TIMEOUTS.inc(branch="bm25")
+        logger.warning("BM25 search timed out after %dms", BM25_TIMEOUT_MS)
+        bm25_results = []
     except Exception as e:
-        logger.warning("Reranker failed: %s, using RRF-only results", str(e))
-        reranked = fused_candidates[:RERANK_OUTPUT_SIZE]
-        retrieval_method = "rrf_only"
+        logger.warning("BM25 search failed: %s", str(e))
+        bm25_results = []
+
+    if not dense_results and not (dense_timed_out and bm25_results):
+        return [], query_embedding
+
+    # RRF itself is trivial; this stage is dominated by hydrating
+    # BM25-only hits from ChromaDB
+    with timings.stage("hydrate"):
+        fused_candidates = await loop.run_in_executor(
+            _io_executor, _fuse_candidates, dense_results, bm25_results,
+            options.candidate_count,
+        )
+    return fused_candidates, (None if dense_timed_out else query_embedding)
+
+
+def _is_cacheable(retrieval_method: str, options: RetrievalOptions) -> bool:
+    """Cache only the ranking the options asked for, never a fallback."""
+    if not options.rerank:
+        return retrieval_method == "rrf_only"
+    return retrieval_method in ("reranked", "rerank_skipped")
+
+
+def _mmr_select(
+    results: list[dict], lambda_: float, threshold: float
+) -> tuple[list[dict], list[dict]]:
+    """
+    Maximal marginal relevance over reranked results.
+
+    Fetches the stored chunk embeddings in one ChromaDB call and computes
+    every pairwise cosine similarity in one NumPy matrix product. Results
+    are then picked greedily by lambda * relevance - (1 - lambda) *
+    similarity to the already picked ones; a result whose similarity to a
+    picked one reaches `threshold` is dropped as redundant.
+
+    Returns:
+        (kept results in MMR order, dropped results)
+    """
+    chunk_ids = [result["chunk_id"] for result in results]
+    stored = get_collection().get(ids=chunk_ids, include=["embeddings"])
+    embedding_by_id = dict(zip(stored["ids"], stored["embeddings"]))
+    dimensions = len(next(iter(embedding_by_id.values()), []))
+    if not dimensions:
+        return results, []
+
+    matrix = np.array([
+        embedding_by_id.get(chunk_id, np.zeros(dimensions))
+        for chunk_id in chunk_ids
+    ], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+    similarity = matrix @ matrix.T
+
+    relevance = np.array([
+        result.get("reranker_score")
+        if result.get("reranker_score") is not None
+        else result.get("relevance_score", 0.0)
+        for result in results
+    ], dtype=np.float32)
 
+    selected = [0]
+    available = np.ones(len(results), dtype=bool)
+    available[0] = False
+    max_similarity = similarity[0].copy()
+    while True:
+        available &= max_similarity < threshold
+        if not available.any():
+            break
+        mmr_scores = lambda_ * relevance - (1 - lambda_) * max_similarity
+        pick = int(np.argmax(np.where(available, mmr_scores, -np.inf)))
+        selected.append(pick)
+        available[pick] = False
+        np.maximum(max_similarity, similarity[pick], out=max_similarity)
+
+    kept = [results[i] for i in selected]
+    chosen = set(selected)
+    dropped = [result for i, result in enumerate(results) if i not in chosen]
+    return kept, dropped
+
+
+def _prompt_tokens(result: dict) -> int:
+    """
+    Prompt tokens a result contributes (its parent text once expanded):
+    the counts stored at ingest, else a characters-per-token estimate.
+    """
+    text = result.get("parent_text") or result.get("text", "")
+    stored = result.get("parent_token_count") if result.get("parent_text") else result.get("token_count")
+    if stored is not None:
+        return stored
+    return -(-len(text) // MMR_CHARS_PER_TOKEN)
+
+
+async def _diversify(
+    results: list[dict], options: RetrievalOptions, timings=NULL_TIMINGS
+) -> list[dict]:
+    """
+    Optional MMR stage after reranking (options.mmr).
+
+    Drops near-duplicate passages (repeated sections, similar documents)
+    before they reach the LLM prompt and records how many prompt tokens
+    that saved. Failures keep the reranked results unchanged.
+    """
+    if not options.mmr or len(results) < 2:
+        return results
+    try:
+        with timings.stage("mmr"):
+            kept, dropped = await asyncio.get_running_loop().run_in_executor(
+                _io_executor, _mmr_select, results, MMR_LAMBDA, options.mmr_threshold
+            )
+    except Exception as e:
+        logger.warning("MMR diversification failed: %s, keeping reranked results", str(e))
+        return results
+
+    # Candidates were collapsed to one per parent, so every dropped
+    # result's parent text has left the prompt
+    tokens_saved = sum(_prompt_tokens(result) for result in dropped)
+    metrics_service.MMR_DROPPED.inc(len(dropped))
+    metrics_service.MMR_TOKENS_SAVED.observe(tokens_saved)
+    if dropped:
+        logger.info(
+            "MMR dropped %d redundant passages (~%d prompt tokens)",
+            len(dropped), tokens_saved,
+        )
+    return kept
+
+
+def _finalize_results(
+    reranked: list[dict], retrieval_method: str, timings=NULL_TIMINGS
+) -> list[dict]:
+    """Stamp diagnostics on final results and expand children to parents."""
     # Set retrieval_method and ensure all diagnostic fields present
     for result in reranked:
         result["retrieval_method"] = retrieval_method
         result.setdefault("reranker_score", None)
+        result.setdefault("first_pass_score", None)
         result.setdefault("bm25_rank", None)
         result.setdefault("dense_rank", None)
 
     # Expand children to parent text for LLM context (CHUNK-02)
-    reranked = _expand_parents(reranked)
+    with timings.stage("expand_parents"):
+        return _expand_parents(reranked)
+
+
+async def asearch_documents(
+    query: str,
+    top_k: Optional[int] = None,
+    doc_ids: Optional[list[str]] = None,
+    query_embedding: Optional[list[float]] = None,
+    timings=NULL_TIMINGS,
+    options: Optional[RetrievalOptions] = None,
+    embeddings: Optional[EmbeddingContext] = None,
+    rerank_gate: Optional[asyncio.Event] = None,
+) -> list[dict]:
+    """
+    Search for relevant document chunks using hybrid retrieval.
+
+    Pipeline: dense over-retrieval || BM25 keyword search -> RRF fusion ->
+    collapse siblings to one child per parent -> reranking with the
+    RERANK_STRATEGY model, or a cheap first pass then the cross-encoder
+    when RERANK_CASCADE_ENABLED (each stage timeout-guarded, falling back
+    to the previous stage's order).
+
+    Reranked results are cached per (normalized query, doc_ids, config,
+    options) until the next index mutation (search_cache_service).
+
+    Never blocks the event loop: blocking I/O (Ollama embed, ChromaDB) runs
+    on the I/O executor, BM25 and reranking on their own executors.
+
+    Args:
+        query: User's search query text
+        top_k: Maximum number of results; overrides options.top_k
+               (default: the profile's top_k, RERANK_OUTPUT_SIZE)
+        doc_ids: Optional list of document IDs to filter results
+                 (None = search all documents)
+        query_embedding: Optional pre-computed embedding vector (for HyDE).
+                         When provided, skips generate_embeddings call.
+        timings: Optional StageTimings; records embed, dense_query, bm25,
+                 hydrate, first_pass, rerank and expand_parents (ms)
+        options: Optional RetrievalOptions from resolve_retrieval_options
+                 (default: DEFAULT_RETRIEVAL_PROFILE)
+        embeddings: Optional request EmbeddingContext; a vector for the
+                    query already computed there (by the classifier or the
+                    confidence gate) is reused, otherwise the query is
+                    embedded through it for them. Unlike query_embedding
+                    this keeps the result cache on.
+        rerank_gate: Optional event awaited after fusion, before any rerank
+                     work is submitted. A speculative search cancelled
+                     while waiting never occupies the rerank executor.
+
+    Returns:
+        List of dicts with all SearchResult fields plus diagnostic scores,
+        sorted by final ranking
+
+    Raises:
+        RuntimeError: If Ollama embedding service is unavailable
+    """
+    options = options or resolve_retrieval_options()
+    if top_k is not None and top_k != options.top_k:
+        options = dataclasses.replace(options, top_k=top_k)
+
+    # Full-result cache (skipped for HyDE: the embedding is not the query)
+    use_cache = SEARCH_CACHE_ENABLED and query_embedding is None
+    if use_cache:
+        cache_key = search_cache_service.make_key(
+            query, doc_ids, options.cache_fingerprint()
+        )
+        generation = current_generation()
+        with timings.stage("cache_lookup"):
+            cached = search_cache_service.get(cache_key)
+        if cached is not None:
+            return cached
+    # After the cache key: cached entries are shared across load levels
+    options = _size_candidates(options)
+    if query_embedding is None and embeddings is not None:
+        query_embedding = embeddings.get(query)
+
+    # Dense (with query embedding) and BM25 retrieval run concurrently
+    fused_candidates, query_embedding = await _retrieve_candidates(
+        query, query_embedding, doc_ids, timings, options, embeddings
+    )
+    if not fused_candidates:
+        return []
+    if rerank_gate is not None:
+        await rerank_gate.wait()
+
+    # Timeout-guarded reranking (single stage or cascade)
+    reranked, retrieval_method = await _rerank_stage(
+        query, query_embedding, fused_candidates, options, timings
+    )
+    metrics_service.RETRIEVAL_METHOD.inc(method=retrieval_method)
+    reranked = await _diversify(reranked, options, timings)
+
+    results = _finalize_results(reranked, retrieval_method, timings)
+    # Degraded (fallback) rankings are transient; only cache the ranking
+    # the options asked for
+    if use_cache and _is_cacheable(retrieval_method, options):
+        search_cache_service.put(cache_key, generation, results)
+    return results
+
+
+async def astream_search(
+    query: str,
+    doc_ids: Optional[list[str]] = None,
+    timings=NULL_TIMINGS,
+    options: Optional[RetrievalOptions] = None,
+) -> AsyncIterator[tuple[list[dict], bool]]:
+    """
+    Progressive hybrid search: fused ranking first, reranked ranking after.
+
+    Runs the same pipeline as asearch_documents but yields the top RRF
+    candidates (retrieval_method 'rrf_only') as soon as fusion finishes,
+    then the reranked ordering. A cache hit, an empty result or
+    options.rerank=False (nothing would follow the fused ranking) yields a
+    single final list.
+
+    Args:
+        query: User's search query text
+        doc_ids: Optional list of document IDs to filter results
+        timings: Optional StageTimings recorder
+        options: Optional RetrievalOptions (default profile when omitted)
+
+    Yields:
+        (results, is_final) tuples; the last one has is_final=True
+
+    Raises:
+        RuntimeError: If Ollama embedding service is unavailable
+    """
+    options = options or resolve_retrieval_options()
+    use_cache = SEARCH_CACHE_ENABLED
+    if use_cache:
+        cache_key = search_cache_service.make_key(
+            query, doc_ids, options.cache_fingerprint()
+        )
+        generation = current_generation()
+        with timings.stage("cache_lookup"):
+            cached = search_cache_service.get(cache_key)
+        if cached is not None:
+            yield cached, True
+            return
+    options = _size_candidates(options)
+
+    fused_candidates, query_embedding = await _retrieve_candidates(
+        query, None, doc_ids, timings, options
+    )
+    if not fused_candidates:
+        yield [], True
+        return
+
+    # Preview copies: parent expansion rewrites text in place, and the
+    # reranker must still score the child chunks
+    if options.rerank:
+        preview = [dict(candidate) for candidate in fused_candidates[:options.top_k]]
+        yield _finalize_results(preview, "rrf_only"), False
+
+    reranked, retrieval_method = await _rerank_stage(
+        query, query_embedding, fused_candidates, options, timings
+    )
+    metrics_service.RETRIEVAL_METHOD.inc(method=retrieval_method)
+    reranked = await _diversify(reranked, options, timings)
+
+    results = _finalize_results(reranked, retrieval_method, timings)
+    if use_cache and _is_cacheable(retrieval_method, options):
+        search_cache_service.put(cache_key, generation, results)
+    yield results, True
+
+
+def search_documents(
+    query: str,
+    top_k: Optional[int] = None,
+    doc_ids: Optional[list[str]] = None,
+    query_embedding: Optional[list[float]] = None,
+    timings=NULL_TIMINGS,
+    options: Optional[RetrievalOptions] = None,
+    embeddings: Optional[EmbeddingContext] = None,
+) -> list[dict]:
+    """
+    Synchronous wrapper around asearch_documents for scripts and tests.
+
+    Must not be called from a running event loop; async code (API
+    handlers, rag_service) awaits asearch_documents directly.
+
+    Args:
+        query: User's search query text
+        top_k: Maximum number of results (default: the profile's top_k)
+        doc_ids: Optional list of document IDs to filter results
+        query_embedding: Optional pre-computed embedding vector (for HyDE)
+        timings: Optional StageTimings recorder
+        options: Optional RetrievalOptions (default profile when omitted)
+        embeddings: Optional request EmbeddingContext
+
+    Returns:
+        Same as asearch_documents
+
+    Raises:
+        RuntimeError: If Ollama embedding service is unavailable
+    """
+    # Private loop: unlike asyncio.run, leaves the caller's current loop alone
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(asearch_documents(
+            query, top_k=top_k, doc_ids=doc_ids,
+            query_embedding=query_embedding, timings=timings, options=options,
+            embeddings=embeddings,
+        ))
+    finally:
+        loop.close()
+
+
+def _query_dense_grouped(
+    query_embeddings: list[list[float]],
+    doc_ids_list: list[Optional[list[str]]],
+    candidate_count: int,
+) -> list[list[dict]]:
+    """Dense retrieval for many queries: one ChromaDB call per distinct doc filter."""
+    groups: dict[Optional[tuple], list[int]] = {}
+    for position, doc_ids in enumerate(doc_ids_list):
+        groups.setdefault(tuple(sorted(doc_ids)) if doc_ids else None, []).append(position)
+
+    dense_lists: list[list[dict]] = [[] for _ in query_embeddings]
+    for doc_filter, positions in groups.items():
+        rows = _query_dense_batch(
+            [query_embeddings[i] for i in positions],
+            candidate_count * PARENT_OVERFETCH_FACTOR,
+            list(doc_filter) if doc_filter else None,
+        )
+        for position, row in zip(positions, rows):
+            dense_lists[position] = row
+    return dense_lists
+
+
+def _search_bm25_batch(
+    queries: list[str], doc_ids_list: list[Optional[list[str]]], top_k: int
+) -> list[list[dict]]:
+    """BM25 search for many queries in one executor task."""
+    return [
+        bm25_index_service.search(query, top_k, doc_ids)
+        for query, doc_ids in zip(queries, doc_ids_list)
+    ]
+
+
+def _rerank_each(
+    reranker, queries: list[str], candidate_lists: list[list[dict]], top_k: int
+) -> list[list[dict]]:
+    """Per-query rerank for scorers without a batch entry point."""
+    return [
+        reranker.rerank(query, candidates, top_k)
+        for query, candidates in zip(queries, candidate_lists)
+    ]
+
+
+async def _rerank_stage_batch(
+    queries: list[str],
+    query_embeddings: list[list[float]],
+    candidate_lists: list[list[dict]],
+    options: RetrievalOptions,
+    timings=NULL_TIMINGS,
+) -> tuple[list[list[dict]], list[str]]:
+    """
+    Batched counterpart of _rerank_stage.
+
+    Cascade first passes run per query (concurrently); the cross-encoder
+    then scores every query's candidates in one rerank_batch call. The
+    timeout scales with the number of queries; on failure every query
+    keeps its previous stage's order.
+
+    Returns:
+        (top options.top_k results per query, retrieval_method per query)
+    """
+    if not options.rerank:
+        return [candidates[:options.top_k] for candidates in candidate_lists], \
+            ["rrf_only"] * len(queries)
+
+    reranker = _get_reranker()
+    fallback_methods = ["rrf_only"] * len(queries)
+    if RERANK_CASCADE_ENABLED:
+        first_passes = await asyncio.gather(*[
+            _first_pass(query, embedding, candidates, timings)
+            for query, embedding, candidates in zip(queries, query_embeddings, candidate_lists)
+        ])
+        candidate_lists = [trimmed for trimmed, _ in first_passes]
+        fallback_methods = [method for _, method in first_passes]
+        reranker = reranker_service
+
+    if reranker is reranker_service:
+        score_fn, args = reranker_service.rerank_batch, ()
+    else:
+        score_fn, args = _rerank_each, (reranker,)
+
+    scorer = _scorer_name()
+    deadline_ms = options.rerank_timeout_ms * len(queries)
+    if options.adaptive:
+        count = rerank_latency_service.fit_candidate_count(
+            scorer, deadline_ms, max(len(c) for c in candidate_lists), queries=len(queries)
+        )
+        candidate_lists = [candidates[:count] for candidates in candidate_lists]
+
+    try:
+        with timings.stage("rerank"):
+            reranked = await _run_rerank(
+                scorer, deadline_ms, sum(len(c) for c in candidate_lists),
+                score_fn, *args, queries, candidate_lists, options.top_k,
+            )
+        for results, candidates in zip(reranked, candidate_lists):
+            for result in results:
+                result["rerank_candidates"] = len(candidates)
+        return reranked, ["reranked"] * len(queries)
+    except asyncio.TimeoutError:
+        logger.warning(
+            "Batch rerank of %d queries timed out, using previous stage results",
+            len(queries)
+        )
+    except Exception as e:
+        logger.warning("Batch rerank failed: %s, using previous stage results", str(e))
+    fallbacks = [candidates[:options.top_k] for candidates in candidate_lists]
+    for results, candidates in zip(fallbacks, candidate_lists):
+        for result in results:
+            result["rerank_candidates"] = len(candidates)
+    return fallbacks, fallback_methods
+
+
+async def asearch_documents_batch(
+    queries: list[str],
+    doc_ids_list: Optional[list[Optional[list[str]]]] = None,
+    timings=NULL_TIMINGS,
+    options: Optional[RetrievalOptions] = None,
+) -> list[list[dict]]:
+    """
+    Search many queries with shared embedding, retrieval and rerank passes.
+
+    Same ranking as asearch_documents per query, but cache misses are
+    embedded in one Ollama call, dense retrieval issues one ChromaDB query
+    per distinct doc filter, BM25 runs for all queries in one task
+    (concurrently with embedding) and the cross-encoder scores every
+    query's candidates in one batch. Intended for throughput-oriented
+    callers, so retrieval branches have no individual deadlines.
+
+    Args:
+        queries: Search query texts
+        doc_ids_list: Optional doc filter per query (parallel to queries)
+        timings: Optional StageTimings recorder (stages cover the whole batch)
+        options: Optional RetrievalOptions shared by every query
+
+    Returns:
+        One result list per query, in input order
+
+    Raises:
+        RuntimeError: If Ollama embedding service is unavailable
+    """
+    options = options or resolve_retrieval_options()
+    if doc_ids_list is None:
+        doc_ids_list = [None] * len(queries)
+    results: list[list[dict]] = [[] for _ in queries]
+
+    generation = current_generation()
+    cache_keys = {}
+    pending = []
+    with timings.stage("cache_lookup"):
+        for position, (query, doc_ids) in enumerate(zip(queries, doc_ids_list)):
+            if SEARCH_CACHE_ENABLED:
+                cache_keys[position] = search_cache_service.make_key(
+                    query, doc_ids, options.cache_fingerprint()
+                )
+                cached = search_cache_service.get(cache_keys[position])
+                if cached is not None:
+                    results[position] = cached
+                    continue
+            pending.append(position)
+    if not pending:
+        return results
+
+    loop = asyncio.get_running_loop()
+    pending_queries = [queries[i] for i in pending]
+    pending_doc_ids = [doc_ids_list[i] for i in pending]
+    options = _size_candidates(options, queries=len(pending))
+
+    bm25_task = loop.run_in_executor(
+        _cpu_executor, timings.timed("bm25", _search_bm25_batch),
+        pending_queries, pending_doc_ids, options.bm25_top_k,
+    )
+    try:
+        with timings.stage("embed"):
+            query_embeddings = await loop.run_in_executor(
+                _io_executor, generate_embeddings, pending_queries
+            )
+    except RuntimeError as e:
+        raise RuntimeError(f"Cannot search: {str(e)}") from e
+
+    with timings.stage("dense_query"):
+        dense_lists = await loop.run_in_executor(
+            _io_executor, _query_dense_grouped, query_embeddings, pending_doc_ids,
+            options.candidate_count,
+        )
+    try:
+        bm25_lists = await bm25_task
+    except Exception as e:
+        logger.warning("BM25 batch search failed: %s", str(e))
+        bm25_lists = [[] for _ in pending]
+
+    with timings.stage("hydrate"):
+        candidate_lists = await loop.run_in_executor(
+            _io_executor,
+            lambda: [
+                _fuse_candidates(dense, bm25, options.candidate_count) if dense else []
+                for dense, bm25 in zip(dense_lists, bm25_lists)
+            ],
+        )
+
+    # Queries without candidates stay empty and skip reranking
+    ranked = [i for i, candidates in enumerate(candidate_lists) if candidates]
+    if not ranked:
+        return results
+
+    # Decisive fusions skip the cross-encoder batch (early exit)
+    ranked_lists: dict[int, tuple[list[dict], str]] = {}
+    if options.rerank:
+        for i in ranked:
+            skipped = _skip_rerank(candidate_lists[i], options)
+            if skipped is not None:
+                ranked_lists[i] = (skipped, "rerank_skipped")
+    to_rerank = [i for i in ranked if i not in ranked_lists]
+    if to_rerank:
+        reranked_lists, methods = await _rerank_stage_batch(
+            [pending_queries[i] for i in to_rerank],
+            [query_embeddings[i] for i in to_rerank],
+            [candidate_lists[i] for i in to_rerank],
+            options,
+            timings,
+        )
+        ranked_lists.update(zip(to_rerank, zip(reranked_lists, methods)))
 
-    return reranked
+    for i in ranked:
+        reranked, retrieval_method = ranked_lists[i]
+        position = pending[i]
+        metrics_service.RETRIEVAL_METHOD.inc(method=retrieval_method)
+        reranked = await _diversify(reranked, options, timings)
+        results[position] = _finalize_results(reranked, retrieval_method, timings)
+        if SEARCH_CACHE_ENABLED and _is_cacheable(retrieval_method, options):
+            search_cache_service.put(cache_keys[position], generation, results[position])
+    return results
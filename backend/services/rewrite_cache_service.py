@@ -0,0 +1,114 @@
+"""
+Cache for query rewriting results.
+
+A retried or regenerated turn sends the same query after the same
+conversation, so its classification, rewrite, HyDE passage and HyDE
+embedding can be reused instead of repeating every pre-retrieval LLM and
+embedding call (HyDE samples at temperature 0.7, so a rerun would not
+even reproduce the passage). Keyed by the normalized query, a hash of the
+history window the rewriter reads (QUERY_REWRITE_HISTORY_WINDOW), the
+rewrite model and the settings that change the result. Bounded by entry
+count (LRU).
+"""
+
+import dataclasses
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from config import (
+    QUERY_REWRITE_CACHE_MAX_ENTRIES, QUERY_REWRITE_HISTORY_WINDOW,
+    CONFIDENCE_GATE_THRESHOLD, HYDE_CONFIDENCE_GATE_THRESHOLD,
+    HYDE_PASSAGE_MAX_TOKENS, EMBEDDING_MODEL,
+)
+from services import metrics_service
+
+# Anything besides query, history and model that changes the result
+REWRITE_FINGERPRINT = (
+    CONFIDENCE_GATE_THRESHOLD, HYDE_CONFIDENCE_GATE_THRESHOLD,
+    HYDE_PASSAGE_MAX_TOKENS, EMBEDDING_MODEL,
+)
+
+_entries: "OrderedDict[tuple, object]" = OrderedDict()
+_lock = threading.Lock()
+
+CACHE_HITS = metrics_service.Counter(
+    "aira_rewrite_cache_hits_total", "Query rewrite cache hits"
+)
+CACHE_MISSES = metrics_service.Counter(
+    "aira_rewrite_cache_misses_total", "Query rewrite cache misses"
+)
+CACHE_ENTRIES = metrics_service.Gauge(
+    "aira_rewrite_cache_entries", "Entries in the query rewrite cache",
+    callback=lambda: len(_entries),
+)
+
+
+def history_fingerprint(conversation_history: list[dict]) -> str:
+    """Hash of the history window the rewriter sees."""
+    window = [
+        (message.get("role"), message.get("content"))
+        for message in conversation_history[-QUERY_REWRITE_HISTORY_WINDOW:]
+    ]
+    return hashlib.sha256(
+        json.dumps(window, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def make_key(
+    query: str, conversation_history: list[dict], model: str, *settings
+) -> tuple:
+    """
+    Cache key: casefolded, whitespace-collapsed query + history window
+    hash + rewrite model + per-call settings (allow_hyde, mode, ...).
+    """
+    normalized = " ".join(query.casefold().split())
+    return (
+        normalized, history_fingerprint(conversation_history), model,
+        settings, REWRITE_FINGERPRINT,
+    )
+
+
+def get(key: tuple):
+    """
+    Look up a cached result.
+
+    Returns:
+        Shallow copy of the cached RewriteResult, or None on a miss
+    """
+    with _lock:
+        result = _entries.get(key)
+        if result is None:
+            CACHE_MISSES.inc()
+            return None
+        _entries.move_to_end(key)
+    CACHE_HITS.inc()
+    return dataclasses.replace(result)
+
+
+def put(key: tuple, result) -> None:
+    """Store a RewriteResult, evicting the least recently used entries."""
+    with _lock:
+        _entries[key] = dataclasses.replace(result)
+        _entries.move_to_end(key)
+        while len(_entries) > QUERY_REWRITE_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def clear() -> None:
+    """Drop every entry."""
+    with _lock:
+        _entries.clear()
+
+
+def get_cache_stats() -> dict:
+    """Entry count and lifetime hit rate."""
+    hits, misses = CACHE_HITS.value(), CACHE_MISSES.value()
+    lookups = hits + misses
+    return {
+        "entries": len(_entries),
+        "hits": int(hits),
+        "misses": int(misses),
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+    }
@@ -0,0 +1,147 @@
+"""
+Full-result cache for hybrid search.
+
+Caches final search results keyed by normalized query, doc_ids filter and
+a fingerprint of the pipeline config. Each entry records the index
+generation it was computed at (see index_generation_service); entries
+from an older generation are dropped on lookup, so an ingest or delete
+is never masked. Bounded by entry count and approximate bytes (LRU).
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from config import (
+    SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_MAX_BYTES,
+    EMBEDDING_MODEL, RERANKER_MODEL, RERANK_STRATEGY, RERANK_CASCADE_ENABLED,
+    CASCADE_FIRST_STAGE, CASCADE_FIRST_STAGE_SIZE, RERANKER_CANDIDATE_COUNT,
+    RERANK_OUTPUT_SIZE, PARENT_OVERFETCH_FACTOR, RRF_K, RRF_DENSE_WEIGHT,
+    RRF_BM25_WEIGHT, BM25_TOP_K,
+)
+from services import metrics_service
+from services.index_generation_service import current_generation
+
+# Anything that changes which results a query returns
+PIPELINE_FINGERPRINT = (
+    EMBEDDING_MODEL, RERANKER_MODEL, RERANK_STRATEGY, RERANK_CASCADE_ENABLED,
+    CASCADE_FIRST_STAGE, CASCADE_FIRST_STAGE_SIZE, RERANKER_CANDIDATE_COUNT,
+    RERANK_OUTPUT_SIZE, PARENT_OVERFETCH_FACTOR, RRF_K, RRF_DENSE_WEIGHT,
+    RRF_BM25_WEIGHT, BM25_TOP_K,
+)
+
+# Key -> (generation, results, approximate bytes)
+_entries: "OrderedDict[tuple, tuple[int, list[dict], int]]" = OrderedDict()
+_cache_bytes = 0
+_lock = threading.Lock()
+
+CACHE_HITS = metrics_service.Counter(
+    "aira_search_cache_hits_total", "Search result cache hits"
+)
+CACHE_MISSES = metrics_service.Counter(
+    "aira_search_cache_misses_total", "Search result cache misses (including stale)"
+)
+CACHE_ENTRIES = metrics_service.Gauge(
+    "aira_search_cache_entries", "Entries in the search result cache",
+    callback=lambda: len(_entries),
+)
+CACHE_BYTES = metrics_service.Gauge(
+    "aira_search_cache_bytes", "Approximate memory held by the search result cache",
+    callback=lambda: _cache_bytes,
+)
+
+
+def make_key(query: str, doc_ids: Optional[list[str]], options: tuple = ()) -> tuple:
+    """
+    Cache key: casefolded, whitespace-collapsed query + sorted doc filter +
+    config + per-request options (RetrievalOptions.cache_fingerprint).
+    """
+    normalized = " ".join(query.casefold().split())
+    doc_filter = tuple(sorted(doc_ids)) if doc_ids else None
+    return (normalized, doc_filter, PIPELINE_FINGERPRINT, options)
+
+
+def _estimate_bytes(results: list[dict]) -> int:
+    """Rough size of cached results, dominated by chunk and parent text."""
+    total = sys.getsizeof(results)
+    for result in results:
+        total += sys.getsizeof(result)
+        for value in result.values():
+            total += sys.getsizeof(value)
+    return total
+
+
+def _copy(results: list[dict]) -> list[dict]:
+    """Per-result shallow copies (values are immutable) so callers can mutate."""
+    return [dict(result) for result in results]
+
+
+def _forget(key: tuple) -> None:
+    """Drop one entry (caller holds the lock)."""
+    global _cache_bytes
+    _, _, nbytes = _entries.pop(key)
+    _cache_bytes -= nbytes
+
+
+def get(key: tuple) -> Optional[list[dict]]:
+    """
+    Look up cached results for the current index generation.
+
+    Returns:
+        Copy of the cached results, or None on a miss or stale entry
+    """
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] != current_generation():
+            _forget(key)
+            entry = None
+        if entry is None:
+            CACHE_MISSES.inc()
+            return None
+        _entries.move_to_end(key)
+    CACHE_HITS.inc()
+    return _copy(entry[1])
+
+
+def put(key: tuple, generation: int, results: list[dict]) -> None:
+    """
+    Store results computed at `generation`.
+
+    The caller captures the generation before searching, so an index
+    mutation that lands mid-search leaves the entry already stale.
+    """
+    global _cache_bytes
+    if generation != current_generation():
+        return
+    nbytes = _estimate_bytes(results)
+    if nbytes > SEARCH_CACHE_MAX_BYTES:
+        return
+    with _lock:
+        if key in _entries:
+            _forget(key)
+        _entries[key] = (generation, _copy(results), nbytes)
+        _cache_bytes += nbytes
+        while len(_entries) > SEARCH_CACHE_MAX_ENTRIES or _cache_bytes > SEARCH_CACHE_MAX_BYTES:
+            _forget(next(iter(_entries)))
+
+
+def clear() -> None:
+    """Drop every entry."""
+    global _cache_bytes
+    with _lock:
+        _entries.clear()
+        _cache_bytes = 0
+
+
+def get_cache_stats() -> dict:
+    """Entry count, approximate bytes and lifetime hit rate."""
+    hits, misses = CACHE_HITS.value(), CACHE_MISSES.value()
+    lookups = hits + misses
+    return {
+        "entries": len(_entries),
+        "bytes": _cache_bytes,
+        "hits": int(hits),
+        "misses": int(misses),
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+    }
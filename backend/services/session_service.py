@@ -8,11 +8,14 @@ import uuid
 from datetime import datetime
 from typing import Optional
 from sqlalchemy.orm import Session
-from models.session import ChatSession, get_db
+from models.session import ChatSession, SessionSummary, get_db
 
 
 # Re-export get_db for convenient imports
-__all__ = ['create_session', 'get_session', 'update_session_messages', 'delete_session', 'get_db']
+__all__ = [
+    'create_session', 'get_session', 'update_session_messages', 'delete_session',
+    'get_session_summary', 'save_session_summary', 'get_db',
+]
 
 
 def create_session(db: Session) -> ChatSession:
@@ -105,8 +108,62 @@ def delete_session(db: Session, session_id: str) -> bool:
     session = get_session(db, session_id)
 
     if session:
+        summary = get_session_summary(db, session_id)
+        if summary:
+            db.delete(summary)
         db.delete(session)
         db.commit()
         return True
 
     return False
+
+
+def get_session_summary(db: Session, session_id: str) -> Optional[SessionSummary]:
+    """
+    Retrieve the rolling history summary for a session.
+
+    Args:
+        db: Database session
+        session_id: Session identifier
+
+    Returns:
+        SessionSummary if one has been generated, None otherwise
+    """
+    return db.query(SessionSummary).filter(SessionSummary.session_id == session_id).first()
+
+
+def save_session_summary(
+    db: Session, session_id: str, summary: str, summarized_count: int
+) -> SessionSummary:
+    """
+    Create or replace a session's rolling history summary.
+
+    Args:
+        db: Database session
+        session_id: Session identifier
+        summary: Summary of the session's first summarized_count messages
+        summarized_count: Number of leading messages the summary covers
+
+    Returns:
+        SessionSummary: Saved summary
+    """
+    record = get_session_summary(db, session_id)
+    now = datetime.utcnow().isoformat()
+
+    if record is None:
+        record = SessionSummary(
+            session_id=session_id,
+            summary=summary,
+            summarized_count=summarized_count,
+            updated_at=now,
+        )
+        db.add(record)
+    else:
+        record.summary = summary
+        record.summarized_count = summarized_count
+        record.updated_at = now
+
+    db.commit()
+    db.refresh(record)
+
+    return record
@@ -0,0 +1,113 @@
+"""
+Per-stage latency recording for search and chat requests.
+
+A StageTimings object is created per request and threaded through the
+pipeline; each stage records its wall time (time.perf_counter, monotonic)
+in milliseconds. When STAGE_TIMINGS_ENABLED is False, new_timings()
+returns a shared no-op recorder so instrumented code pays only a method
+call per stage.
+"""
+
+import json
+import logging
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Callable, Optional
+
+from config import STAGE_TIMINGS_ENABLED
+
+logger = logging.getLogger(__name__)
+
+_NULL_CONTEXT = nullcontext()
+
+
+class StageTimings:
+    """Accumulates per-stage durations (ms) for one request."""
+
+    enabled = True
+
+    def __init__(self):
+        self._stages: dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    def record(self, stage: str, elapsed_ms: float) -> None:
+        """Add elapsed_ms to a stage (repeated stages accumulate)."""
+        self._stages[stage] = self._stages.get(stage, 0.0) + elapsed_ms
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def timed(self, name: str, fn: Callable) -> Callable:
+        """Wrap fn so each call is recorded as stage `name` (for executors)."""
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(name, (time.perf_counter() - start) * 1000)
+        return wrapper
+
+    def merge(self, other) -> None:
+        """Add another recorder's stages (work done on this request's behalf)."""
+        for stage, elapsed_ms in getattr(other, "_stages", {}).items():
+            self.record(stage, elapsed_ms)
+
+    def as_dict(self) -> Optional[dict[str, float]]:
+        """Stage durations plus 'total' since creation, rounded to 0.01 ms."""
+        result = {stage: round(ms, 2) for stage, ms in self._stages.items()}
+        result["total"] = round((time.perf_counter() - self._started) * 1000, 2)
+        return result
+
+
+class _NullTimings:
+    """No-op recorder used when stage timings are disabled."""
+
+    enabled = False
+
+    def record(self, stage: str, elapsed_ms: float) -> None:
+        pass
+
+    def stage(self, name: str):
+        return _NULL_CONTEXT
+
+    def timed(self, name: str, fn: Callable) -> Callable:
+        return fn
+
+    def merge(self, other) -> None:
+        pass
+
+    def as_dict(self) -> Optional[dict[str, float]]:
+        return None
+
+
+NULL_TIMINGS = _NullTimings()
+
+
+def new_timings():
+    """Return a fresh StageTimings, or the no-op recorder when disabled."""
+    return StageTimings() if STAGE_TIMINGS_ENABLED else NULL_TIMINGS
+
+
+def log_timings(request_kind: str, timings, **fields) -> None:
+    """
+    Emit one structured log line with a request's stage timings.
+
+    Args:
+        request_kind: 'search' or 'chat'
+        timings: StageTimings (no-op recorders are skipped)
+        **fields: Extra JSON-serializable context (e.g. retrieval_method)
+    """
+    if not timings.enabled:
+        return
+    logger.info(
+        "stage_timings %s",
+        json.dumps({"kind": request_kind, "timings": timings.as_dict(), **fields}),
+    )
@@ -0,0 +1,58 @@
+"""
+Request-time token counting for prompt budgeting.
+
+Uses the same tiktoken encoding as chunking_service (cl100k_base, a proxy
+for the chat model's tokenizer). The encoding is loaded on first use; if
+it cannot be loaded (tiktoken fetches it once and caches it locally),
+counts fall back to a characters-per-token estimate so chat keeps working.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENCODING_NAME = "cl100k_base"
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_failed = False
+
+
+def _get_encoding():
+    """Load the encoding once; None if it is unavailable."""
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(ENCODING_NAME)
+        except Exception as e:
+            _encoding_failed = True
+            logger.warning(
+                "tiktoken encoding %s unavailable (%s), estimating token counts",
+                ENCODING_NAME, str(e),
+            )
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in text (estimated if the encoding is unavailable)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Keep the first max_tokens tokens of text."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
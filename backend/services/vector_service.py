@@ -10,6 +10,8 @@ from typing import Optional
 import chromadb
 from chromadb import Collection
 
+from services.index_generation_service import bump_generation
+
 
 # Vector storage directory
 VECTOR_DIR = Path("uploads/vectors")
@@ -54,6 +56,8 @@ def add_chunks(
     parent_texts: Optional[list[str]] = None,
     child_to_parent_index: Optional[list[int]] = None,
     context_prefixes: Optional[list[str]] = None,
+    token_counts: Optional[list[int]] = None,
+    parent_token_counts: Optional[list[int]] = None,
 ) -> None:
     """
     Add document chunks with embeddings to ChromaDB.
@@ -66,6 +70,8 @@ def add_chunks(
         parent_texts: Optional parent text for each child chunk (parent-doc retrieval)
         child_to_parent_index: Optional mapping from child index to parent index
         context_prefixes: Optional context prefix per chunk (contextual retrieval)
+        token_counts: Optional token count per child chunk (prompt packing)
+        parent_token_counts: Optional token count of each chunk's parent text
     """
     collection = get_collection()
 
@@ -91,6 +97,10 @@ def add_chunks(
             meta["parent_chunk_index"] = child_to_parent_index[i]
         if context_prefixes is not None:
             meta["context_prefix"] = context_prefixes[i]
+        if token_counts is not None:
+            meta["token_count"] = token_counts[i]
+        if parent_token_counts is not None:
+            meta["parent_token_count"] = parent_token_counts[i]
         metadatas.append(meta)
 
     # Add to collection
@@ -100,6 +110,7 @@ def add_chunks(
         embeddings=embeddings,
         metadatas=metadatas
     )
+    bump_generation()
 
 
 def delete_document_vectors(doc_id: str) -> None:
@@ -122,6 +133,7 @@ def delete_document_vectors(doc_id: str) -> None:
 
     # Delete all chunk IDs
     collection.delete(ids=results['ids'])
+    bump_generation()
 
 
 def get_collection_count() -> int:
@@ -39,3 +39,42 @@ for module_name in _PACKAGES_TO_MOCK:
             importlib.import_module(top_level)
         except ImportError:
             sys.modules[module_name] = MagicMock()
+
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _clear_search_cache():
+    """Tests reuse queries against different mocked indexes; never share results."""
+    from services import search_cache_service
+    search_cache_service.clear()
+    yield
+    search_cache_service.clear()
+
+
+@pytest.fixture(autouse=True)
+def _clear_answer_cache():
+    """Answer cache tests store answers for the same embeddings."""
+    from services import answer_cache_service
+    answer_cache_service.clear()
+    yield
+    answer_cache_service.clear()
+
+
+@pytest.fixture(autouse=True)
+def _clear_rewrite_cache():
+    """Rewrite tests replay the same query and history against different mocks."""
+    from services import rewrite_cache_service
+    rewrite_cache_service.clear()
+    yield
+    rewrite_cache_service.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_rerank_latency():
+    """Latency estimates from slow mocked rerankers must not resize later tests."""
+    from services import rerank_latency_service
+    rerank_latency_service.reset()
+    yield
+    rerank_latency_service.reset()
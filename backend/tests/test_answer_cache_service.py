@@ -0,0 +1,170 @@
+"""Tests for the semantic answer cache and its rag_service wiring."""
+
+import asyncio
+import sys
+from pathlib import Path
+from unittest.mock import patch, AsyncMock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services import answer_cache_service
+from services.index_generation_service import bump_generation, current_generation
+
+
+SCOPE = answer_cache_service.make_scope(None, "llama3")
+
+
+def _put(query, embedding, scope=SCOPE, chunks=("answer",)):
+    answer_cache_service.put(query, embedding, scope, current_generation(), list(chunks))
+
+
+def test_close_question_hits_distant_question_misses():
+    _put("What is the refund policy?", [1.0, 0.0, 0.0])
+
+    hit = answer_cache_service.get([0.99, 0.05, 0.0], SCOPE)
+    assert hit is not None and hit.chunks == ("answer",)
+    assert answer_cache_service.get([0.6, 0.8, 0.0], SCOPE) is None
+
+
+def test_scope_must_match():
+    _put("What is the refund policy?", [1.0, 0.0, 0.0])
+
+    assert answer_cache_service.get(
+        [1.0, 0.0, 0.0], answer_cache_service.make_scope(["doc-a"], "llama3")
+    ) is None
+    assert answer_cache_service.get(
+        [1.0, 0.0, 0.0], answer_cache_service.make_scope(None, "mistral")
+    ) is None
+    # Doc filter order does not matter
+    assert answer_cache_service.make_scope(["b", "a"], "m") == answer_cache_service.make_scope(["a", "b"], "m")
+
+
+def test_generation_bump_invalidates_entry():
+    _put("What is the refund policy?", [1.0, 0.0, 0.0])
+
+    bump_generation()
+
+    assert answer_cache_service.get([1.0, 0.0, 0.0], SCOPE) is None
+    assert answer_cache_service.get_cache_stats()["entries"] == 0
+
+
+def test_put_from_older_generation_is_dropped():
+    generation = current_generation()
+    bump_generation()
+
+    answer_cache_service.put("q", [1.0, 0.0], SCOPE, generation, ["answer"])
+
+    assert answer_cache_service.get([1.0, 0.0], SCOPE) is None
+
+
+def test_expired_entry_misses():
+    _put("What is the refund policy?", [1.0, 0.0, 0.0])
+
+    with patch.object(answer_cache_service, "ANSWER_CACHE_TTL_S", -1):
+        assert answer_cache_service.get([1.0, 0.0, 0.0], SCOPE) is None
+
+
+def test_near_duplicate_replaces_and_lru_evicts():
+    with patch.object(answer_cache_service, "ANSWER_CACHE_MAX_ENTRIES", 2):
+        answer_cache_service.clear()
+        _put("a", [1.0, 0.0, 0.0], chunks=("old",))
+        _put("a again", [1.0, 0.0, 0.0], chunks=("new",))
+        assert answer_cache_service.get_cache_stats()["entries"] == 1
+        assert answer_cache_service.get([1.0, 0.0, 0.0], SCOPE).chunks == ("new",)
+
+        _put("b", [0.0, 1.0, 0.0])
+        answer_cache_service.get([1.0, 0.0, 0.0], SCOPE)  # touch "a"
+        _put("c", [0.0, 0.0, 1.0])
+
+        assert answer_cache_service.get([0.0, 1.0, 0.0], SCOPE) is None
+        assert answer_cache_service.get([1.0, 0.0, 0.0], SCOPE) is not None
+
+
+def _collect(generator):
+    async def _run():
+        return [chunk async for chunk in generator]
+    # Private loop: leaves the current event loop for other tests
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(_run())
+    finally:
+        loop.close()
+
+
+async def _stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@patch("services.rag_service.ANSWER_CACHE_ENABLED", True)
+@patch("services.rag_service.get_selected_model", return_value="llama3")
+@patch("services.rag_service.stream_chat_completion")
+@patch("services.rag_service.asearch_documents", new_callable=AsyncMock)
+@patch("services.embedding_service.generate_embeddings", return_value=[[1.0, 0.0, 0.0]])
+class TestAnswerCacheWiring:
+    """A repeated standalone question replays the answer without search or LLM."""
+
+    def _search_results(self):
+        return [{
+            "text": "Refunds within 30 days.", "source_filename": "policy.pdf",
+            "source_doc_id": "doc1", "chunk_position": "1/1", "relevance_score": 0.9,
+        }]
+
+    def test_repeat_is_replayed(self, mock_embed, mock_search, mock_stream, mock_model):
+        from services.rag_service import generate_rag_response
+
+        mock_search.return_value = self._search_results()
+        mock_stream.side_effect = lambda messages, model: _stream("Within ", "30 days.")
+        cached = []
+
+        first = _collect(generate_rag_response("What is the refund policy?", []))
+        second = _collect(generate_rag_response(
+            "what's the refund policy?", [], on_cached=lambda: cached.append(True),
+        ))
+
+        assert second == first
+        assert cached == [True]
+        mock_search.assert_awaited_once()
+        mock_stream.assert_called_once()
+        # The lookup embedding is shared with search, one call per turn
+        assert mock_embed.call_count == 2
+        assert mock_search.call_args.kwargs["embeddings"].get("What is the refund policy?") == [1.0, 0.0, 0.0]
+
+    def test_different_doc_filter_is_not_replayed(
+        self, mock_embed, mock_search, mock_stream, mock_model
+    ):
+        from services.rag_service import generate_rag_response
+
+        mock_search.return_value = self._search_results()
+        mock_stream.side_effect = lambda messages, model: _stream("answer")
+
+        _collect(generate_rag_response("What is the refund policy?", []))
+        _collect(generate_rag_response(
+            "What is the refund policy?", [], document_ids=["doc-other"],
+        ))
+
+        assert mock_stream.call_count == 2
+
+    @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
+    @patch("services.rag_service.SPECULATIVE_RETRIEVAL_ENABLED", False)
+    @patch("services.rag_service.rewrite_query")
+    def test_follow_up_is_not_looked_up(
+        self, mock_rewrite, mock_embed, mock_search, mock_stream, mock_model
+    ):
+        from services.query_rewrite_service import RewriteResult
+        from services.rag_service import generate_rag_response
+
+        mock_rewrite.return_value = RewriteResult(
+            original_query="and the costs?",
+            effective_query="What are the refund costs?",
+            query_type="follow_up",
+        )
+        mock_search.return_value = self._search_results()
+        mock_stream.side_effect = lambda messages, model: _stream("answer")
+        history = [{"role": "user", "content": "What is the refund policy?"}]
+
+        _collect(generate_rag_response("and the costs?", history))
+        _collect(generate_rag_response("and the costs?", history))
+
+        assert mock_stream.call_count == 2
+        assert answer_cache_service.get_cache_stats()["entries"] == 0
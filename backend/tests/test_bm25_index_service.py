@@ -182,3 +182,69 @@ def test_add_multiple_documents(bm25_tmp_dir):
     chunk_ids = [r["chunk_id"] for r in results]
     assert "doc1_c0" in chunk_ids
     assert "doc2_c0" in chunk_ids
+
+
+def test_search_restricted_to_doc_ids(bm25_tmp_dir):
+    from services.bm25_index_service import add_document, search
+    add_document("doc1", ["first document text"], ["doc1_c0"])
+    add_document("doc2", ["second document text"], ["doc2_c0"])
+    add_document("doc3", ["unrelated filler material"], ["doc3_c0"])
+
+    results = search("document text", top_k=10, doc_ids=["doc2"])
+    assert [r["chunk_id"] for r in results] == ["doc2_c0"]
+
+
+def test_mutations_replace_state_instead_of_editing_it(bm25_tmp_dir):
+    """A search's snapshot stays consistent while ingest/delete run concurrently."""
+    import services.bm25_index_service as mod
+    mod.add_document("doc1", ["first document text"], ["doc1_c0"])
+    snapshot = (mod._bm25, mod._corpus_chunk_ids, mod._doc_to_chunks)
+
+    mod.add_document("doc2", ["second document text"], ["doc2_c0"])
+    mod.remove_document("doc1")
+
+    bm25, chunk_ids, doc_to_chunks = snapshot
+    assert chunk_ids == ["doc1_c0"]
+    assert doc_to_chunks == {"doc1": [0]}
+    assert len(bm25.get_scores(["document"])) == len(chunk_ids)
+    assert mod._corpus_chunk_ids == ["doc2_c0"]
+    assert mod._doc_to_chunks == {"doc2": [0]}
+
+
+def test_search_does_not_wait_for_a_rebuild(bm25_tmp_dir, monkeypatch):
+    """Searches read the current version while the next one is being built."""
+    import threading
+    import services.bm25_index_service as mod
+
+    mod.add_document(
+        "doc1", ["first document text", "filler alpha", "filler beta"],
+        ["doc1_c0", "doc1_c1", "doc1_c2"],
+    )
+
+    building = threading.Event()
+    release = threading.Event()
+    real_bm25 = mod.BM25Okapi
+
+    def slow_bm25(corpus):
+        building.set()
+        release.wait(5)
+        return real_bm25(corpus)
+
+    monkeypatch.setattr(mod, "BM25Okapi", slow_bm25)
+    writer = threading.Thread(
+        target=mod.add_document, args=("doc2", ["second document text"], ["doc2_c0"])
+    )
+    writer.start()
+    try:
+        assert building.wait(5)
+        found = []
+        searcher = threading.Thread(target=lambda: found.extend(mod.search("document")))
+        searcher.start()
+        searcher.join(1)
+        assert not searcher.is_alive()
+        assert [r["chunk_id"] for r in found] == ["doc1_c0"]
+    finally:
+        release.set()
+        writer.join(5)
+
+    assert [r["chunk_id"] for r in mod.search("second")] == ["doc2_c0"]
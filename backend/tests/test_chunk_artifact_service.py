@@ -0,0 +1,68 @@
+"""Tests for the per-chunk artifact sidecar store."""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+@pytest.fixture
+def artifact_store(tmp_path):
+    """Point the store at a temp directory with an empty memory cache."""
+    import services.chunk_artifact_service as mod
+    mod._memory_cache.clear()
+    mod._cache_bytes = 0
+    with patch.object(mod, "ARTIFACT_DIR", tmp_path):
+        yield mod
+    mod._memory_cache.clear()
+    mod._cache_bytes = 0
+
+
+def _token_arrays():
+    return [
+        np.array([5, 6, 7], dtype=np.int32),
+        np.array([8], dtype=np.int32),
+        np.array([9, 10], dtype=np.int32),
+    ]
+
+
+def test_round_trip_preserves_chunk_arrays(artifact_store):
+    artifact_store.save_artifacts("rerank_tokens", "doc1", _token_arrays(), "model-a")
+    artifact_store._memory_cache.clear()  # force a disk read
+
+    loaded = artifact_store.load_artifacts("rerank_tokens", "doc1", "model-a")
+    assert len(loaded) == 3
+    assert loaded[0].tolist() == [5, 6, 7]
+    assert loaded[2].tolist() == [9, 10]
+    assert loaded[0].dtype == np.int32
+
+
+def test_stored_as_single_file_per_document(artifact_store, tmp_path):
+    artifact_store.save_artifacts("rerank_tokens", "doc1", _token_arrays(), "model-a")
+    assert [p.name for p in (tmp_path / "rerank_tokens").iterdir()] == ["doc1.npz"]
+
+
+def test_model_mismatch_returns_none(artifact_store):
+    artifact_store.save_artifacts("rerank_tokens", "doc1", _token_arrays(), "model-a")
+    assert artifact_store.load_artifacts("rerank_tokens", "doc1", "model-b") is None
+
+    artifact_store._memory_cache.clear()
+    assert artifact_store.load_artifacts("rerank_tokens", "doc1", "model-b") is None
+
+
+def test_missing_document_returns_none(artifact_store):
+    assert artifact_store.load_artifacts("rerank_tokens", "nope", "model-a") is None
+
+
+def test_delete_removes_all_kinds(artifact_store):
+    artifact_store.save_artifacts("rerank_tokens", "doc1", _token_arrays(), "model-a")
+    artifact_store.save_artifacts("other_kind", "doc1", _token_arrays(), "model-a")
+
+    artifact_store.delete_artifacts("doc1")
+
+    assert artifact_store.load_artifacts("rerank_tokens", "doc1", "model-a") is None
+    assert artifact_store.load_artifacts("other_kind", "doc1", "model-a") is None
@@ -181,3 +181,12 @@ def test_multiple_children_per_parent():
         has_shared_parent = len(parent_indices) > len(set(parent_indices))
         # This is expected but depends on chunk sizes; at minimum, verify structure
         assert len(result["child_chunks"]) > 1
+
+
+def test_token_counts_stored_per_child_and_parent():
+    from services.chunking_service import chunk_document, _tiktoken_len
+    text = "# Section\n\n" + "Token counted sentence. " * 300
+    result = chunk_document(text)
+    assert len(result["child_token_counts"]) == len(result["child_chunks"])
+    assert result["child_token_counts"][0] == _tiktoken_len(result["child_chunks"][0])
+    assert result["parent_token_counts"][0] == _tiktoken_len(result["parent_texts"][0])
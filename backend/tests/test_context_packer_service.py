@@ -0,0 +1,96 @@
+"""Tests for token-budgeted RAG prompt packing."""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from services import context_packer_service
+from services.context_packer_service import pack_context
+
+
+def _words(text):
+    return len(text.split())
+
+
+@pytest.fixture(autouse=True)
+def _word_tokens():
+    """One token per word, no per-entry or per-message overhead."""
+    with patch.object(context_packer_service, "count_tokens", _words), \
+            patch.object(context_packer_service, "truncate_tokens",
+                         lambda text, n: " ".join(text.split()[:n])), \
+            patch.object(context_packer_service, "ENTRY_OVERHEAD_TOKENS", 0), \
+            patch.object(context_packer_service, "MESSAGE_OVERHEAD_TOKENS", 0), \
+            patch.object(context_packer_service, "CONTEXT_MIN_TAIL_TOKENS", 10), \
+            patch.object(context_packer_service, "CONTEXT_HISTORY_MAX_SHARE", 0.5):
+        yield
+
+
+def _result(words, token_count=None):
+    return {"text": " ".join(["w"] * words), "token_count": token_count}
+
+
+def test_everything_fits_unchanged():
+    results = [_result(10, 10), _result(10, 10)]
+    history = [{"role": "user", "content": "hi there"}]
+
+    packed = pack_context(results, history, fixed_tokens=5, budget=100)
+
+    assert packed.results == results
+    assert packed.history == history
+    assert packed.context_tokens == 20
+    assert packed.dropped_results == 0
+
+
+def test_lowest_ranked_cut_at_tail_then_dropped():
+    results = [_result(40, 40) for _ in range(4)]
+
+    packed = pack_context(results, [], fixed_tokens=0, budget=100)
+
+    assert len(packed.results) == 3
+    assert packed.results[2]["truncated"] is True
+    assert packed.results[2]["token_count"] == 20
+    assert packed.dropped_results == 1
+    assert "truncated" not in results[2]  # caller's dicts untouched
+
+
+def test_short_tail_dropped_instead_of_cut():
+    results = [_result(95, 95), _result(40, 40)]
+
+    packed = pack_context(results, [], fixed_tokens=0, budget=100)
+
+    assert len(packed.results) == 1
+    assert packed.dropped_results == 1
+
+
+def test_stored_counts_used_instead_of_tokenizing():
+    with patch.object(context_packer_service, "count_tokens") as mock_count:
+        pack_context([_result(10, 10)], [], fixed_tokens=0, budget=100)
+    mock_count.assert_not_called()
+
+
+def test_history_keeps_newest_and_reclaims_unused_context_budget():
+    history = [{"role": "user", "content": " ".join(["old"] * 30)},
+               {"role": "assistant", "content": " ".join(["new"] * 30)}]
+
+    # 50-token history share fits only the newest message
+    squeezed = pack_context([_result(60, 60)], history, fixed_tokens=0, budget=100)
+    assert squeezed.history == history[1:]
+    assert squeezed.dropped_messages == 1
+
+    # Small contexts leave room for the older message too
+    roomy = pack_context([_result(10, 10)], history, fixed_tokens=0, budget=100)
+    assert roomy.history == history
+
+
+def test_default_budget_leaves_room_for_the_answer():
+    with patch.object(context_packer_service, "CONTEXT_TOKEN_BUDGET", 90):
+        packed = pack_context([_result(80, 80), _result(80, 80)], [], fixed_tokens=0)
+    assert sum(_words(r["text"]) for r in packed.results) <= 90
+
+    import config
+    assert config.CONTEXT_TOKEN_BUDGET + config.CONTEXT_OUTPUT_RESERVE_TOKENS \
+        <= config.CONTEXT_WINDOW_TOKENS
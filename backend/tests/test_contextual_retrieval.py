@@ -67,7 +67,7 @@ def test_validate_context_threshold_boundary():
 
 # --- generate_chunk_context tests ---
 
-@patch("services.contextual_retrieval_service.ollama")
+@patch("services.contextual_retrieval_service.ollama_client")
 def test_generate_chunk_context_returns_empty_on_ollama_error(mock_ollama):
     """If ollama.chat raises, return empty string (graceful degradation)."""
     from services.contextual_retrieval_service import generate_chunk_context
@@ -78,7 +78,7 @@ def test_generate_chunk_context_returns_empty_on_ollama_error(mock_ollama):
     assert result == ""
 
 
-@patch("services.contextual_retrieval_service.ollama")
+@patch("services.contextual_retrieval_service.ollama_client")
 def test_generate_chunk_context_returns_empty_when_validation_fails(mock_ollama):
     """If generated context fails hallucination check, return empty string."""
     from services.contextual_retrieval_service import generate_chunk_context
@@ -96,7 +96,7 @@ def test_generate_chunk_context_returns_empty_when_validation_fails(mock_ollama)
     assert result == ""
 
 
-@patch("services.contextual_retrieval_service.ollama")
+@patch("services.contextual_retrieval_service.ollama_client")
 def test_generate_chunk_context_returns_valid_context(mock_ollama):
     """If generated context passes validation, return it."""
     from services.contextual_retrieval_service import generate_chunk_context
@@ -115,7 +115,7 @@ def test_generate_chunk_context_returns_valid_context(mock_ollama):
 
 # --- generate_chunk_contexts tests ---
 
-@patch("services.contextual_retrieval_service.ollama")
+@patch("services.contextual_retrieval_service.ollama_client")
 @patch("services.contextual_retrieval_service.CONTEXT_GENERATION_TIMEOUT", 0.1)
 def test_generate_chunk_contexts_respects_timeout(mock_ollama):
     """Timeout should stop processing and fill remaining with empty strings."""
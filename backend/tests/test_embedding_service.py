@@ -0,0 +1,67 @@
+"""
+Tests for the request-scoped EmbeddingContext.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from services.embedding_service import EmbeddingContext
+
+
+@patch("services.embedding_service.generate_embeddings")
+def test_embeds_only_unseen_texts_once(mock_embed):
+    mock_embed.side_effect = lambda texts: [[float(len(t))] for t in texts]
+    embeddings = EmbeddingContext()
+
+    assert embeddings.embed(["a", "bb", "a"]) == [[1.0], [2.0], [1.0]]
+    assert embeddings.embed(["bb", "ccc"]) == [[2.0], [3.0]]
+
+    assert [call.args[0] for call in mock_embed.call_args_list] == [["a", "bb"], ["ccc"]]
+
+
+@patch("services.embedding_service.generate_embeddings")
+def test_get_returns_only_computed_vectors(mock_embed):
+    mock_embed.return_value = [[0.5, 0.5]]
+    embeddings = EmbeddingContext()
+
+    assert embeddings.get("query") is None
+    embeddings.embed(["query"])
+
+    assert embeddings.get("query") == [0.5, 0.5]
+
+
+@patch("services.embedding_service.generate_embeddings")
+def test_failed_embed_is_not_memoized(mock_embed):
+    mock_embed.side_effect = [RuntimeError("Ollama unavailable"), [[1.0]]]
+    embeddings = EmbeddingContext()
+
+    with pytest.raises(RuntimeError):
+        embeddings.embed(["query"])
+
+    assert embeddings.embed(["query"]) == [[1.0]]
+
+
+@patch("services.embedding_service.generate_embeddings")
+def test_concurrent_callers_embed_a_shared_text_once(mock_embed):
+    started = threading.Event()
+
+    def slow_embed(texts):
+        started.set()
+        time.sleep(0.05)
+        return [[float(len(t))] for t in texts]
+
+    mock_embed.side_effect = slow_embed
+    embeddings = EmbeddingContext()
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(embeddings.embed, ["query"])
+        started.wait()
+        second = pool.submit(embeddings.embed, ["query", "previous"])
+
+    assert first.result() == [[5.0]]
+    assert second.result() == [[5.0], [8.0]]
+    assert [call.args[0] for call in mock_embed.call_args_list] == [["query"], ["previous"]]
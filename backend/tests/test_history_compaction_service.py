@@ -0,0 +1,136 @@
+"""Tests for rolling conversation-history compaction."""
+
+import sys
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from services import history_compaction_service
+from services.history_compaction_service import (
+    SUMMARY_MESSAGE_PREFIX, compact_history, refresh_session_summary,
+    strip_derived_content,
+)
+from services.rag_service import SOURCES_FOOTER
+
+
+def _turns(count):
+    """count user/assistant pairs; answers carry a sources footer."""
+    messages = []
+    for i in range(count):
+        messages.append({"role": "user", "content": f"question {i}"})
+        messages.append({
+            "role": "assistant",
+            "content": f"answer {i}{SOURCES_FOOTER}- doc{i}.pdf",
+        })
+    return messages
+
+
+@pytest.fixture(autouse=True)
+def _window():
+    with patch.object(history_compaction_service, "HISTORY_COMPACTION_ENABLED", True), \
+            patch.object(history_compaction_service, "HISTORY_RECENT_MESSAGES", 4), \
+            patch.object(history_compaction_service, "HISTORY_SUMMARY_BATCH_MESSAGES", 0):
+        yield
+
+
+def test_strip_derived_content_removes_sources_footer():
+    message = {"role": "assistant", "content": f"The answer.{SOURCES_FOOTER}- a.pdf"}
+
+    assert strip_derived_content(message)["content"] == "The answer."
+    assert SOURCES_FOOTER in message["content"]  # original untouched
+    user = {"role": "user", "content": f"quote{SOURCES_FOOTER}"}
+    assert strip_derived_content(user) is user
+
+
+def test_compact_history_keeps_recent_window_after_summary():
+    summary = SimpleNamespace(summary="User asked about Q1 revenue.", summarized_count=6)
+
+    compacted = compact_history(_turns(5), summary)
+
+    assert compacted[0] == {
+        "role": "system",
+        "content": SUMMARY_MESSAGE_PREFIX + "User asked about Q1 revenue.",
+    }
+    assert [m["content"] for m in compacted[1:]] == [
+        "question 3", "answer 3", "question 4", "answer 4",
+    ]
+
+
+def test_compact_history_short_or_disabled_passes_through_stripped():
+    assert [m["content"] for m in compact_history(_turns(2))] == [
+        "question 0", "answer 0", "question 1", "answer 1",
+    ]
+    with patch.object(history_compaction_service, "HISTORY_COMPACTION_ENABLED", False):
+        assert len(compact_history(_turns(5))) == 10
+
+
+def test_compact_history_keeps_everything_until_a_summary_exists():
+    assert len(compact_history(_turns(5))) == 10
+    empty = SimpleNamespace(summary="", summarized_count=0)
+    assert len(compact_history(_turns(5), empty)) == 10
+
+
+def _session_layer(session, summary, db=None):
+    """Stand-in for services.session_service (the DB layer is not importable here)."""
+    module = ModuleType("services.session_service")
+    def get_db():
+        yield db or MagicMock()
+
+    module.get_db = get_db
+    module.get_session = MagicMock(return_value=session)
+    module.get_session_summary = MagicMock(return_value=summary)
+    module.save_session_summary = MagicMock()
+    return patch.dict(sys.modules, {"services.session_service": module}), module
+
+
+def test_refresh_summary_folds_messages_leaving_the_window():
+    session = SimpleNamespace(messages=_turns(5))
+    previous = SimpleNamespace(summary="Earlier summary.", summarized_count=2)
+    db = MagicMock()
+    chat = MagicMock(return_value={"message": {"content": " Updated summary. "}})
+
+    layer, module = _session_layer(session, previous, db)
+
+    with layer, patch.object(history_compaction_service.ollama_client, "chat", chat):
+        refresh_session_summary("sid", model="llama3")
+
+    module.save_session_summary.assert_called_once_with(db, "sid", "Updated summary.", 6)
+    prompt = chat.call_args.kwargs["messages"][0]["content"]
+    assert chat.call_args.kwargs["model"] == "llama3"
+    assert "Earlier summary." in prompt
+    assert "question 1" in prompt and "question 2" in prompt
+    assert "question 0" not in prompt and "question 3" not in prompt
+    assert SOURCES_FOOTER not in prompt
+
+
+def test_refresh_summary_noop_when_window_covers_session():
+    session = SimpleNamespace(messages=_turns(2))
+
+    layer, module = _session_layer(session, None)
+
+    with layer, patch.object(history_compaction_service.ollama_client, "chat") as chat:
+        refresh_session_summary("sid")
+
+    chat.assert_not_called()
+    module.save_session_summary.assert_not_called()
+
+
+def test_batched_summary_keeps_history_append_only():
+    """Between refreshes each turn's history extends the previous one."""
+    summary = SimpleNamespace(summary="Earlier summary.", summarized_count=4)
+    with patch.object(history_compaction_service, "HISTORY_SUMMARY_BATCH_MESSAGES", 4):
+        before = compact_history(_turns(5), summary)
+        after = compact_history(_turns(6), summary)
+
+        assert after[:len(before)] == before
+        assert len(after) == len(before) + 2
+
+        # Refresh waits until a full batch has left the recent window
+        layer, module = _session_layer(SimpleNamespace(messages=_turns(5)), summary)
+        with layer, patch.object(history_compaction_service.ollama_client, "chat") as chat:
+            refresh_session_summary("sid")
+        chat.assert_not_called()
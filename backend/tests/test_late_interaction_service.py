@@ -0,0 +1,107 @@
+"""Tests for late-interaction (MaxSim) reranking with mocked bge-m3."""
+
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+@pytest.fixture(autouse=True)
+def reset_model():
+    """Reset module-level model state between tests."""
+    import services.late_interaction_service as mod
+    mod._model = None
+    mod._model_status = "unavailable"
+    yield
+    mod._model = None
+    mod._model_status = "unavailable"
+
+
+def _unit_rows(rows):
+    array = np.array(rows, dtype=np.float32)
+    return array / np.linalg.norm(array, axis=1, keepdims=True)
+
+
+def test_maxsim_matches_naive_per_candidate_loop():
+    from services.late_interaction_service import maxsim_scores
+
+    rng = np.random.default_rng(0)
+    query = _unit_rows(rng.normal(size=(4, 8)))
+    candidates = [_unit_rows(rng.normal(size=(n, 8))).astype(np.float16) for n in (3, 1, 6)]
+
+    expected = [
+        (query @ c.astype(np.float32).T).max(axis=1).mean() for c in candidates
+    ]
+    np.testing.assert_allclose(maxsim_scores(query, candidates), expected, rtol=1e-5)
+
+
+def test_maxsim_empty_candidate_scores_zero():
+    from services.late_interaction_service import maxsim_scores
+
+    query = _unit_rows([[1.0, 0.0]])
+    candidates = [np.zeros((0, 2), dtype=np.float16), _unit_rows([[1.0, 0.0]])]
+    scores = maxsim_scores(query, candidates)
+    assert scores[0] == 0.0
+    assert scores[1] == pytest.approx(1.0)
+
+
+@patch("services.late_interaction_service.chunk_artifact_service")
+@patch("services.late_interaction_service.BGEM3FlagModel")
+def test_rerank_uses_stored_vectors_and_encodes_only_query(mock_model_cls, mock_store):
+    model = MagicMock()
+    model.encode.return_value = {"colbert_vecs": [_unit_rows([[1.0, 0.0]])]}
+    mock_model_cls.return_value = model
+    mock_store.load_artifacts.return_value = [
+        _unit_rows([[0.0, 1.0]]).astype(np.float16),
+        _unit_rows([[1.0, 0.1]]).astype(np.float16),
+    ]
+
+    from services.late_interaction_service import rerank
+    candidates = [
+        {"text": "off topic", "chunk_id": "doc1_chunk_0", "source_doc_id": "doc1"},
+        {"text": "on topic", "chunk_id": "doc1_chunk_1", "source_doc_id": "doc1"},
+    ]
+    results = rerank("query", candidates, top_k=2)
+
+    model.encode.assert_called_once()
+    assert model.encode.call_args[0][0] == ["query"]
+    assert results[0]["chunk_id"] == "doc1_chunk_1"
+    assert isinstance(results[0]["reranker_score"], float)
+
+
+@patch("services.late_interaction_service.LATE_INTERACTION_ENABLED", True)
+@patch("services.late_interaction_service._rebuild_executor")
+@patch("services.late_interaction_service.chunk_artifact_service")
+@patch("services.late_interaction_service.BGEM3FlagModel")
+def test_missing_vectors_encoded_inline(mock_model_cls, mock_store, mock_executor):
+    model = MagicMock()
+    model.encode.side_effect = [
+        {"colbert_vecs": [_unit_rows([[1.0, 0.0]])]},   # query
+        {"colbert_vecs": [_unit_rows([[1.0, 0.0]])]},   # missing candidate
+    ]
+    mock_model_cls.return_value = model
+    mock_store.load_artifacts.return_value = None
+
+    from services.late_interaction_service import rerank
+    candidates = [{"text": "legacy", "chunk_id": "doc1_chunk_0", "source_doc_id": "doc1"}]
+    results = rerank("query", candidates, top_k=1)
+
+    assert model.encode.call_args_list[1][0][0] == ["legacy"]
+    assert results[0]["reranker_score"] == pytest.approx(1.0)
+    # The document's cache is rebuilt in the background, once
+    from services.late_interaction_service import _rebuild_vector_cache
+    mock_executor.submit.assert_called_once_with(_rebuild_vector_cache, "doc1")
+    import services.late_interaction_service as mod
+    mod._pending_rebuilds.discard("doc1")
+
+
+@patch("services.late_interaction_service.chunk_artifact_service")
+@patch("services.late_interaction_service.LATE_INTERACTION_ENABLED", False)
+def test_build_vector_cache_disabled_is_noop(mock_store):
+    from services.late_interaction_service import build_vector_cache
+    build_vector_cache("doc1", ["chunk"])
+    mock_store.save_artifacts.assert_not_called()
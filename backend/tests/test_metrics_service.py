@@ -0,0 +1,112 @@
+"""Tests for the in-process Prometheus metrics registry."""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services import metrics_service
+from services.metrics_service import Counter, Gauge, Histogram
+from services.timing_service import StageTimings
+
+
+def _unregister(*metrics):
+    for metric in metrics:
+        metrics_service._registry.remove(metric)
+
+
+def test_counter_renders_labels():
+    counter = Counter("test_calls_total", "Calls", ("operation",))
+    try:
+        counter.inc(operation="embed")
+        counter.inc(2, operation="embed")
+        lines = counter.render()
+    finally:
+        _unregister(counter)
+
+    assert "# TYPE test_calls_total counter" in lines
+    assert 'test_calls_total{operation="embed"} 3' in lines
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_latency_seconds", "Latency", buckets=(0.1, 1.0))
+    try:
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5.0)
+        lines = histogram.render()
+    finally:
+        _unregister(histogram)
+
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{le="1"} 2' in lines
+    assert 'test_latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "test_latency_seconds_count 3" in lines
+    assert "test_latency_seconds_sum 5.55" in lines
+
+
+def test_callback_gauge_computed_at_scrape():
+    gauge = Gauge("test_corpus_chunks", "Chunks", callback=lambda: 42)
+    try:
+        lines = gauge.render()
+    finally:
+        _unregister(gauge)
+    assert "test_corpus_chunks 42" in lines
+
+
+def test_failing_callback_is_skipped():
+    def _fail():
+        raise RuntimeError("collection unavailable")
+
+    gauge = Gauge("test_broken_gauge", "Broken", callback=_fail)
+    try:
+        assert gauge.render() == []
+    finally:
+        _unregister(gauge)
+
+
+def test_label_values_escaped():
+    counter = Counter("test_escaped_total", "Escaping", ("name",))
+    try:
+        counter.inc(name='a"b')
+        lines = counter.render()
+    finally:
+        _unregister(counter)
+    assert 'test_escaped_total{name="a\\"b"} 1' in lines
+
+
+def test_stage_timings_feed_histogram():
+    timings = StageTimings()
+    timings.record("rerank", 120.0)
+    before = metrics_service.STAGE_DURATION.count(kind="search", stage="rerank")
+
+    metrics_service.observe_stage_timings("search", timings)
+
+    assert metrics_service.STAGE_DURATION.count(kind="search", stage="rerank") == before + 1
+
+
+def test_timeouts_counted_separately():
+    class ReadTimeout(Exception):
+        pass
+
+    errors = metrics_service.OLLAMA_ERRORS.value(operation="test_op")
+    timeouts = metrics_service.OLLAMA_TIMEOUTS.value(operation="test_op")
+
+    metrics_service.record_ollama_failure("test_op", ReadTimeout())
+    metrics_service.record_ollama_failure("test_op", ConnectionError())
+
+    assert metrics_service.OLLAMA_ERRORS.value(operation="test_op") == errors + 2
+    assert metrics_service.OLLAMA_TIMEOUTS.value(operation="test_op") == timeouts + 1
+
+
+def test_render_includes_pipeline_metrics():
+    with patch.object(metrics_service.BM25_CORPUS_CHUNKS, "_callback", lambda: 5), \
+            patch.object(metrics_service.VECTOR_CORPUS_CHUNKS, "_callback", lambda: 7):
+        text = metrics_service.render_metrics()
+
+    assert "aira_bm25_corpus_chunks 5" in text
+    assert "aira_vector_corpus_chunks 7" in text
+    assert "# TYPE aira_sse_streams_in_flight gauge" in text
+    assert "# TYPE aira_rerank_batch_size histogram" in text
+    assert text.endswith("\n")
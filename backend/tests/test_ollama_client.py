@@ -0,0 +1,76 @@
+"""Tests for the shared Ollama client layer."""
+
+import asyncio
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+import ollama_client
+
+
+@pytest.fixture(autouse=True)
+def _fresh_clients():
+    with patch.object(ollama_client, "_client", None), \
+            patch.object(ollama_client, "_async_clients", {}), \
+            patch.object(ollama_client, "OLLAMA_DEFAULT_OPTIONS", {"num_ctx": 8192}), \
+            patch.object(ollama_client, "OLLAMA_MODEL_OPTIONS", {"small": {"num_ctx": 2048}}), \
+            patch.object(ollama_client, "OLLAMA_KEEP_ALIVE", "30m"):
+        yield
+
+
+def test_model_options_profile_owns_load_options():
+    assert ollama_client.model_options("llama3:8b", {"temperature": 0, "num_ctx": 4096}) == {
+        "num_ctx": 8192, "temperature": 0,
+    }
+    assert ollama_client.model_options("small") == {"num_ctx": 2048}
+
+
+def test_default_profile_fits_packed_prompt_and_answer():
+    import config
+    assert config.OLLAMA_DEFAULT_OPTIONS["num_ctx"] >= (
+        config.CONTEXT_TOKEN_BUDGET + config.CONTEXT_OUTPUT_RESERVE_TOKENS
+    )
+
+
+def test_chat_uses_shared_client_with_keep_alive_and_profile():
+    with patch.object(ollama_client.ollama, "Client") as client_cls:
+        ollama_client.chat("llama3:8b", [{"role": "user", "content": "hi"}],
+                           options={"temperature": 0}, format="json")
+        ollama_client.embed("small", ["text"])
+
+    client_cls.assert_called_once()
+    client = client_cls.return_value
+    client.chat.assert_called_once_with(
+        model="llama3:8b",
+        messages=[{"role": "user", "content": "hi"}],
+        options={"num_ctx": 8192, "temperature": 0},
+        keep_alive="30m",
+        format="json",
+    )
+    client.embed.assert_called_once_with(
+        model="small", input=["text"], options={"num_ctx": 2048}, keep_alive="30m",
+    )
+
+
+def test_async_client_shared_within_event_loop():
+    async def _get_twice():
+        return ollama_client.get_async_client(), ollama_client.get_async_client()
+
+    def _in_new_loop():
+        # Private loops: asyncio.run() would unset the loop other tests use
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(_get_twice())
+        finally:
+            loop.close()
+
+    with patch.object(ollama_client.ollama, "AsyncClient", side_effect=lambda **_: MagicMock()):
+        first, second = _in_new_loop()
+        other_loop, _ = _in_new_loop()
+
+    assert first is second
+    assert other_loop is not first
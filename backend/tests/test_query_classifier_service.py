@@ -0,0 +1,165 @@
+"""Tests for the fast-path query classifier."""
+
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from services import query_classifier_service
+from services.query_classifier_service import (
+    FastClassification, LABELED_EXAMPLES, fast_classify, get_classifier_stats,
+    shadow_check,
+)
+
+AXES = {"standalone": [1.0, 0.0, 0.0], "follow_up": [0.0, 1.0, 0.0], "abstract": [0.0, 0.0, 1.0]}
+
+
+def _fake_embeddings(vectors_by_text):
+    """Examples embed to their class axis; other texts from vectors_by_text."""
+    by_text = {text: AXES[label] for label, texts in LABELED_EXAMPLES.items() for text in texts}
+    by_text.update(vectors_by_text)
+    return lambda texts: [by_text[text] for text in texts]
+
+
+class _InlineExecutor:
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_centroids():
+    with patch.object(query_classifier_service, "_centroids", None), \
+            patch.object(query_classifier_service, "_centroids_retry_at", 0.0):
+        yield
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("What about the costs?", "follow_up"),
+    ("Tell me more", "follow_up"),
+    ("Can you compare the second option?", "follow_up"),
+    ("Why is it so expensive?", "follow_up"),
+    ("Now tell me about climate change.", "standalone"),
+    ("What did the 2023 annual report say about revenue?", "standalone"),
+])
+def test_heuristics_decide_obvious_queries(query, expected):
+    with patch.object(query_classifier_service, "QUERY_FAST_CLASSIFIER_EMBEDDINGS", False):
+        decision = fast_classify(query, [{"role": "user", "content": "earlier"}])
+
+    assert decision.query_type == expected
+    assert decision.stage == "heuristic"
+
+
+@pytest.mark.parametrize("query", [
+    "Is there a refund policy?",
+    "Are there any shipping fees?",
+    "What were sales this year?",
+])
+def test_existential_there_and_calendar_this_are_not_references(query):
+    with patch.object(query_classifier_service, "QUERY_FAST_CLASSIFIER_EMBEDDINGS", False):
+        decision = fast_classify(query, [{"role": "user", "content": "earlier"}])
+
+    assert decision is None or decision.query_type != "follow_up"
+
+
+def test_ambiguous_query_without_embeddings_goes_to_llm():
+    with patch.object(query_classifier_service, "QUERY_FAST_CLASSIFIER_EMBEDDINGS", False):
+        assert fast_classify("What approaches exist for caching results?", []) is None
+
+
+def test_nearest_centroid_decides_with_margin():
+    history = [{"role": "user", "content": "How do databases scale?"}]
+    embed = _fake_embeddings({
+        "How should teams approach capacity planning?": [0.1, 0.1, 0.99],
+        "How do databases scale?": [0.1, 0.2, 0.95],
+    })
+
+    with patch.object(query_classifier_service, "generate_embeddings", side_effect=embed) as mock:
+        decision = fast_classify("How should teams approach capacity planning?", history)
+        fast_classify("How should teams approach capacity planning?", history)
+
+    assert decision.query_type == "abstract"
+    assert decision.stage == "embedding"
+    # Examples embedded once, then one call per query (query + last user message)
+    assert mock.call_count == 3
+    assert mock.call_args.args[0] == [
+        "How should teams approach capacity planning?", "How do databases scale?",
+    ]
+
+
+def test_unrelated_to_previous_query_is_topic_change():
+    history = [{"role": "user", "content": "Summarize the budget"}]
+    embed = _fake_embeddings({
+        "How should teams approach capacity planning?": [0.0, 0.1, 0.99],
+        "Summarize the budget": [0.99, 0.1, 0.0],
+    })
+
+    with patch.object(query_classifier_service, "generate_embeddings", side_effect=embed):
+        decision = fast_classify("How should teams approach capacity planning?", history)
+
+    assert decision.query_type == "standalone"
+
+
+def test_small_margin_goes_to_llm():
+    history = [{"role": "user", "content": "Earlier question"}]
+    embed = _fake_embeddings({
+        "Is the approach reasonable overall?": [0.7, 0.0, 0.7],
+        "Earlier question": [0.7, 0.0, 0.7],
+    })
+
+    with patch.object(query_classifier_service, "generate_embeddings", side_effect=embed):
+        # Centroids tie between standalone and abstract
+        assert fast_classify("Is the approach reasonable overall?", history) is None
+        # Long queries with reference words skip the embedding stage
+        assert fast_classify("Is that approach from the report reasonable overall?", history) is None
+
+
+def test_failed_centroid_embed_is_retried_after_backoff():
+    examples = [text for texts in LABELED_EXAMPLES.values() for text in texts]
+    clock = MagicMock()
+    # First call fails at t=100; t=110 is inside the 30 s backoff, t=131 is not
+    clock.monotonic.side_effect = [100.0, 100.0, 100.0, 110.0, 131.0, 131.0]
+
+    with patch.object(query_classifier_service, "QUERY_FAST_CLASSIFIER_RETRY_S", 30), \
+            patch.object(query_classifier_service, "time", clock), \
+            patch.object(query_classifier_service, "generate_embeddings", side_effect=[
+                RuntimeError("Ollama not running"), _fake_embeddings({})(examples),
+            ]) as mock:
+        assert query_classifier_service._get_centroids() is None
+        assert query_classifier_service._get_centroids() is None
+        assert mock.call_count == 1
+        assert query_classifier_service._get_centroids() is not None
+
+    assert mock.call_count == 2
+
+
+def test_shadow_check_records_agreement():
+    decision = FastClassification("follow_up", "cue", "heuristic")
+    before = get_classifier_stats()
+
+    with patch.object(query_classifier_service, "QUERY_FAST_CLASSIFIER_SHADOW_RATE", 1.0), \
+            patch.object(query_classifier_service, "_shadow_executor", _InlineExecutor()):
+        shadow_check(decision, lambda: "follow_up")
+        shadow_check(decision, lambda: "standalone")
+
+    stats = get_classifier_stats()
+    assert stats["shadow_checks"] == before["shadow_checks"] + 2
+    assert query_classifier_service.SHADOW_CHECKS.value(result="disagree", stage="heuristic") >= 1
+
+
+def test_classify_query_skips_llm_on_fast_path():
+    from services import query_rewrite_service
+
+    with patch.object(query_rewrite_service, "QUERY_FAST_CLASSIFIER_ENABLED", True), \
+            patch.object(query_classifier_service, "QUERY_FAST_CLASSIFIER_SHADOW_RATE", 0.0), \
+            patch.object(query_rewrite_service, "ollama_client") as mock_ollama:
+        before = get_classifier_stats()["fast_path"]
+        result = query_rewrite_service.classify_query(
+            "What about the costs?", [{"role": "user", "content": "Solar panels?"}]
+        )
+
+    assert result.query_type.value == "follow_up"
+    mock_ollama.chat.assert_not_called()
+    assert get_classifier_stats()["fast_path"] == before + 1
@@ -72,6 +72,11 @@ def _text_response(text: str) -> dict:
 # Integration tests
 # ---------------------------------------------------------------------------
 
+# Speculative retrieval would race the rewrite for the retrieval mocks;
+# it is covered in test_rag_rewrite_wiring. The fast-path classifier is
+# covered in test_query_classifier_service
+@patch("services.rag_service.SPECULATIVE_RETRIEVAL_ENABLED", False)
+@patch("services.query_rewrite_service.QUERY_FAST_CLASSIFIER_ENABLED", False)
 class TestQueryRewritePipeline(unittest.TestCase):
     """Integration tests for the full rewrite-to-search pipeline."""
 
@@ -80,8 +85,8 @@ class TestQueryRewritePipeline(unittest.TestCase):
     @patch("services.retrieval_service.reranker_service")
     @patch("services.retrieval_service.bm25_index_service")
     @patch("services.retrieval_service.get_collection")
-    @patch("services.retrieval_service.generate_embeddings")
-    @patch("services.query_rewrite_service.ollama")
+    @patch("services.embedding_service.generate_embeddings")
+    @patch("services.query_rewrite_service.ollama_client")
     @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
     def test_empty_history_skips_rewriting(
         self, mock_ollama, mock_embed, mock_collection, mock_bm25,
@@ -116,12 +121,11 @@ class TestQueryRewritePipeline(unittest.TestCase):
     @patch("services.retrieval_service.reranker_service")
     @patch("services.retrieval_service.bm25_index_service")
     @patch("services.retrieval_service.get_collection")
-    @patch("services.retrieval_service.generate_embeddings")
-    @patch("services.query_rewrite_service.ollama")
-    @patch("services.query_rewrite_service.generate_embeddings")
+    @patch("services.embedding_service.generate_embeddings")
+    @patch("services.query_rewrite_service.ollama_client")
     @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
     def test_standalone_classification_passes_through(
-        self, mock_rewrite_embed, mock_ollama, mock_retrieval_embed,
+        self, mock_ollama, mock_retrieval_embed,
         mock_collection, mock_bm25, mock_reranker, mock_parents, mock_stream
     ):
         """Standalone-classified query passes through without rewriting."""
@@ -158,8 +162,8 @@ class TestQueryRewritePipeline(unittest.TestCase):
     @patch("services.retrieval_service.bm25_index_service")
     @patch("services.retrieval_service.get_collection")
     @patch("services.retrieval_service.generate_embeddings")
-    @patch("services.query_rewrite_service.generate_embeddings")
-    @patch("services.query_rewrite_service.ollama")
+    @patch("services.embedding_service.generate_embeddings")
+    @patch("services.query_rewrite_service.ollama_client")
     @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
     def test_followup_rewritten_and_passes_gate(
         self, mock_ollama, mock_rewrite_embed, mock_retrieval_embed,
@@ -174,13 +178,10 @@ class TestQueryRewritePipeline(unittest.TestCase):
         ]
 
         # Confidence gate embeddings: high similarity (passes gate)
-        # Two calls: one for original, one for rewritten
+        # One call for original and rewritten
         high_sim_vec_a = [1.0, 0.0, 0.0]
         high_sim_vec_b = [0.9, 0.1, 0.0]
-        mock_rewrite_embed.side_effect = [
-            [high_sim_vec_a],  # original query embedding
-            [high_sim_vec_b],  # rewritten query embedding
-        ]
+        mock_rewrite_embed.return_value = [high_sim_vec_a, high_sim_vec_b]
 
         mock_retrieval_embed.return_value = [[0.1] * 1024]
         collection = MagicMock()
@@ -201,10 +202,13 @@ class TestQueryRewritePipeline(unittest.TestCase):
         history = [{"role": "user", "content": "Tell me about solar panels"}]
         _run_rag("what about the costs?", history)
 
-        # search_documents should have been called with the rewritten query
-        mock_retrieval_embed.assert_called_once_with(
-            ["What are the costs of solar panel installation?"]
+        # Search reuses the gate's embedding of the rewritten query
+        mock_rewrite_embed.assert_called_once_with(
+            ["what about the costs?", "What are the costs of solar panel installation?"]
         )
+        mock_retrieval_embed.assert_not_called()
+        query_call = collection.query.call_args
+        self.assertEqual(query_call[1]["query_embeddings"], [high_sim_vec_b])
 
     @patch("services.rag_service.stream_chat_completion")
     @patch("services.retrieval_service._expand_parents", side_effect=lambda x: x)
@@ -212,8 +216,8 @@ class TestQueryRewritePipeline(unittest.TestCase):
     @patch("services.retrieval_service.bm25_index_service")
     @patch("services.retrieval_service.get_collection")
     @patch("services.retrieval_service.generate_embeddings")
-    @patch("services.query_rewrite_service.generate_embeddings")
-    @patch("services.query_rewrite_service.ollama")
+    @patch("services.embedding_service.generate_embeddings")
+    @patch("services.query_rewrite_service.ollama_client")
     @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
     def test_followup_rewrite_fails_gate(
         self, mock_ollama, mock_rewrite_embed, mock_retrieval_embed,
@@ -228,10 +232,7 @@ class TestQueryRewritePipeline(unittest.TestCase):
         # Confidence gate: low similarity (fails gate -> fallback to original)
         low_sim_vec_a = [1.0, 0.0, 0.0]
         low_sim_vec_b = [0.0, 0.0, 1.0]  # orthogonal = 0 similarity
-        mock_rewrite_embed.side_effect = [
-            [low_sim_vec_a],  # original query embedding
-            [low_sim_vec_b],  # rewritten query embedding
-        ]
+        mock_rewrite_embed.return_value = [low_sim_vec_a, low_sim_vec_b]
 
         mock_retrieval_embed.return_value = [[0.1] * 1024]
         collection = MagicMock()
@@ -252,8 +253,10 @@ class TestQueryRewritePipeline(unittest.TestCase):
         history = [{"role": "user", "content": "Tell me about solar panels"}]
         _run_rag("what about the costs?", history)
 
-        # search_documents receives original query (gate rejected rewrite)
-        mock_retrieval_embed.assert_called_once_with(["what about the costs?"])
+        # Search uses the original query's embedding (gate rejected rewrite)
+        mock_retrieval_embed.assert_not_called()
+        query_call = collection.query.call_args
+        self.assertEqual(query_call[1]["query_embeddings"], [low_sim_vec_a])
 
     @patch("services.rag_service.stream_chat_completion")
     @patch("services.retrieval_service._expand_parents", side_effect=lambda x: x)
@@ -261,8 +264,8 @@ class TestQueryRewritePipeline(unittest.TestCase):
     @patch("services.retrieval_service.bm25_index_service")
     @patch("services.retrieval_service.get_collection")
     @patch("services.retrieval_service.generate_embeddings")
-    @patch("services.query_rewrite_service.generate_embeddings")
-    @patch("services.query_rewrite_service.ollama")
+    @patch("services.embedding_service.generate_embeddings")
+    @patch("services.query_rewrite_service.ollama_client")
     @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
     def test_abstract_uses_hyde_embedding(
         self, mock_ollama, mock_rewrite_embed, mock_retrieval_embed,
@@ -277,14 +280,10 @@ class TestQueryRewritePipeline(unittest.TestCase):
 
         # Confidence gate: high similarity for HyDE
         hyde_sim_vec_a = [1.0, 0.5, 0.0]
-        hyde_sim_vec_b = [0.8, 0.6, 0.0]  # similar enough
-        hyde_passage_embedding = [0.42] * 1024
+        hyde_passage_embedding = [0.8, 0.6, 0.0]  # similar enough
 
-        mock_rewrite_embed.side_effect = [
-            [hyde_sim_vec_a],         # original query embedding (confidence gate)
-            [hyde_sim_vec_b],         # HyDE passage embedding (confidence gate)
-            [hyde_passage_embedding],  # HyDE passage embedding (for search)
-        ]
+        # One call: original query and HyDE passage (gate, then search)
+        mock_rewrite_embed.return_value = [hyde_sim_vec_a, hyde_passage_embedding]
 
         # search_documents should NOT call generate_embeddings because
         # query_embedding is provided (the HyDE embedding)
@@ -308,6 +307,7 @@ class TestQueryRewritePipeline(unittest.TestCase):
 
         # retrieval_service.generate_embeddings should NOT be called (HyDE embedding used)
         mock_retrieval_embed.assert_not_called()
+        mock_rewrite_embed.assert_called_once()
 
         # ChromaDB query should receive the HyDE embedding
         query_call = collection.query.call_args
@@ -318,8 +318,8 @@ class TestQueryRewritePipeline(unittest.TestCase):
     @patch("services.retrieval_service.reranker_service")
     @patch("services.retrieval_service.bm25_index_service")
     @patch("services.retrieval_service.get_collection")
-    @patch("services.retrieval_service.generate_embeddings")
-    @patch("services.query_rewrite_service.ollama")
+    @patch("services.embedding_service.generate_embeddings")
+    @patch("services.query_rewrite_service.ollama_client")
     @patch("services.rag_service.QUERY_REWRITING_ENABLED", False)
     def test_rewriting_disabled_skips_all(
         self, mock_ollama, mock_retrieval_embed, mock_collection,
@@ -355,7 +355,7 @@ class TestQueryRewritePipeline(unittest.TestCase):
     @patch("services.retrieval_service.reranker_service")
     @patch("services.retrieval_service.bm25_index_service")
     @patch("services.retrieval_service.get_collection")
-    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.embedding_service.generate_embeddings")
     @patch("services.rag_service.rewrite_query")
     @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
     def test_rewrite_exception_falls_back(
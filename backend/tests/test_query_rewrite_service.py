@@ -18,6 +18,7 @@ from services.query_rewrite_service import (
     generate_hyde_passage,
     confidence_gate,
     rewrite_query,
+    analyze_query,
     _format_history,
     _cosine_similarity,
     QueryType,
@@ -55,8 +56,9 @@ def long_history():
 # TestClassifyQuery
 # ---------------------------------------------------------------------------
 
+@patch("services.query_rewrite_service.QUERY_FAST_CLASSIFIER_ENABLED", False)
 class TestClassifyQuery:
-    """Tests for classify_query function."""
+    """Tests for classify_query function (LLM path)."""
 
     def test_empty_history_returns_standalone(self):
         """No history means standalone -- no Ollama call needed."""
@@ -65,7 +67,7 @@ class TestClassifyQuery:
         assert result.query_type == QueryType.standalone
         assert "first" in result.reasoning.lower() or "no" in result.reasoning.lower()
 
-    @patch("services.query_rewrite_service.ollama")
+    @patch("services.query_rewrite_service.ollama_client")
     def test_successful_classification(self, mock_ollama, sample_history):
         """Ollama returns valid structured output parsed into QueryClassification."""
         classification_json = json.dumps({
@@ -84,7 +86,7 @@ class TestClassifyQuery:
         call_kwargs = mock_ollama.chat.call_args
         assert "format" in call_kwargs.kwargs or "format" in (call_kwargs[1] if len(call_kwargs) > 1 else {})
 
-    @patch("services.query_rewrite_service.ollama")
+    @patch("services.query_rewrite_service.ollama_client")
     def test_ollama_failure_returns_standalone(self, mock_ollama, sample_history):
         """On Ollama error, fall back to standalone (safe default)."""
         mock_ollama.chat.side_effect = Exception("Connection refused")
@@ -102,7 +104,7 @@ class TestClassifyQuery:
 class TestRewriteFollowup:
     """Tests for rewrite_followup function."""
 
-    @patch("services.query_rewrite_service.ollama")
+    @patch("services.query_rewrite_service.ollama_client")
     def test_successful_rewrite(self, mock_ollama, sample_history):
         """Ollama rewrites the follow-up query into standalone form."""
         mock_ollama.chat.return_value = {
@@ -114,7 +116,7 @@ class TestRewriteFollowup:
         assert "supervised" in result.lower()
         mock_ollama.chat.assert_called_once()
 
-    @patch("services.query_rewrite_service.ollama")
+    @patch("services.query_rewrite_service.ollama_client")
     def test_ollama_failure_returns_original(self, mock_ollama, sample_history):
         """On failure, return the original query unchanged."""
         mock_ollama.chat.side_effect = Exception("Model not found")
@@ -131,7 +133,7 @@ class TestRewriteFollowup:
 class TestGenerateHydePassage:
     """Tests for generate_hyde_passage function."""
 
-    @patch("services.query_rewrite_service.ollama")
+    @patch("services.query_rewrite_service.ollama_client")
     def test_successful_generation(self, mock_ollama):
         """Ollama generates a hypothetical passage."""
         passage_text = (
@@ -149,7 +151,7 @@ class TestGenerateHydePassage:
         assert "concurrent" in result.lower() or "locking" in result.lower()
         mock_ollama.chat.assert_called_once()
 
-    @patch("services.query_rewrite_service.ollama")
+    @patch("services.query_rewrite_service.ollama_client")
     def test_ollama_failure_returns_none(self, mock_ollama):
         """On failure, return None."""
         mock_ollama.chat.side_effect = Exception("Timeout")
@@ -166,18 +168,11 @@ class TestGenerateHydePassage:
 class TestConfidenceGate:
     """Tests for confidence_gate function."""
 
-    @patch("services.query_rewrite_service.generate_embeddings")
+    @patch("services.embedding_service.generate_embeddings")
     def test_passes_threshold(self, mock_embeddings):
         """Rewritten query passes when similarity >= threshold."""
         # Two similar vectors (high cosine similarity)
-        mock_embeddings.return_value = [[1.0, 0.0, 0.0]]
-
-        def side_effect(texts):
-            if "original" in texts[0]:
-                return [[1.0, 0.0, 0.0]]
-            return [[0.9, 0.1, 0.0]]
-
-        mock_embeddings.side_effect = side_effect
+        mock_embeddings.return_value = [[1.0, 0.0, 0.0], [0.9, 0.1, 0.0]]
 
         selected_query, similarity = confidence_gate(
             "original query", "rewritten query", threshold=0.4
@@ -186,17 +181,14 @@ class TestConfidenceGate:
         assert selected_query == "rewritten query"
         assert similarity is not None
         assert similarity >= 0.4
+        # Both texts embedded in one call
+        mock_embeddings.assert_called_once_with(["original query", "rewritten query"])
 
-    @patch("services.query_rewrite_service.generate_embeddings")
+    @patch("services.embedding_service.generate_embeddings")
     def test_fails_threshold_drift_detected(self, mock_embeddings):
         """Rewritten query rejected when similarity < threshold (drift)."""
         # Two orthogonal vectors (zero cosine similarity)
-        def side_effect(texts):
-            if "original" in texts[0]:
-                return [[1.0, 0.0, 0.0]]
-            return [[0.0, 1.0, 0.0]]
-
-        mock_embeddings.side_effect = side_effect
+        mock_embeddings.return_value = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]]
 
         selected_query, similarity = confidence_gate(
             "original query", "completely different topic", threshold=0.4
@@ -206,7 +198,7 @@ class TestConfidenceGate:
         assert similarity is not None
         assert similarity < 0.4
 
-    @patch("services.query_rewrite_service.generate_embeddings")
+    @patch("services.embedding_service.generate_embeddings")
     def test_embedding_failure_returns_original(self, mock_embeddings):
         """On embedding error, return original query."""
         mock_embeddings.side_effect = RuntimeError("Ollama embed failed")
@@ -265,11 +257,10 @@ class TestRewriteQuery:
         mock_rewrite.assert_called_once()
         mock_gate.assert_called_once()
 
-    @patch("services.query_rewrite_service.generate_embeddings")
-    @patch("services.query_rewrite_service.confidence_gate")
+    @patch("services.embedding_service.generate_embeddings")
     @patch("services.query_rewrite_service.generate_hyde_passage")
     @patch("services.query_rewrite_service.classify_query")
-    def test_abstract_hyde_path(self, mock_classify, mock_hyde, mock_gate, mock_embed, sample_history):
+    def test_abstract_hyde_path(self, mock_classify, mock_hyde, mock_embed, sample_history):
         """Abstract: classify -> HyDE -> confidence gate, sets hyde_embedding."""
         mock_classify.return_value = QueryClassification(
             query_type=QueryType.abstract,
@@ -277,16 +268,17 @@ class TestRewriteQuery:
         )
         hyde_passage = "Concurrent access is managed via locking and transactions."
         mock_hyde.return_value = hyde_passage
-        mock_gate.return_value = (hyde_passage, 0.55)
-        mock_embed.return_value = [[0.1, 0.2, 0.3]]
+        mock_embed.return_value = [[1.0, 0.0, 0.0], [0.8, 0.6, 0.0]]
 
         result = rewrite_query("What approaches exist for handling concurrent access?", sample_history)
 
         assert result.query_type == QueryType.abstract.value
         assert result.hyde_passage == hyde_passage
-        assert result.hyde_embedding == [0.1, 0.2, 0.3]
-        assert result.confidence_score == 0.55
+        assert result.hyde_embedding == [0.8, 0.6, 0.0]
+        assert abs(result.confidence_score - 0.8) < 1e-9
         mock_hyde.assert_called_once()
+        # The gate's embedding of the passage is reused for search
+        mock_embed.assert_called_once()
 
     @patch("services.query_rewrite_service.classify_query")
     def test_unhandled_exception_returns_original(self, mock_classify):
@@ -300,6 +292,141 @@ class TestRewriteQuery:
         assert result.used_fallback is True
 
 
+# ---------------------------------------------------------------------------
+# TestRewriteCache
+# ---------------------------------------------------------------------------
+
+@patch("services.query_rewrite_service.QUERY_FAST_CLASSIFIER_ENABLED", False)
+class TestRewriteCache:
+    """Tests for reusing rewrite results across retried turns."""
+
+    @patch("services.query_rewrite_service.confidence_gate")
+    @patch("services.query_rewrite_service.rewrite_followup")
+    @patch("services.query_rewrite_service.classify_query")
+    def test_retry_reuses_result(self, mock_classify, mock_rewrite, mock_gate, sample_history):
+        mock_classify.return_value = QueryClassification(
+            query_type=QueryType.follow_up, reasoning="pronoun",
+        )
+        mock_rewrite.return_value = "supervised versus unsupervised learning"
+        mock_gate.return_value = ("supervised versus unsupervised learning", 0.8)
+        classified = []
+
+        first = rewrite_query("How does it differ?", sample_history)
+        second = rewrite_query("  how does it DIFFER? ", sample_history, on_classified=classified.append)
+
+        assert second.effective_query == first.effective_query
+        assert second.original_query == "  how does it DIFFER? "
+        assert second is not first
+        assert classified == [True]
+        mock_classify.assert_called_once()
+        mock_rewrite.assert_called_once()
+
+    @patch("services.query_rewrite_service.classify_query")
+    def test_pass_through_hit_returns_query_as_typed(self, mock_classify, sample_history):
+        mock_classify.return_value = QueryClassification(
+            query_type=QueryType.standalone, reasoning="self-contained",
+        )
+
+        rewrite_query("What is X?", sample_history)
+        second = rewrite_query("what is  x?", sample_history)
+
+        mock_classify.assert_called_once()
+        assert second.original_query == "what is  x?"
+        assert second.effective_query == "what is  x?"
+
+    @patch("services.query_rewrite_service.confidence_gate")
+    @patch("services.query_rewrite_service.rewrite_followup")
+    @patch("services.query_rewrite_service.classify_query")
+    def test_different_history_misses(self, mock_classify, mock_rewrite, mock_gate, sample_history):
+        mock_classify.return_value = QueryClassification(
+            query_type=QueryType.follow_up, reasoning="pronoun",
+        )
+        mock_rewrite.return_value = "supervised versus unsupervised learning"
+        mock_gate.return_value = ("supervised versus unsupervised learning", 0.8)
+
+        rewrite_query("How does it differ?", sample_history)
+        rewrite_query("How does it differ?", sample_history + [
+            {"role": "user", "content": "What is reinforcement learning?"},
+            {"role": "assistant", "content": "Reinforcement learning uses rewards..."},
+        ])
+
+        assert mock_classify.call_count == 2
+
+    @patch("services.query_rewrite_service.classify_query")
+    def test_degraded_result_not_cached(self, mock_classify, sample_history):
+        mock_classify.side_effect = [
+            RuntimeError("Ollama unavailable"),
+            QueryClassification(query_type=QueryType.standalone, reasoning="topic change"),
+        ]
+
+        first = rewrite_query("What is climate change?", sample_history)
+        second = rewrite_query("What is climate change?", sample_history)
+
+        assert first.degraded is True
+        assert second.degraded is False
+        assert mock_classify.call_count == 2
+
+
+# ---------------------------------------------------------------------------
+# TestCombinedMode
+# ---------------------------------------------------------------------------
+
+@patch("services.query_rewrite_service.QUERY_FAST_CLASSIFIER_ENABLED", False)
+@patch("services.query_rewrite_service.QUERY_REWRITE_MODE", "combined")
+class TestCombinedMode:
+    """Tests for the single-call classify-and-rewrite mode."""
+
+    @patch("services.query_rewrite_service.confidence_gate")
+    @patch("services.query_rewrite_service.ollama_client")
+    def test_follow_up_rewritten_in_one_call(self, mock_ollama, mock_gate, sample_history):
+        mock_ollama.chat.return_value = {"message": {"content": json.dumps({
+            "query_type": "follow_up",
+            "reasoning": "Refers to supervised learning",
+            "rewritten_query": " How does supervised learning differ from unsupervised? ",
+            "hyde_passage": None,
+        })}}
+        mock_gate.side_effect = lambda original, rewritten, threshold, embeddings: (rewritten, 0.8)
+
+        result = rewrite_query("How does it differ?", sample_history)
+
+        mock_ollama.chat.assert_called_once()
+        assert "format" in mock_ollama.chat.call_args.kwargs
+        assert result.query_type == "follow_up"
+        assert result.effective_query == "How does supervised learning differ from unsupervised?"
+
+    @patch("services.query_rewrite_service.confidence_gate")
+    @patch("services.query_rewrite_service.ollama_client")
+    def test_unparseable_output_falls_back_to_two_step(
+        self, mock_ollama, mock_gate, sample_history
+    ):
+        mock_ollama.chat.side_effect = [
+            {"message": {"content": "not json"}},
+            {"message": {"content": json.dumps({
+                "query_type": "follow_up", "reasoning": "pronoun",
+            })}},
+            {"message": {"content": "supervised versus unsupervised learning"}},
+        ]
+        mock_gate.side_effect = lambda original, rewritten, threshold, embeddings: (rewritten, 0.8)
+
+        result = rewrite_query("How does it differ?", sample_history)
+
+        assert mock_ollama.chat.call_count == 3
+        assert result.effective_query == "supervised versus unsupervised learning"
+
+    @patch("services.query_rewrite_service.ollama_client")
+    def test_analysis_without_hyde_asks_for_no_passage(self, mock_ollama, sample_history):
+        mock_ollama.chat.return_value = {"message": {"content": json.dumps({
+            "query_type": "standalone", "reasoning": "topic change",
+        })}}
+
+        analysis = analyze_query("What is climate change?", sample_history, allow_hyde=False)
+
+        assert analysis.query_type == QueryType.standalone
+        assert analysis.rewritten_query is None
+        prompt = mock_ollama.chat.call_args.kwargs["messages"][0]["content"]
+        assert '"hyde_passage": always null' in prompt
+
+
 # ---------------------------------------------------------------------------
 # TestHelpers
 # ---------------------------------------------------------------------------
@@ -325,6 +452,17 @@ class TestHelpers:
         # Early messages should be excluded
         assert "User message 1" not in formatted
 
+    def test_format_history_summary_not_attributed_to_assistant(self):
+        """The compacted-history summary keeps its own heading."""
+        history = [
+            {"role": "system", "content": "Summary of the earlier conversation:\nQ1 revenue."},
+            {"role": "user", "content": "And Q2?"},
+        ]
+        formatted = _format_history(history, window=10)
+
+        assert formatted.splitlines()[0] == "Summary of the earlier conversation:"
+        assert "Assistant:" not in formatted
+
     def test_cosine_similarity_identical_vectors(self):
         """Identical vectors have similarity 1.0."""
         similarity = _cosine_similarity([1.0, 2.0, 3.0], [1.0, 2.0, 3.0])
@@ -0,0 +1,42 @@
+"""Tests for the RAG prompt layouts (PROMPT_LAYOUT)."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.rag_service import (
+    STABLE_SYSTEM_PROMPT, build_prompt_messages,
+)
+
+HISTORY = [
+    {"role": "user", "content": "What is in the report?"},
+    {"role": "assistant", "content": "Revenue figures [Doc 1]."},
+]
+
+
+def test_context_first_puts_documents_in_system_message():
+    messages = build_prompt_messages(
+        "And costs?", "[Doc 1] Source: a.pdf", 1, HISTORY, layout="context_first"
+    )
+
+    assert "[Doc 1] Source: a.pdf" in messages[0]["content"]
+    assert messages[1:3] == HISTORY
+    assert messages[-1] == {"role": "user", "content": "And costs?"}
+
+
+def test_cache_friendly_prefix_is_shared_across_turns():
+    """Instructions and earlier turns are identical from one turn to the next."""
+    first = build_prompt_messages(
+        "What is in the report?", "[Doc 1] Source: a.pdf", 1, [], layout="cache_friendly"
+    )
+    second = build_prompt_messages(
+        "And costs?", "[Doc 1] Source: b.pdf", 1, HISTORY, layout="cache_friendly"
+    )
+
+    assert first[0] == second[0] == {"role": "system", "content": STABLE_SYSTEM_PROMPT}
+    assert second[1:3] == HISTORY
+    assert second[-1]["role"] == "user"
+    assert "b.pdf" in second[-1]["content"]
+    assert second[-1]["content"].endswith("QUESTION: And costs?")
+    assert "b.pdf" not in "".join(m["content"] for m in second[:-1])
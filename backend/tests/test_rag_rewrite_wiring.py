@@ -1,16 +1,17 @@
 """
 Unit tests for query rewriting integration in rag_service.
 
-Verifies that rag_service calls rewrite_query before search_documents
+Verifies that rag_service calls rewrite_query before asearch_documents
 when QUERY_REWRITING_ENABLED is True and conversation_history is non-empty,
 and that it falls back gracefully on exceptions or when disabled.
 """
 
 import asyncio
+import time
 import unittest
 from dataclasses import dataclass, field
 from typing import Optional
-from unittest.mock import patch, MagicMock, AsyncMock
+from unittest.mock import ANY, patch, MagicMock, AsyncMock
 
 
 # Build a mock RewriteResult matching the real dataclass
@@ -24,6 +25,7 @@ class MockRewriteResult:
     hyde_embedding: Optional[list] = field(default=None)
     confidence_score: Optional[float] = None
     used_fallback: bool = False
+    degraded: bool = False
 
 
 def _make_search_results():
@@ -53,7 +55,7 @@ class TestRagServiceRewriteWiring(unittest.TestCase):
     """Tests for query rewriting wiring in rag_service.generate_rag_response."""
 
     @patch("services.rag_service.stream_chat_completion")
-    @patch("services.rag_service.search_documents")
+    @patch("services.rag_service.asearch_documents", new_callable=AsyncMock)
     @patch("services.rag_service.rewrite_query")
     @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
     def test_calls_rewrite_when_enabled_with_history(
@@ -74,10 +76,13 @@ class TestRagServiceRewriteWiring(unittest.TestCase):
         history = [{"role": "user", "content": "Tell me about solar panels"}]
         _run_async(generate_rag_response("what about costs?", history))
 
-        mock_rewrite.assert_called_once_with("what about costs?", history)
+        mock_rewrite.assert_called_once_with(
+            "what about costs?", history, allow_hyde=True, on_classified=ANY,
+            embeddings=ANY,
+        )
 
     @patch("services.rag_service.stream_chat_completion")
-    @patch("services.rag_service.search_documents")
+    @patch("services.rag_service.asearch_documents", new_callable=AsyncMock)
     @patch("services.rag_service.rewrite_query")
     @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
     def test_uses_effective_query_for_search(
@@ -104,7 +109,7 @@ class TestRagServiceRewriteWiring(unittest.TestCase):
         )
 
     @patch("services.rag_service.stream_chat_completion")
-    @patch("services.rag_service.search_documents")
+    @patch("services.rag_service.asearch_documents", new_callable=AsyncMock)
     @patch("services.rag_service.rewrite_query")
     @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
     def test_passes_hyde_embedding_to_search(
@@ -130,7 +135,7 @@ class TestRagServiceRewriteWiring(unittest.TestCase):
         self.assertEqual(call_kwargs["query_embedding"], hyde_embedding)
 
     @patch("services.rag_service.stream_chat_completion")
-    @patch("services.rag_service.search_documents")
+    @patch("services.rag_service.asearch_documents", new_callable=AsyncMock)
     @patch("services.rag_service.rewrite_query")
     @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
     def test_skips_rewrite_when_history_empty(
@@ -147,7 +152,7 @@ class TestRagServiceRewriteWiring(unittest.TestCase):
         mock_rewrite.assert_not_called()
 
     @patch("services.rag_service.stream_chat_completion")
-    @patch("services.rag_service.search_documents")
+    @patch("services.rag_service.asearch_documents", new_callable=AsyncMock)
     @patch("services.rag_service.rewrite_query")
     @patch("services.rag_service.QUERY_REWRITING_ENABLED", False)
     def test_skips_rewrite_when_disabled(
@@ -168,7 +173,7 @@ class TestRagServiceRewriteWiring(unittest.TestCase):
         self.assertEqual(call_args[0][0], "what about costs?")
 
     @patch("services.rag_service.stream_chat_completion")
-    @patch("services.rag_service.search_documents")
+    @patch("services.rag_service.asearch_documents", new_callable=AsyncMock)
     @patch("services.rag_service.rewrite_query")
     @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
     def test_falls_back_on_rewrite_exception(
@@ -189,7 +194,7 @@ class TestRagServiceRewriteWiring(unittest.TestCase):
         self.assertEqual(call_args[0][0], "what about costs?")
 
     @patch("services.rag_service.stream_chat_completion")
-    @patch("services.rag_service.search_documents")
+    @patch("services.rag_service.asearch_documents", new_callable=AsyncMock)
     @patch("services.rag_service.rewrite_query")
     @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
     def test_original_query_used_for_llm_prompt(
@@ -217,6 +222,136 @@ class TestRagServiceRewriteWiring(unittest.TestCase):
         self.assertEqual(user_message["content"], "what about costs?")
 
 
+class TestSpeculativeRetrieval(unittest.TestCase):
+    """Retrieval with the original query overlaps query rewriting."""
+
+    def _rewrite(self, will_rewrite, result):
+        def fake_rewrite(query, history, allow_hyde=True, on_classified=None, embeddings=None):
+            on_classified(will_rewrite)
+            return result
+        return fake_rewrite
+
+    @patch("services.rag_service.SPECULATIVE_RETRIEVAL_ENABLED", True)
+    @patch("services.rag_service.stream_chat_completion")
+    @patch("services.rag_service.asearch_documents", new_callable=AsyncMock)
+    @patch("services.rag_service.rewrite_query")
+    @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
+    def test_standalone_uses_speculative_results(
+        self, mock_rewrite, mock_search, mock_stream
+    ):
+        from services import metrics_service
+        from services.rag_service import generate_rag_response
+
+        mock_rewrite.side_effect = self._rewrite(False, MockRewriteResult(
+            original_query="Now tell me about wind power",
+            effective_query="Now tell me about wind power",
+            query_type="standalone",
+        ))
+        mock_search.return_value = _make_search_results()
+        mock_stream.return_value = _async_gen(["response"])
+        before = metrics_service.SPECULATIVE_RETRIEVALS.value(outcome="used")
+
+        history = [{"role": "user", "content": "Tell me about solar panels"}]
+        _run_async(generate_rag_response("Now tell me about wind power", history))
+
+        mock_search.assert_awaited_once()
+        self.assertEqual(mock_search.call_args[0][0], "Now tell me about wind power")
+        self.assertTrue(mock_search.call_args[1]["rerank_gate"].is_set())
+        self.assertEqual(
+            metrics_service.SPECULATIVE_RETRIEVALS.value(outcome="used"), before + 1
+        )
+
+    @patch("services.rag_service.SPECULATIVE_RETRIEVAL_ENABLED", True)
+    @patch("services.rag_service.stream_chat_completion")
+    @patch("services.rag_service.asearch_documents", new_callable=AsyncMock)
+    @patch("services.rag_service.rewrite_query")
+    @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
+    def test_rewritten_query_discards_speculative_results(
+        self, mock_rewrite, mock_search, mock_stream
+    ):
+        from services import metrics_service
+        from services.rag_service import generate_rag_response
+
+        mock_rewrite.side_effect = self._rewrite(True, MockRewriteResult(
+            original_query="what about costs?",
+            effective_query="What are the costs of solar panel installation?",
+            query_type="follow_up",
+        ))
+        mock_search.return_value = _make_search_results()
+        mock_stream.return_value = _async_gen(["response"])
+        before = metrics_service.SPECULATIVE_RETRIEVALS.value(outcome="cancelled")
+
+        history = [{"role": "user", "content": "Tell me about solar panels"}]
+        _run_async(generate_rag_response("what about costs?", history))
+
+        self.assertEqual(
+            mock_search.call_args[0][0],
+            "What are the costs of solar panel installation?",
+        )
+        # The speculative search was never allowed to rerank
+        self.assertFalse(mock_search.call_args_list[0][1]["rerank_gate"].is_set())
+        self.assertEqual(
+            metrics_service.SPECULATIVE_RETRIEVALS.value(outcome="cancelled"), before + 1
+        )
+
+
+    @patch("services.rag_service.SPECULATIVE_RETRIEVAL_ENABLED", True)
+    @patch("services.rag_service.stream_chat_completion")
+    @patch("services.retrieval_service._expand_parents", side_effect=lambda x: x)
+    @patch("services.retrieval_service.reranker_service")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.embedding_service.generate_embeddings")
+    @patch("services.rag_service.rewrite_query")
+    @patch("services.rag_service.QUERY_REWRITING_ENABLED", True)
+    def test_speculative_search_shares_the_query_embedding(
+        self, mock_rewrite, mock_embed, mock_search_embed, mock_collection,
+        mock_bm25, mock_reranker, mock_parents, mock_stream
+    ):
+        from services import metrics_service
+        from services.rag_service import generate_rag_response
+
+        query = "Now tell me about wind power"
+
+        def slow_embed(texts):
+            time.sleep(0.05)    # long enough for both callers to overlap
+            return [[0.1] * 1024 for _ in texts]
+
+        def fake_rewrite(query, history, allow_hyde=True, on_classified=None, embeddings=None):
+            # As the fast classifier: query + previous user message
+            embeddings.embed([query, history[-1]["content"]])
+            on_classified(False)
+            return MockRewriteResult(
+                original_query=query, effective_query=query, query_type="standalone",
+            )
+
+        mock_embed.side_effect = mock_search_embed.side_effect = slow_embed
+        mock_rewrite.side_effect = fake_rewrite
+        collection = MagicMock()
+        collection.query.return_value = {
+            "ids": [["c1"]], "documents": [["text"]],
+            "metadatas": [[{"doc_id": "d1", "filename": "f.pdf", "chunk_index": 0, "total_chunks": 1}]],
+            "distances": [[0.1]],
+        }
+        mock_collection.return_value = collection
+        mock_bm25.search.return_value = []
+        mock_reranker.rerank.side_effect = lambda q, candidates, top_k: candidates[:top_k]
+        mock_stream.return_value = _async_gen(["response"])
+
+        before = metrics_service.SPECULATIVE_RETRIEVALS.value(outcome="used")
+
+        history = [{"role": "user", "content": "Tell me about solar panels"}]
+        _run_async(generate_rag_response(query, history))
+
+        calls = mock_embed.call_args_list + mock_search_embed.call_args_list
+        embedded = [text for call in calls for text in call[0][0]]
+        self.assertEqual(embedded.count(query), 1)
+        self.assertEqual(
+            metrics_service.SPECULATIVE_RETRIEVALS.value(outcome="used"), before + 1
+        )
+
+
 class TestRetrievalServiceQueryEmbedding(unittest.TestCase):
     """Tests for query_embedding parameter in search_documents."""
 
@@ -285,6 +420,45 @@ class TestRetrievalServiceQueryEmbedding(unittest.TestCase):
 
         mock_embed.assert_called_once_with(["test query"])
 
+    @patch("services.retrieval_service._expand_parents", side_effect=lambda x: x)
+    @patch("services.retrieval_service.reranker_service")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.embedding_service.generate_embeddings")
+    def test_reuses_embedding_context_vector(
+        self, mock_context_embed, mock_embed, mock_collection, mock_bm25,
+        mock_reranker, mock_parents
+    ):
+        """A query vector already in the request's EmbeddingContext is reused."""
+        from services.embedding_service import EmbeddingContext
+        from services.retrieval_service import search_documents
+
+        mock_context_embed.return_value = [[0.3] * 1024]
+        embeddings = EmbeddingContext()
+        embeddings.embed(["test query"])
+        collection = MagicMock()
+        collection.query.return_value = {
+            "ids": [["chunk1"]],
+            "documents": [["text"]],
+            "metadatas": [[{"doc_id": "d1", "filename": "f.pdf", "chunk_index": 0, "total_chunks": 1}]],
+            "distances": [[0.1]],
+        }
+        mock_collection.return_value = collection
+        mock_bm25.search.return_value = []
+        mock_reranker.rerank.return_value = [{
+            "text": "text", "source_filename": "f.pdf", "source_doc_id": "d1",
+            "chunk_position": "1/1", "relevance_score": 0.9, "chunk_id": "chunk1",
+            "reranker_score": 0.9,
+        }]
+
+        search_documents("test query", embeddings=embeddings)
+
+        mock_embed.assert_not_called()
+        mock_context_embed.assert_called_once()
+        query_call = collection.query.call_args
+        self.assertEqual(query_call[1]["query_embeddings"], [[0.3] * 1024])
+
 
 async def _async_gen(items):
     """Create an async generator yielding items."""
@@ -0,0 +1,48 @@
+"""Tests for the reranker latency model behind adaptive candidate sizing."""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services import rerank_latency_service
+
+
+def test_unobserved_scorer_keeps_default():
+    assert rerank_latency_service.fit_candidate_count("cross_encoder", 200, 60) == 60
+    assert rerank_latency_service.fit_candidate_count(
+        "cross_encoder", 200, 60, default=30
+    ) == 30
+
+
+@patch.object(rerank_latency_service, "RERANK_ADAPTIVE_HEADROOM", 1.0)
+def test_fits_largest_count_within_deadline():
+    rerank_latency_service.submitted(10)
+    rerank_latency_service.finished("cross_encoder", 10, 50.0)  # 5 ms per pair
+
+    assert rerank_latency_service.fit_candidate_count("cross_encoder", 200, 60) == 40
+    assert rerank_latency_service.fit_candidate_count("cross_encoder", 1000, 60) == 60
+
+
+@patch.object(rerank_latency_service, "RERANK_ADAPTIVE_HEADROOM", 1.0)
+@patch.object(rerank_latency_service, "RERANK_ADAPTIVE_MIN_CANDIDATES", 10)
+def test_queued_work_shrinks_count_to_floor():
+    rerank_latency_service.submitted(10)
+    rerank_latency_service.finished("cross_encoder", 10, 50.0)
+
+    rerank_latency_service.submitted(30)  # 150 ms of work ahead
+    assert rerank_latency_service.queue_wait_ms("cross_encoder") == 150.0
+    assert rerank_latency_service.fit_candidate_count("cross_encoder", 200, 60) == 10
+
+    rerank_latency_service.finished("cross_encoder", 30)  # released without timing
+    assert rerank_latency_service.queue_wait_ms("cross_encoder") == 0.0
+
+
+@patch.object(rerank_latency_service, "RERANK_LATENCY_EWMA_ALPHA", 0.5)
+def test_estimate_is_moving_average_per_scorer():
+    rerank_latency_service.finished("cross_encoder", 10, 100.0)
+    rerank_latency_service.finished("cross_encoder", 10, 200.0)
+
+    assert rerank_latency_service.per_pair_ms("cross_encoder") == 15.0
+    assert rerank_latency_service.per_pair_ms("late_interaction") is None
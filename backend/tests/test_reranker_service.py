@@ -15,9 +15,11 @@ def reset_reranker_module():
     import services.reranker_service as mod
     mod._reranker = None
     mod._reranker_status = "unavailable"
+    mod._pending_rebuilds.clear()
     yield
     mod._reranker = None
     mod._reranker_status = "unavailable"
+    mod._pending_rebuilds.clear()
 
 
 def test_status_unavailable_before_first_call():
@@ -125,3 +127,121 @@ def test_reranker_calls_compute_score_with_normalize(mock_reranker_cls):
     mock_instance.compute_score.assert_called_once()
     call_kwargs = mock_instance.compute_score.call_args
     assert call_kwargs[1]["normalize"] is True
+
+
+@patch("services.reranker_service._compute_scores_from_token_ids")
+@patch("services.reranker_service.chunk_artifact_service")
+@patch("services.reranker_service.FlagReranker")
+def test_rerank_uses_cached_token_ids(mock_reranker_cls, mock_store, mock_score_ids):
+    """When every candidate has cached token ids, text is not re-tokenized."""
+    import numpy as np
+
+    mock_instance = MagicMock()
+    mock_reranker_cls.return_value = mock_instance
+    mock_store.load_artifacts.return_value = [
+        np.array([1, 2], dtype=np.int32),
+        np.array([3, 4], dtype=np.int32),
+    ]
+    mock_score_ids.return_value = [0.2, 0.9]
+
+    from services.reranker_service import rerank
+    candidates = [
+        {"text": "a", "chunk_id": "doc1_chunk_0", "source_doc_id": "doc1"},
+        {"text": "b", "chunk_id": "doc1_chunk_1", "source_doc_id": "doc1"},
+    ]
+    results = rerank("test query", candidates, top_k=2)
+
+    mock_instance.compute_score.assert_not_called()
+    passed_ids = mock_score_ids.call_args[0][2]
+    assert [ids.tolist() for ids in passed_ids] == [[1, 2], [3, 4]]
+    assert results[0]["chunk_id"] == "doc1_chunk_1"
+
+
+@patch("services.reranker_service._rebuild_executor")
+@patch("services.reranker_service.chunk_artifact_service")
+@patch("services.reranker_service.FlagReranker")
+def test_missing_cache_falls_back_and_schedules_rebuild(
+    mock_reranker_cls, mock_store, mock_executor
+):
+    """Stale or missing caches score from text and rebuild in the background."""
+    mock_instance = MagicMock()
+    mock_instance.compute_score.return_value = [0.4]
+    mock_reranker_cls.return_value = mock_instance
+    mock_store.load_artifacts.return_value = None
+
+    from services.reranker_service import rerank, _rebuild_token_cache
+    candidates = [{"text": "a", "chunk_id": "doc1_chunk_0", "source_doc_id": "doc1"}]
+    rerank("test query", candidates, top_k=1)
+    rerank("test query", candidates, top_k=1)
+
+    assert mock_instance.compute_score.call_count == 2
+    # Only one rebuild queued while the first is pending
+    mock_executor.submit.assert_called_once_with(_rebuild_token_cache, "doc1")
+
+
+@patch("services.reranker_service.chunk_artifact_service")
+@patch("services.reranker_service._get_tokenizer")
+def test_build_token_cache_stores_int32_ids(mock_get_tokenizer, mock_store):
+    """Ingest-time tokenization stores int32 arrays tagged with the model."""
+    import numpy as np
+    from config import RERANKER_MODEL
+
+    tokenizer = MagicMock(return_value={"input_ids": [[10, 11, 12], [13]]})
+    mock_get_tokenizer.return_value = tokenizer
+
+    from services.reranker_service import build_token_cache, TOKEN_CACHE_KIND
+    build_token_cache("doc1", ["chunk one", "chunk two"])
+
+    kind, doc_id, arrays, model = mock_store.save_artifacts.call_args[0]
+    assert (kind, doc_id, model) == (TOKEN_CACHE_KIND, "doc1", RERANKER_MODEL)
+    assert all(array.dtype == np.int32 for array in arrays)
+    assert tokenizer.call_args[1]["add_special_tokens"] is False
+
+
+@patch("services.reranker_service.FlagReranker")
+def test_rerank_batch_scores_all_pairs_in_one_call(mock_reranker_cls):
+    mock_instance = MagicMock()
+    mock_instance.compute_score.return_value = [0.1, 0.9, 0.8, 0.2]
+    mock_reranker_cls.return_value = mock_instance
+
+    from services.reranker_service import rerank_batch
+    results = rerank_batch(
+        ["q1", "q2"],
+        [[{"text": "a"}, {"text": "b"}], [{"text": "c"}, {"text": "d"}]],
+        top_k=1,
+    )
+
+    mock_instance.compute_score.assert_called_once()
+    pairs = mock_instance.compute_score.call_args[0][0]
+    assert pairs == [["q1", "a"], ["q1", "b"], ["q2", "c"], ["q2", "d"]]
+    assert [r[0]["text"] for r in results] == ["b", "c"]
+
+
+def test_token_id_scoring_runs_model_once_per_slice():
+    """Large batched searches are scored in RERANKER_BATCH_SIZE slices."""
+    import numpy as np
+    from services.reranker_service import _compute_scores_from_token_ids
+
+    reranker = MagicMock()
+    reranker.tokenizer.return_value = {"input_ids": [1, 2]}
+    reranker.tokenizer.prepare_for_model.side_effect = lambda q, p, **kw: {"input_ids": q + p}
+    reranker.tokenizer.pad.side_effect = lambda features, **kw: MagicMock(
+        to=lambda device: {"size": len(features)}
+    )
+
+    def forward(size, return_dict):
+        output = MagicMock()
+        output.logits.view.return_value.float.return_value.cpu.return_value.numpy.return_value = (
+            np.zeros(size, dtype=np.float32)
+        )
+        return output
+
+    reranker.model.side_effect = forward
+    passages = [np.array([7, 8], dtype=np.int32)] * 5
+
+    with patch.dict(sys.modules, {"torch": MagicMock()}), \
+            patch("services.reranker_service.RERANKER_BATCH_SIZE", 2):
+        scores = _compute_scores_from_token_ids(reranker, "query", passages)
+
+    assert [call.kwargs["size"] for call in reranker.model.call_args_list] == [2, 2, 1]
+    assert scores == pytest.approx([0.5] * 5)
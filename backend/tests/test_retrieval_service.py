@@ -5,6 +5,9 @@ Mocks all dependent services: reranker_service, bm25_index_service,
 embedding_service, vector_service.
 """
 
+import asyncio
+import threading
+import time
 import unittest
 from unittest.mock import patch, MagicMock
 from concurrent.futures import TimeoutError as FuturesTimeoutError
@@ -345,5 +348,835 @@ class TestSearchDocuments(unittest.TestCase):
         self.assertLessEqual(len(results), RERANK_OUTPUT_SIZE)
 
 
+class TestCollapseToParents(unittest.TestCase):
+    """Test parent-aware candidate collapse before reranking."""
+
+    def test_siblings_collapse_to_best_child(self):
+        """Children sharing a parent keep only the first (best-ranked) child."""
+        from services.retrieval_service import _collapse_to_parents
+
+        candidates = [
+            {"chunk_id": "doc1_chunk_1", "source_doc_id": "doc1", "parent_chunk_index": 0},
+            {"chunk_id": "doc1_chunk_0", "source_doc_id": "doc1", "parent_chunk_index": 0},
+            {"chunk_id": "doc1_chunk_5", "source_doc_id": "doc1", "parent_chunk_index": 2},
+        ]
+        collapsed = _collapse_to_parents(candidates, limit=10)
+        self.assertEqual(
+            [c["chunk_id"] for c in collapsed], ["doc1_chunk_1", "doc1_chunk_5"]
+        )
+
+    def test_same_parent_index_in_different_docs_kept(self):
+        """Parent indices are scoped per document."""
+        from services.retrieval_service import _collapse_to_parents
+
+        candidates = [
+            {"chunk_id": "doc1_chunk_0", "source_doc_id": "doc1", "parent_chunk_index": 0},
+            {"chunk_id": "doc2_chunk_0", "source_doc_id": "doc2", "parent_chunk_index": 0},
+        ]
+        self.assertEqual(len(_collapse_to_parents(candidates, limit=10)), 2)
+
+    def test_legacy_chunks_without_parent_are_kept(self):
+        """Chunks without parent metadata are treated as their own parent."""
+        from services.retrieval_service import _collapse_to_parents
+
+        candidates = [
+            {"chunk_id": "doc1_chunk_0", "source_doc_id": "doc1"},
+            {"chunk_id": "doc1_chunk_1", "source_doc_id": "doc1", "parent_chunk_index": None},
+        ]
+        self.assertEqual(len(_collapse_to_parents(candidates, limit=10)), 2)
+
+    def test_limit_counts_distinct_parents(self):
+        """Output is capped at limit distinct parents."""
+        from services.retrieval_service import _collapse_to_parents
+
+        candidates = [
+            {"chunk_id": f"doc1_chunk_{i}", "source_doc_id": "doc1",
+             "parent_chunk_index": i // 2}
+            for i in range(10)
+        ]
+        collapsed = _collapse_to_parents(candidates, limit=3)
+        self.assertEqual(len(collapsed), 3)
+        self.assertEqual(
+            [c["parent_chunk_index"] for c in collapsed], [0, 1, 2]
+        )
+
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_reranker_receives_one_candidate_per_parent(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection
+    ):
+        """search_documents over-fetches dense results and reranks distinct parents."""
+        from services.retrieval_service import search_documents
+        from config import RERANKER_CANDIDATE_COUNT, PARENT_OVERFETCH_FACTOR
+
+        mock_embed.return_value = [[0.1] * 768]
+
+        # Three children per parent
+        chroma_results = _mock_chroma_results([
+            (f"doc1_chunk_{i}", f"text {i}", "doc1", "test.pdf", i, 9, 0.1 * i)
+            for i in range(9)
+        ])
+        for i, metadata in enumerate(chroma_results["metadatas"][0]):
+            metadata["parent_chunk_index"] = i // 3
+            metadata["parent_text"] = f"parent {i // 3}"
+        collection = MagicMock()
+        collection.query.return_value = chroma_results
+        mock_collection.return_value = collection
+
+        mock_bm25.search.return_value = []
+        mock_reranker.rerank.side_effect = (
+            lambda query, candidates, top_k: candidates[:top_k]
+        )
+
+        results = search_documents("test query")
+
+        self.assertEqual(
+            collection.query.call_args[1]["n_results"],
+            RERANKER_CANDIDATE_COUNT * PARENT_OVERFETCH_FACTOR,
+        )
+        reranked_candidates = mock_reranker.rerank.call_args[0][1]
+        self.assertEqual(
+            [c["chunk_id"] for c in reranked_candidates],
+            ["doc1_chunk_0", "doc1_chunk_3", "doc1_chunk_6"],
+        )
+        self.assertEqual(len(results), 3)
+
+
+class TestRerankStrategy(unittest.TestCase):
+    """RERANK_STRATEGY selects the rerank stage implementation."""
+
+    @patch("services.retrieval_service.RERANK_STRATEGY", "late_interaction")
+    @patch("services.retrieval_service.late_interaction_service")
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_late_interaction_strategy_replaces_cross_encoder(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection, mock_late
+    ):
+        from services.retrieval_service import search_documents
+
+        mock_embed.return_value = [[0.1] * 768]
+        collection = MagicMock()
+        collection.query.return_value = _mock_chroma_results([
+            ("doc1_chunk_0", "text A", "doc1", "test.pdf", 0, 5, 0.1),
+        ])
+        mock_collection.return_value = collection
+        mock_bm25.search.return_value = []
+        mock_late.rerank.side_effect = (
+            lambda query, candidates, top_k: candidates[:top_k]
+        )
+
+        results = search_documents("test query")
+
+        mock_late.rerank.assert_called_once()
+        mock_reranker.rerank.assert_not_called()
+        self.assertEqual(results[0]["retrieval_method"], "reranked")
+
+
+def _cascade_collection(count):
+    """Mock collection returning `count` dense hits and stored embeddings.
+
+    Chunk i's stored embedding grows more similar to the query as i
+    increases, so the first pass reverses RRF order.
+    """
+    collection = MagicMock()
+    collection.query.return_value = _mock_chroma_results([
+        (f"doc1_chunk_{i}", f"text {i}", "doc1", "test.pdf", i, count, 0.01 * i)
+        for i in range(count)
+    ])
+
+    def _get(ids, include):
+        return {
+            "ids": ids,
+            "embeddings": [
+                [1.0, float(count - int(chunk_id.rsplit("_", 1)[1]))]
+                for chunk_id in ids
+            ],
+        }
+    collection.get.side_effect = _get
+    return collection
+
+
+@patch("services.retrieval_service.RERANK_CASCADE_ENABLED", True)
+@patch("services.retrieval_service.CASCADE_FIRST_STAGE", "embedding")
+@patch("services.retrieval_service.CASCADE_FIRST_STAGE_SIZE", 4)
+class TestRerankCascade(unittest.TestCase):
+    """Two-stage cascade: cheap first pass, then cross-encoder."""
+
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_cross_encoder_sees_only_first_pass_survivors(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection
+    ):
+        from services.retrieval_service import search_documents
+
+        mock_embed.return_value = [[1.0, 0.0]]
+        mock_collection.return_value = _cascade_collection(10)
+        mock_bm25.search.return_value = []
+        mock_reranker.rerank.side_effect = (
+            lambda query, candidates, top_k: candidates[:top_k]
+        )
+
+        results = search_documents("test query")
+
+        reranked_candidates = mock_reranker.rerank.call_args[0][1]
+        self.assertEqual(len(reranked_candidates), 4)
+        # Closest stored embeddings are the highest chunk indices
+        self.assertEqual(reranked_candidates[0]["chunk_id"], "doc1_chunk_9")
+        self.assertTrue(all(r["retrieval_method"] == "reranked" for r in results))
+        self.assertIsNotNone(results[0]["first_pass_score"])
+
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_cross_encoder_failure_keeps_first_pass_order(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection
+    ):
+        from services.retrieval_service import search_documents
+
+        mock_embed.return_value = [[1.0, 0.0]]
+        mock_collection.return_value = _cascade_collection(10)
+        mock_bm25.search.return_value = []
+        mock_reranker.rerank.side_effect = Exception("model crashed")
+
+        results = search_documents("test query")
+
+        self.assertEqual(results[0]["chunk_id"], "doc1_chunk_9")
+        self.assertTrue(all(r["retrieval_method"] == "first_pass" for r in results))
+
+    @patch("services.retrieval_service._score_by_embedding",
+           side_effect=Exception("chroma down"))
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_first_pass_failure_trims_by_rrf_order(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection, mock_score
+    ):
+        from services.retrieval_service import search_documents
+
+        mock_embed.return_value = [[1.0, 0.0]]
+        mock_collection.return_value = _cascade_collection(10)
+        mock_bm25.search.return_value = []
+        mock_reranker.rerank.side_effect = Exception("model crashed")
+
+        results = search_documents("test query")
+
+        self.assertEqual(results[0]["chunk_id"], "doc1_chunk_0")
+        self.assertTrue(all(r["retrieval_method"] == "rrf_only" for r in results))
+
+
+class TestConcurrentRetrieval(unittest.TestCase):
+    """Dense and BM25 branches run concurrently with independent timeouts."""
+
+    def _collection(self):
+        collection = MagicMock()
+        collection.query.return_value = _mock_chroma_results([
+            ("doc1_chunk_0", "text A", "doc1", "test.pdf", 0, 5, 0.1),
+        ])
+        collection.get.return_value = {
+            "ids": ["doc1_chunk_1"],
+            "documents": ["text B"],
+            "metadatas": [{"doc_id": "doc1", "filename": "test.pdf",
+                           "chunk_index": 1, "total_chunks": 5}],
+        }
+        return collection
+
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_bm25_starts_before_embedding_finishes(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection
+    ):
+        """Embedding blocks until BM25 has run: only possible if concurrent."""
+        from services.retrieval_service import search_documents
+
+        bm25_started = threading.Event()
+
+        def _bm25_search(query, top_k, doc_ids):
+            bm25_started.set()
+            return [{"chunk_id": "doc1_chunk_0", "bm25_score": 1.0}]
+
+        def _embed(texts):
+            self.assertTrue(bm25_started.wait(timeout=2))
+            return [[0.1] * 768]
+
+        mock_bm25.search.side_effect = _bm25_search
+        mock_embed.side_effect = _embed
+        mock_collection.return_value = self._collection()
+        mock_reranker.rerank.side_effect = (
+            lambda query, candidates, top_k: candidates[:top_k]
+        )
+
+        results = search_documents("test query", doc_ids=["doc1"])
+
+        self.assertEqual(results[0]["chunk_id"], "doc1_chunk_0")
+        self.assertEqual(mock_bm25.search.call_args[0][2], ["doc1"])
+
+    @patch("services.retrieval_service.DENSE_TIMEOUT_MS", 50)
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_slow_dense_branch_falls_back_to_bm25_only(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection
+    ):
+        from services.retrieval_service import search_documents
+
+        def _slow_embed(texts):
+            time.sleep(0.3)
+            return [[0.1] * 768]
+
+        mock_embed.side_effect = _slow_embed
+        mock_bm25.search.return_value = [
+            {"chunk_id": "doc1_chunk_1", "bm25_score": 1.0},
+        ]
+        mock_collection.return_value = self._collection()
+        mock_reranker.rerank.side_effect = (
+            lambda query, candidates, top_k: candidates[:top_k]
+        )
+
+        started = time.monotonic()
+        results = search_documents("test query")
+
+        self.assertLess(time.monotonic() - started, 0.25)
+        self.assertEqual([r["chunk_id"] for r in results], ["doc1_chunk_1"])
+        self.assertIsNone(results[0]["dense_rank"])
+
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_bm25_failure_falls_back_to_dense_only(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection
+    ):
+        from services.retrieval_service import search_documents
+
+        mock_embed.return_value = [[0.1] * 768]
+        mock_bm25.search.side_effect = Exception("index corrupt")
+        mock_collection.return_value = self._collection()
+        mock_reranker.rerank.side_effect = (
+            lambda query, candidates, top_k: candidates[:top_k]
+        )
+
+        results = search_documents("test query")
+
+        self.assertEqual([r["chunk_id"] for r in results], ["doc1_chunk_0"])
+
+
+class TestAsyncSearch(unittest.TestCase):
+    """asearch_documents keeps the event loop free while it waits."""
+
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_event_loop_not_blocked_during_search(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection
+    ):
+        from services.retrieval_service import asearch_documents
+
+        def _slow_embed(texts):
+            time.sleep(0.2)
+            return [[0.1] * 768]
+
+        mock_embed.side_effect = _slow_embed
+        mock_bm25.search.return_value = []
+        collection = MagicMock()
+        collection.query.return_value = _mock_chroma_results([
+            ("doc1_chunk_0", "text A", "doc1", "test.pdf", 0, 5, 0.1),
+        ])
+        mock_collection.return_value = collection
+        mock_reranker.rerank.side_effect = (
+            lambda query, candidates, top_k: candidates[:top_k]
+        )
+
+        async def _run():
+            ticks = 0
+
+            async def _ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticker = asyncio.ensure_future(_ticker())
+            results = await asearch_documents("test query")
+            ticker.cancel()
+            return results, ticks
+
+        results, ticks = asyncio.new_event_loop().run_until_complete(_run())
+
+        self.assertEqual(results[0]["chunk_id"], "doc1_chunk_0")
+        self.assertGreater(ticks, 5)
+
+
+def _batch_collection():
+    """Collection whose query() returns one row per query vector."""
+    def _query(query_embeddings, n_results, where, include):
+        rows = [
+            _mock_chroma_results([
+                (f"doc{i}_chunk_0", f"text {i}", f"doc{i}", "test.pdf", 0, 1, 0.1),
+            ])
+            for i in range(len(query_embeddings))
+        ]
+        return {key: [row[key][0] for row in rows] for key in rows[0]}
+
+    collection = MagicMock()
+    collection.query.side_effect = _query
+    return collection
+
+
+class TestBatchSearch(unittest.TestCase):
+    """asearch_documents_batch shares embedding, retrieval and rerank passes."""
+
+    def _run(self, *args):
+        from services.retrieval_service import asearch_documents_batch
+        return asyncio.new_event_loop().run_until_complete(asearch_documents_batch(*args))
+
+    @patch("services.retrieval_service._expand_parents", side_effect=lambda x: x)
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_one_embed_and_one_rerank_call(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection, mock_expand
+    ):
+        mock_embed.return_value = [[0.1] * 768, [0.2] * 768, [0.3] * 768]
+        mock_bm25.search.return_value = []
+        mock_collection.return_value = _batch_collection()
+        mock_reranker.rerank_batch.side_effect = (
+            lambda queries, candidate_lists, top_k: [c[:top_k] for c in candidate_lists]
+        )
+
+        results = self._run(["q0", "q1", "q2"])
+
+        mock_embed.assert_called_once_with(["q0", "q1", "q2"])
+        mock_reranker.rerank_batch.assert_called_once()
+        mock_collection.return_value.query.assert_called_once()
+        self.assertEqual(
+            [r[0]["chunk_id"] for r in results],
+            ["doc0_chunk_0", "doc1_chunk_0", "doc2_chunk_0"],
+        )
+        self.assertTrue(all(r[0]["retrieval_method"] == "reranked" for r in results))
+
+    @patch("services.retrieval_service._expand_parents", side_effect=lambda x: x)
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_dense_grouped_by_doc_filter(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection, mock_expand
+    ):
+        mock_embed.return_value = [[0.1] * 768] * 3
+        mock_bm25.search.return_value = []
+        mock_collection.return_value = _batch_collection()
+        mock_reranker.rerank_batch.side_effect = (
+            lambda queries, candidate_lists, top_k: [c[:top_k] for c in candidate_lists]
+        )
+
+        self._run(["q0", "q1", "q2"], [["a", "b"], None, ["b", "a"]])
+
+        calls = mock_collection.return_value.query.call_args_list
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(
+            sorted(len(call.kwargs["query_embeddings"]) for call in calls), [1, 2]
+        )
+        bm25_filters = [call.args[2] for call in mock_bm25.search.call_args_list]
+        self.assertEqual(bm25_filters, [["a", "b"], None, ["b", "a"]])
+
+    @patch("services.retrieval_service._expand_parents", side_effect=lambda x: x)
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_rerank_failure_falls_back_for_every_query(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection, mock_expand
+    ):
+        mock_embed.return_value = [[0.1] * 768] * 2
+        mock_bm25.search.return_value = []
+        mock_collection.return_value = _batch_collection()
+        mock_reranker.rerank_batch.side_effect = Exception("model crashed")
+
+        results = self._run(["q0", "q1"])
+
+        self.assertEqual(
+            [r[0]["retrieval_method"] for r in results], ["rrf_only", "rrf_only"]
+        )
+
+
+class TestProgressiveSearch(unittest.TestCase):
+    """astream_search yields the fused ranking before the reranked one."""
+
+    def _collect(self, *args, **kwargs):
+        from services.retrieval_service import astream_search
+
+        async def _run():
+            return [item async for item in astream_search(*args, **kwargs)]
+        return asyncio.new_event_loop().run_until_complete(_run())
+
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_fused_then_reranked(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection
+    ):
+        collection = MagicMock()
+        results = _mock_chroma_results([
+            ("doc1_chunk_0", "child A", "doc1", "test.pdf", 0, 2, 0.1),
+            ("doc1_chunk_1", "child B", "doc1", "test.pdf", 1, 2, 0.2),
+        ])
+        results["metadatas"][0][0]["parent_text"] = "parent A"
+        results["metadatas"][0][0]["parent_chunk_index"] = 0
+        collection.query.return_value = results
+        mock_collection.return_value = collection
+        mock_embed.return_value = [[0.1] * 768]
+        mock_bm25.search.return_value = []
+
+        scored_texts = []
+
+        def _rerank(query, candidates, top_k):
+            scored_texts.extend(c["text"] for c in candidates)
+            return list(reversed(candidates))[:top_k]
+
+        mock_reranker.rerank.side_effect = _rerank
+
+        events = self._collect("test query")
+
+        self.assertEqual([final for _, final in events], [False, True])
+        preview, final = events[0][0], events[1][0]
+        self.assertEqual([r["retrieval_method"] for r in preview], ["rrf_only"] * 2)
+        self.assertEqual(preview[0]["text"], "parent A")
+        # Preview parent expansion must not leak into reranker input
+        self.assertEqual(scored_texts, ["child A", "child B"])
+        self.assertEqual(final[0]["chunk_id"], "doc1_chunk_1")
+        self.assertEqual(final[0]["retrieval_method"], "reranked")
+
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_no_candidates_yields_single_final(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection
+    ):
+        collection = MagicMock()
+        collection.query.return_value = {
+            "ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]],
+        }
+        mock_collection.return_value = collection
+        mock_embed.return_value = [[0.1] * 768]
+        mock_bm25.search.return_value = []
+
+        self.assertEqual(self._collect("test query"), [([], True)])
+        mock_reranker.rerank.assert_not_called()
+
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_rerank_disabled_yields_single_final(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection
+    ):
+        from services.retrieval_service import resolve_retrieval_options
+
+        collection = MagicMock()
+        collection.query.return_value = _mock_chroma_results([
+            ("doc1_chunk_0", "child A", "doc1", "test.pdf", 0, 2, 0.1),
+        ])
+        mock_collection.return_value = collection
+        mock_embed.return_value = [[0.1] * 768]
+        mock_bm25.search.return_value = []
+
+        events = self._collect("test query", options=resolve_retrieval_options(rerank=False))
+
+        self.assertEqual([final for _, final in events], [True])
+        self.assertEqual(events[0][0][0]["retrieval_method"], "rrf_only")
+        mock_reranker.rerank.assert_not_called()
+
+
+class TestRetrievalProfiles(unittest.TestCase):
+    """Named latency-budget profiles and per-request overrides."""
+
+    def test_precedence_override_profile_config(self):
+        from services.retrieval_service import resolve_retrieval_options
+        from config import RERANKER_CANDIDATE_COUNT, RETRIEVAL_PROFILES
+
+        balanced = resolve_retrieval_options()
+        self.assertEqual(balanced.profile, "balanced")
+        self.assertEqual(balanced.candidate_count, RERANKER_CANDIDATE_COUNT)
+        self.assertIsNone(balanced.rewrite)
+
+        fast = resolve_retrieval_options("fast", top_k=3, candidate_count=None)
+        self.assertEqual(fast.candidate_count, RETRIEVAL_PROFILES["fast"]["candidate_count"])
+        self.assertEqual(fast.top_k, 3)
+
+        overridden = resolve_retrieval_options("fast", rerank=True)
+        self.assertTrue(overridden.rerank)
+        self.assertNotEqual(overridden.cache_fingerprint(), fast.cache_fingerprint())
+
+    def test_unknown_override_raises_value_error(self):
+        from services.retrieval_service import resolve_retrieval_options
+
+        with self.assertRaises(ValueError):
+            resolve_retrieval_options(candidate_cout=50)
+
+    def test_unknown_profile_rejected(self):
+        from services.retrieval_service import resolve_retrieval_options
+
+        with self.assertRaises(ValueError):
+            resolve_retrieval_options("turbo")
+
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_rerank_off_returns_fused_order(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection
+    ):
+        from services.retrieval_service import search_documents, resolve_retrieval_options
+
+        mock_embed.return_value = [[0.1] * 768]
+        collection = MagicMock()
+        collection.query.return_value = _mock_chroma_results([
+            (f"doc1_chunk_{i}", f"text {i}", "doc1", "test.pdf", i, 10, 0.1 * i)
+            for i in range(10)
+        ])
+        mock_collection.return_value = collection
+        mock_bm25.search.return_value = []
+
+        options = resolve_retrieval_options("fast", bm25_top_k=7)
+        results = search_documents("test query", top_k=2, options=options)
+
+        mock_reranker.rerank.assert_not_called()
+        self.assertEqual(mock_bm25.search.call_args[0][1], 7)
+        self.assertEqual(collection.query.call_args[1]["n_results"], 10 * 3)
+        self.assertEqual([r["chunk_id"] for r in results], ["doc1_chunk_0", "doc1_chunk_1"])
+        self.assertTrue(all(r["retrieval_method"] == "rrf_only" for r in results))
+
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_top_k_argument_honoured(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection
+    ):
+        from services.retrieval_service import search_documents
+
+        mock_embed.return_value = [[0.1] * 768]
+        collection = MagicMock()
+        collection.query.return_value = _mock_chroma_results([
+            (f"doc1_chunk_{i}", f"text {i}", "doc1", "test.pdf", i, 10, 0.1 * i)
+            for i in range(10)
+        ])
+        mock_collection.return_value = collection
+        mock_bm25.search.return_value = []
+        mock_reranker.rerank.side_effect = lambda query, candidates, top_k: candidates[:top_k]
+
+        results = search_documents("test query", top_k=8)
+
+        self.assertEqual(mock_reranker.rerank.call_args[0][2], 8)
+        self.assertEqual(len(results), 8)
+
+
+@patch("services.retrieval_service.RERANK_ADAPTIVE_ENABLED", True)
+class TestAdaptiveCandidates(unittest.TestCase):
+    """Candidate count follows the observed reranker latency."""
+
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_slow_reranker_gets_fewer_candidates(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection
+    ):
+        from services import rerank_latency_service
+        from services.retrieval_service import search_documents
+
+        # 10 ms per pair: 200 ms deadline * 0.8 headroom fits 16
+        rerank_latency_service.finished("cross_encoder", 10, 100.0)
+
+        mock_embed.return_value = [[0.1] * 768]
+        collection = MagicMock()
+        collection.query.return_value = _mock_chroma_results([
+            (f"doc1_chunk_{i}", f"text {i}", "doc1", "test.pdf", i, 40, 0.01 * i)
+            for i in range(40)
+        ])
+        mock_collection.return_value = collection
+        mock_bm25.search.return_value = []
+        mock_reranker.rerank.side_effect = lambda query, candidates, top_k: candidates[:top_k]
+
+        results = search_documents("test query")
+
+        self.assertEqual(len(mock_reranker.rerank.call_args[0][1]), 16)
+        self.assertTrue(all(r["rerank_candidates"] == 16 for r in results))
+
+    @patch("services.retrieval_service.reranker_service")
+    def test_call_that_loads_model_is_not_timed(self, mock_reranker):
+        from services import rerank_latency_service
+        from services.retrieval_service import _run_rerank
+
+        loop = asyncio.new_event_loop()
+        try:
+            mock_reranker.get_reranker_status.return_value = "unavailable"
+            loop.run_until_complete(_run_rerank("cross_encoder", 1000, 10, lambda: None))
+            self.assertIsNone(rerank_latency_service.per_pair_ms("cross_encoder"))
+
+            mock_reranker.get_reranker_status.return_value = "ready"
+            loop.run_until_complete(_run_rerank("cross_encoder", 1000, 10, lambda: None))
+            self.assertIsNotNone(rerank_latency_service.per_pair_ms("cross_encoder"))
+        finally:
+            loop.close()
+
+
+class TestRerankGate(unittest.TestCase):
+    """A gated search submits no rerank work until the gate opens."""
+
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_cancelled_before_gate_never_reranks(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection
+    ):
+        from services.retrieval_service import asearch_documents
+
+        mock_embed.return_value = [[0.1] * 768]
+        collection = MagicMock()
+        collection.query.return_value = _mock_chroma_results([
+            (f"doc1_chunk_{i}", f"text {i}", "doc1", "test.pdf", i, 5, 0.01 * i)
+            for i in range(5)
+        ])
+        mock_collection.return_value = collection
+        mock_bm25.search.return_value = []
+
+        async def scenario():
+            gate = asyncio.Event()
+            task = asyncio.create_task(asearch_documents("test query", rerank_gate=gate))
+            while not collection.query.called:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.wait({task})
+            return task
+
+        loop = asyncio.new_event_loop()
+        try:
+            task = loop.run_until_complete(scenario())
+        finally:
+            loop.close()
+
+        self.assertTrue(task.cancelled())
+        mock_reranker.rerank.assert_not_called()
+        mock_reranker.rerank_batch.assert_not_called()
+
+
+class TestRerankEarlyExit(unittest.TestCase):
+    """Decisive fusions skip the reranker."""
+
+    def _candidates(self, *ranks_and_scores):
+        return [
+            {"chunk_id": f"doc1_chunk_{i}", "dense_rank": dense, "bm25_rank": bm25,
+             "fused_score": score}
+            for i, (dense, bm25, score) in enumerate(ranks_and_scores)
+        ]
+
+    def test_reasons(self):
+        from services.retrieval_service import _early_exit_reason
+
+        decisive = self._candidates((1, 1, 2 / 61), (2, None, 1 / 62), (None, 2, 1 / 62))
+        self.assertEqual(_early_exit_reason(decisive, 3), "decisive")
+        # Runner-up second in both lists: too close to call
+        close = self._candidates((1, 1, 2 / 61), (2, 2, 2 / 62), (3, None, 1 / 63))
+        self.assertIsNone(_early_exit_reason(close, 3))
+        # Top hit not first in BM25
+        split = self._candidates((1, 2, 1.9 / 61), (None, 1, 1 / 61), (2, None, 1 / 62))
+        self.assertIsNone(_early_exit_reason(split, 3))
+        self.assertEqual(_early_exit_reason(close, 5), "few_candidates")
+
+    @patch("services.retrieval_service._expand_parents", side_effect=lambda x: x)
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_skip_recorded_in_method_and_counter(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection, mock_expand
+    ):
+        from services import metrics_service
+        from services.retrieval_service import search_documents, resolve_retrieval_options
+
+        mock_embed.return_value = [[0.1] * 768]
+        collection = MagicMock()
+        collection.query.return_value = _mock_chroma_results([
+            (f"doc1_chunk_{i}", f"text {i}", "doc1", "test.pdf", i, 10, 0.1 * i)
+            for i in range(10)
+        ])
+        mock_collection.return_value = collection
+        mock_bm25.search.return_value = [{"chunk_id": "doc1_chunk_0", "bm25_score": 9.0}]
+        before = metrics_service.RERANK_EARLY_EXITS.value(reason="decisive")
+
+        results = search_documents(
+            "ERR-4012", options=resolve_retrieval_options(early_exit=True)
+        )
+
+        mock_reranker.rerank.assert_not_called()
+        self.assertEqual(results[0]["chunk_id"], "doc1_chunk_0")
+        self.assertTrue(all(r["retrieval_method"] == "rerank_skipped" for r in results))
+        self.assertEqual(
+            metrics_service.RERANK_EARLY_EXITS.value(reason="decisive"), before + 1
+        )
+
+
+class TestMMRDiversification(unittest.TestCase):
+    """MMR drops near-duplicate results after reranking."""
+
+    @patch("services.retrieval_service._expand_parents", side_effect=lambda x: x)
+    @patch("services.retrieval_service.get_collection")
+    @patch("services.retrieval_service.generate_embeddings")
+    @patch("services.retrieval_service.bm25_index_service")
+    @patch("services.retrieval_service.reranker_service")
+    def test_near_duplicates_dropped_and_tokens_counted(
+        self, mock_reranker, mock_bm25, mock_embed, mock_collection, mock_expand
+    ):
+        from services import metrics_service
+        from services.retrieval_service import search_documents, resolve_retrieval_options
+
+        mock_embed.return_value = [[0.1] * 768]
+        collection = MagicMock()
+        collection.query.return_value = _mock_chroma_results([
+            (f"doc1_chunk_{i}", "x" * 400, "doc1", "test.pdf", i, 3, 0.1 * i)
+            for i in range(3)
+        ])
+        # Chunk 1 repeats chunk 0; chunk 2 is unrelated
+        vectors = {"doc1_chunk_0": [1.0, 0.0], "doc1_chunk_1": [0.99, 0.05],
+                   "doc1_chunk_2": [0.0, 1.0]}
+        collection.get.side_effect = lambda ids, include: {
+            "ids": ids, "embeddings": [vectors[i] for i in ids],
+        }
+        mock_collection.return_value = collection
+        mock_bm25.search.return_value = []
+        mock_reranker.rerank.side_effect = lambda query, candidates, top_k: candidates[:top_k]
+        saved_before = metrics_service.MMR_TOKENS_SAVED.count()
+
+        results = search_documents(
+            "test query", options=resolve_retrieval_options(mmr=True)
+        )
+
+        self.assertEqual([r["chunk_id"] for r in results], ["doc1_chunk_0", "doc1_chunk_2"])
+        self.assertEqual(metrics_service.MMR_TOKENS_SAVED.count(), saved_before + 1)
+
+    def test_disabled_by_default(self):
+        from services.retrieval_service import resolve_retrieval_options
+
+        self.assertFalse(resolve_retrieval_options().mmr)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,135 @@
+"""Tests for the generation-versioned search result cache."""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services import search_cache_service
+from services.index_generation_service import bump_generation, current_generation
+
+
+def _results(text="chunk text"):
+    return [{"text": text, "chunk_id": "doc1_chunk_0", "retrieval_method": "reranked"}]
+
+
+def test_key_normalizes_query_and_doc_filter():
+    key_a = search_cache_service.make_key("  What is  RAG? ", ["b", "a"])
+    key_b = search_cache_service.make_key("what is rag?", ["a", "b"])
+    assert key_a == key_b
+    assert key_a != search_cache_service.make_key("what is rag?", None)
+
+
+def test_hit_returns_independent_copy():
+    key = search_cache_service.make_key("query", None)
+    search_cache_service.put(key, current_generation(), _results())
+
+    first = search_cache_service.get(key)
+    first[0]["text"] = "mutated by caller"
+
+    assert search_cache_service.get(key)[0]["text"] == "chunk text"
+
+
+def test_generation_bump_invalidates_entry():
+    key = search_cache_service.make_key("query", None)
+    search_cache_service.put(key, current_generation(), _results())
+
+    bump_generation()
+
+    assert search_cache_service.get(key) is None
+    assert search_cache_service.get_cache_stats()["entries"] == 0
+
+
+def test_put_from_older_generation_is_dropped():
+    """An ingest that lands mid-search must not be masked by its result."""
+    key = search_cache_service.make_key("query", None)
+    generation = current_generation()
+    bump_generation()
+
+    search_cache_service.put(key, generation, _results())
+
+    assert search_cache_service.get(key) is None
+
+
+def test_evicts_least_recently_used():
+    with patch.object(search_cache_service, "SEARCH_CACHE_MAX_ENTRIES", 2):
+        keys = [search_cache_service.make_key(f"query {i}", None) for i in range(3)]
+        search_cache_service.put(keys[0], current_generation(), _results())
+        search_cache_service.put(keys[1], current_generation(), _results())
+        search_cache_service.get(keys[0])  # touch
+        search_cache_service.put(keys[2], current_generation(), _results())
+
+    assert search_cache_service.get(keys[0]) is not None
+    assert search_cache_service.get(keys[1]) is None
+
+
+def test_stats_report_hit_rate():
+    key = search_cache_service.make_key("query", None)
+    hits = search_cache_service.CACHE_HITS.value()
+    search_cache_service.put(key, current_generation(), _results())
+    search_cache_service.get(key)
+
+    stats = search_cache_service.get_cache_stats()
+    assert stats["hits"] == hits + 1
+    assert stats["bytes"] > 0
+    assert 0 < stats["hit_rate"] <= 1
+
+
+def _mock_collection():
+    collection = MagicMock()
+    collection.query.return_value = {
+        "ids": [["doc1_chunk_0"]],
+        "documents": [["text A"]],
+        "metadatas": [[{"doc_id": "doc1", "filename": "a.pdf",
+                        "chunk_index": 0, "total_chunks": 1}]],
+        "distances": [[0.1]],
+    }
+    return collection
+
+
+@patch("services.retrieval_service._expand_parents", side_effect=lambda x: x)
+@patch("services.retrieval_service.reranker_service")
+@patch("services.retrieval_service.bm25_index_service")
+@patch("services.retrieval_service.get_collection")
+@patch("services.retrieval_service.generate_embeddings")
+def test_repeat_search_served_until_index_changes(
+    mock_embed, mock_collection, mock_bm25, mock_reranker, mock_expand
+):
+    from services.retrieval_service import search_documents
+
+    mock_embed.return_value = [[0.1] * 1024]
+    mock_collection.return_value = _mock_collection()
+    mock_bm25.search.return_value = []
+    mock_reranker.rerank.side_effect = lambda query, candidates, top_k: candidates[:top_k]
+
+    first = search_documents("test query")
+    second = search_documents("Test   query")
+    assert second == first
+    assert mock_embed.call_count == 1
+
+    bump_generation()  # e.g. a document upload
+    search_documents("test query")
+    assert mock_embed.call_count == 2
+
+
+@patch("services.retrieval_service._expand_parents", side_effect=lambda x: x)
+@patch("services.retrieval_service.reranker_service")
+@patch("services.retrieval_service.bm25_index_service")
+@patch("services.retrieval_service.get_collection")
+@patch("services.retrieval_service.generate_embeddings")
+def test_fallback_results_not_cached(
+    mock_embed, mock_collection, mock_bm25, mock_reranker, mock_expand
+):
+    from services.retrieval_service import search_documents
+
+    mock_embed.return_value = [[0.1] * 1024]
+    mock_collection.return_value = _mock_collection()
+    mock_bm25.search.return_value = []
+    mock_reranker.rerank.side_effect = Exception("reranker down")
+
+    results = search_documents("test query")
+    assert results[0]["retrieval_method"] == "rrf_only"
+
+    search_documents("test query")
+    assert mock_embed.call_count == 2
@@ -0,0 +1,102 @@
+"""Tests for per-stage latency recording."""
+
+import logging
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.timing_service import NULL_TIMINGS, StageTimings, log_timings, new_timings
+
+
+def test_stage_records_elapsed_ms():
+    timings = StageTimings()
+    with timings.stage("embed"):
+        time.sleep(0.01)
+
+    result = timings.as_dict()
+    assert result["embed"] >= 10
+    assert result["total"] >= result["embed"]
+
+
+def test_repeated_stages_accumulate():
+    timings = StageTimings()
+    timings.record("hydrate", 1.5)
+    timings.record("hydrate", 2.0)
+    assert timings.as_dict()["hydrate"] == 3.5
+
+
+def test_timed_wrapper_records_on_exception():
+    timings = StageTimings()
+
+    def _fail():
+        raise ValueError("boom")
+
+    try:
+        timings.timed("bm25", _fail)()
+    except ValueError:
+        pass
+    assert "bm25" in timings.as_dict()
+
+
+def test_disabled_returns_noop_recorder(caplog):
+    with patch("services.timing_service.STAGE_TIMINGS_ENABLED", False):
+        timings = new_timings()
+
+    assert timings is NULL_TIMINGS
+    with timings.stage("embed"):
+        pass
+    fn = lambda: 1  # noqa: E731
+    assert timings.timed("bm25", fn) is fn
+    assert timings.as_dict() is None
+
+    with caplog.at_level(logging.INFO, logger="services.timing_service"):
+        log_timings("search", timings)
+    assert caplog.records == []
+
+
+def test_log_line_is_structured(caplog):
+    timings = StageTimings()
+    timings.record("rerank", 12.0)
+
+    with caplog.at_level(logging.INFO, logger="services.timing_service"):
+        log_timings("search", timings, retrieval_method="reranked")
+
+    message = caplog.records[0].getMessage()
+    assert message.startswith("stage_timings ")
+    assert '"kind": "search"' in message
+    assert '"rerank": 12.0' in message
+    assert '"retrieval_method": "reranked"' in message
+
+
+@patch("services.retrieval_service._expand_parents", side_effect=lambda x: x)
+@patch("services.retrieval_service.reranker_service")
+@patch("services.retrieval_service.bm25_index_service")
+@patch("services.retrieval_service.get_collection")
+@patch("services.retrieval_service.generate_embeddings")
+def test_search_records_pipeline_stages(
+    mock_embed, mock_collection, mock_bm25, mock_reranker, mock_expand
+):
+    from services.retrieval_service import search_documents
+
+    mock_embed.return_value = [[0.1] * 1024]
+    collection = MagicMock()
+    collection.query.return_value = {
+        "ids": [["doc1_chunk_0"]],
+        "documents": [["text A"]],
+        "metadatas": [[{"doc_id": "doc1", "filename": "a.pdf",
+                        "chunk_index": 0, "total_chunks": 1}]],
+        "distances": [[0.1]],
+    }
+    mock_collection.return_value = collection
+    mock_bm25.search.return_value = [{"chunk_id": "doc1_chunk_0", "bm25_score": 1.0}]
+    mock_reranker.rerank.side_effect = lambda query, candidates, top_k: candidates[:top_k]
+
+    timings = StageTimings()
+    search_documents("test query", timings=timings)
+
+    recorded = timings.as_dict()
+    for stage in ("embed", "dense_query", "bm25", "hydrate", "rerank", "expand_parents"):
+        assert stage in recorded
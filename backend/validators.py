@@ -5,6 +5,8 @@ Shared input validators for API endpoints.
 import re
 from uuid import UUID
 
+from config import RETRIEVAL_PROFILES
+
 MODEL_NAME_PATTERN = re.compile(r"^[a-zA-Z0-9._:\-/]+$")
 
 
@@ -18,6 +20,16 @@ def validate_model_name(name: str) -> str:
     return name
 
 
+def validate_retrieval_profile(name: str) -> str:
+    """Validate that a retrieval profile is defined in RETRIEVAL_PROFILES."""
+    if name not in RETRIEVAL_PROFILES:
+        raise ValueError(
+            f"Unknown retrieval profile '{name}'. "
+            f"Available: {', '.join(RETRIEVAL_PROFILES)}"
+        )
+    return name
+
+
 def validate_uuid(value: str) -> str:
     """Validate that a string is a valid UUID format."""
     try: